@@ -0,0 +1,49 @@
+import argparse
+import logging
+
+from . import bench_client, bench_import, bench_models, bench_replay, bench_webhooks
+from .utils import compare, latest_results, save_results
+
+SUITES = {
+    "client": bench_client,
+    "import": bench_import,
+    "models": bench_models,
+    "replay": bench_replay,
+    "webhooks": bench_webhooks,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="TelePay SDK benchmarks")
+    parser.add_argument("suites", nargs="*", help=f"any of: {', '.join(SUITES)}")
+    parser.add_argument("--quick", action="store_true", help="smaller workloads")
+    parser.add_argument("--name", help="name of the results file")
+    parser.add_argument("--no-save", action="store_true", help="don't store results")
+    args = parser.parse_args()
+    unknown = set(args.suites) - set(SUITES)
+    if unknown:
+        parser.error(f"unknown suites: {', '.join(sorted(unknown))}")
+    logging.disable(logging.CRITICAL)
+
+    results = {}
+    for name in args.suites or SUITES:
+        print(f"Running {name} benchmarks...")
+        results.update(SUITES[name].run(quick=args.quick))
+
+    for name, result in sorted(results.items()):
+        values = ", ".join(
+            f"{key}={value:.6g}" if isinstance(value, float) else f"{key}={value}"
+            for key, value in result.items()
+        )
+        print(f"  {name}: {values}")
+
+    previous = latest_results()
+    if not args.no_save:
+        path = save_results(results, args.name)
+        print(f"Results saved to {path}")
+    for name, change in compare(previous or {}, results):
+        print(f"  REGRESSION {name}: {change:+.0%}")
+
+
+if __name__ == "__main__":
+    main()
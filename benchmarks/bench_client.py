@@ -0,0 +1,103 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+from typing import Dict
+
+from httpx import AsyncClient, Client
+
+from telepay.v1 import TelePayAsyncClient, TelePaySyncClient
+
+from .utils import INVOICE, measure, populated_api
+
+CONCURRENCY = (1, 10, 50)
+LATENCY = 0.005
+
+
+def client_overhead(number: int) -> Dict[str, dict]:
+    """
+    Time per call against a local transport, compared with bare httpx
+    """
+    api = populated_api(invoices=1)
+    results = {}
+    with Client(
+        base_url="https://api.telepay.cash/rest/", transport=api.transport()
+    ) as http:
+        headers = {"Authorization": api.secret_api_key}
+        results["client.httpx_get"] = measure(
+            lambda: http.get("getInvoice/0000000000", headers=headers), number
+        )
+    with TelePaySyncClient(api.secret_api_key, transport=api.transport()) as client:
+        results["client.sync_get_invoice"] = measure(
+            lambda: client.get_invoice("0000000000"), number
+        )
+        results["client.sync_create_invoice"] = measure(
+            lambda: client.create_invoice(**INVOICE), number
+        )
+
+    async def async_overhead():
+        async with AsyncClient(
+            base_url="https://api.telepay.cash/rest/", transport=api.async_transport()
+        ) as http:
+            start = perf_counter()
+            for _ in range(number):
+                await http.get("getInvoice/0000000000", headers=headers)
+            results["client.async_httpx_get"] = {
+                "best": (perf_counter() - start) / number,
+                "number": number,
+            }
+        async with TelePayAsyncClient(
+            api.secret_api_key, transport=api.async_transport()
+        ) as client:
+            start = perf_counter()
+            for _ in range(number):
+                await client.get_invoice("0000000000")
+            results["client.async_get_invoice"] = {
+                "best": (perf_counter() - start) / number,
+                "number": number,
+            }
+
+    asyncio.run(async_overhead())
+    return results
+
+
+def throughput(requests: int) -> Dict[str, dict]:
+    """
+    Requests per second of both clients against a transport with fixed latency
+    """
+    api = populated_api(invoices=1, latency=LATENCY)
+    results = {}
+    for concurrency in CONCURRENCY:
+        with TelePaySyncClient(api.secret_api_key, transport=api.transport()) as client:
+            with ThreadPoolExecutor(concurrency) as executor:
+                start = perf_counter()
+                list(
+                    executor.map(
+                        lambda _: client.get_invoice("0000000000"), range(requests)
+                    )
+                )
+                elapsed = perf_counter() - start
+        results[f"throughput.sync_c{concurrency}"] = {"per_second": requests / elapsed}
+
+        async def run_async():
+            async with TelePayAsyncClient(
+                api.secret_api_key, transport=api.async_transport()
+            ) as client:
+                semaphore = asyncio.Semaphore(concurrency)
+
+                async def get():
+                    async with semaphore:
+                        await client.get_invoice("0000000000")
+
+                start = perf_counter()
+                await asyncio.gather(*(get() for _ in range(requests)))
+                return perf_counter() - start
+
+        elapsed = asyncio.run(run_async())
+        results[f"throughput.async_c{concurrency}"] = {"per_second": requests / elapsed}
+    return results
+
+
+def run(quick: bool = False) -> Dict[str, dict]:
+    results = client_overhead(number=100 if quick else 1000)
+    results.update(throughput(requests=100 if quick else 1000))
+    return results
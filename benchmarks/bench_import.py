@@ -0,0 +1,44 @@
+import subprocess
+import sys
+from typing import Dict
+
+# modules that `import telepay.v1` must not load
+HEAVY_MODULES = ("fastapi", "uvicorn", "colorama", "dotenv", "opentelemetry")
+
+
+def import_time() -> float:
+    """
+    Cumulative import time of `telepay.v1`, in seconds, in a fresh interpreter
+    """
+    output = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import telepay.v1"],
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stderr
+    for line in reversed(output.splitlines()):
+        _, _, cumulative, name = (
+            part.strip() for part in line.replace("|", ":").split(":")
+        )
+        if name == "telepay.v1":
+            return int(cumulative) / 1_000_000
+    raise RuntimeError("telepay.v1 not found in the import time report")
+
+
+def loaded_heavy_modules() -> list:
+    code = (
+        "import sys, telepay.v1; "
+        f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    ).stdout.strip()
+    return output.split(",") if output else []
+
+
+def run(quick: bool = False) -> Dict[str, dict]:
+    timings = [import_time() for _ in range(3 if quick else 10)]
+    heavy = loaded_heavy_modules()
+    if heavy:
+        print(f"  WARNING import telepay.v1 loads {', '.join(heavy)}")
+    return {"import.telepay_v1": {"best": min(timings), "number": len(timings)}}
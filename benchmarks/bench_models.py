@@ -0,0 +1,75 @@
+import gc
+import tracemalloc
+from typing import Dict
+
+from telepay.v1.models.invoice import InvoiceList
+from telepay.v1.models.wallets import Wallets
+from telepay.v1.models.webhooks import Webhooks
+
+from .utils import invoice_json, measure
+
+SIZES = (10, 100, 1_000, 10_000, 100_000)
+
+
+def invoices_json(size: int) -> dict:
+    return {"invoices": [invoice_json(index) for index in range(size)]}
+
+
+def webhooks_json(size: int) -> dict:
+    return {
+        "webhooks": [
+            {
+                "id": str(index),
+                "url": f"https://example.com/{index}",
+                "secret": "hello",
+                "events": ["all"],
+                "active": True,
+            }
+            for index in range(size)
+        ]
+    }
+
+
+def wallets_json(size: int) -> dict:
+    return {
+        "wallets": [
+            {"asset": "TON", "blockchain": "TON", "network": "mainnet", "balance": 1}
+            for _ in range(size)
+        ]
+    }
+
+
+def parse(cls, build, size: int):
+    # from_json mutates its input, so every call parses a fresh payload
+    payloads = iter([build(size) for _ in range(6)])
+    return lambda: cls.from_json(next(payloads))
+
+
+def memory_per_invoice(size: int = 10_000) -> float:
+    payload = invoices_json(size)
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    invoices = InvoiceList.from_json(payload)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del invoices
+    return (after - before) / size
+
+
+def run(quick: bool = False) -> Dict[str, dict]:
+    results = {}
+    sizes = [size for size in SIZES if not quick or size <= 10_000]
+    for size in sizes:
+        for name, cls, build in (
+            ("invoices", InvoiceList, invoices_json),
+            ("webhooks", Webhooks, webhooks_json),
+            ("wallets", Wallets, wallets_json),
+        ):
+            results[f"models.{name}_{size}"] = measure(
+                parse(cls, build, size), number=1, repeat=5
+            )
+    results["models.invoice_bytes"] = {
+        "bytes": memory_per_invoice(1_000 if quick else 10_000)
+    }
+    return results
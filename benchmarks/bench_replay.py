@@ -0,0 +1,47 @@
+import asyncio
+import os
+from time import perf_counter
+from typing import Dict
+
+from telepay.v1 import TelePayAsyncClient, TelePaySyncClient
+from telepay.v1.testing import Cassette, RecordingTransport, ReplayTransport
+
+from .utils import INVOICE, populated_api
+
+# cassette recorded from production traffic, a synthetic one is used otherwise
+CASSETTE = os.environ.get("TELEPAY_BENCH_CASSETTE")
+
+
+def synthetic_cassette(size: int) -> Cassette:
+    api = populated_api(invoices=100)
+    transport = RecordingTransport(api.transport())
+    with TelePaySyncClient(api.secret_api_key, transport=transport) as client:
+        for index in range(size):
+            invoice = client.create_invoice(**INVOICE)
+            client.get_invoice(invoice.number)
+            if index % 10 == 0:
+                client.get_invoices()
+    return transport.cassette
+
+
+def run(quick: bool = False) -> Dict[str, dict]:
+    """
+    Replay the cassette requests as fast as possible, answered by the
+    recorded responses, so only the client and parsing overhead is measured
+    """
+    cassette = (
+        Cassette.load(CASSETTE)
+        if CASSETTE
+        else synthetic_cassette(20 if quick else 200)
+    )
+
+    async def replay() -> float:
+        async with TelePayAsyncClient(
+            "key", transport=ReplayTransport(cassette, speed=0)
+        ) as client:
+            start = perf_counter()
+            await cassette.areplay(client.http_client, speed=0)
+            return perf_counter() - start
+
+    elapsed = asyncio.run(replay())
+    return {"replay.requests": {"per_second": len(cassette.interactions) / elapsed}}
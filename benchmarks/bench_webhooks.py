@@ -0,0 +1,18 @@
+from time import perf_counter
+from typing import Dict
+
+from telepay.v1.webhooks import get_signature
+
+from .utils import invoice_json
+
+SECRET = "hello"
+
+
+def run(quick: bool = False) -> Dict[str, dict]:
+    data = str({"event": "invoice.completed", "data": invoice_json(0)})
+    number = 10_000 if quick else 100_000
+    start = perf_counter()
+    for _ in range(number):
+        get_signature(data, SECRET)
+    elapsed = perf_counter() - start
+    return {"webhooks.signatures": {"per_second": number / elapsed}}
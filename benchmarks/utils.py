@@ -0,0 +1,135 @@
+import json
+import platform
+import statistics
+from datetime import datetime
+from pathlib import Path
+from time import perf_counter
+from typing import Callable, Dict, Optional
+
+from telepay.v1.testing import MockTelePayAPI
+
+RESULTS_DIR = Path(__file__).parent / "results"
+
+# a result slower than the previous run by more than this ratio is reported
+REGRESSION_THRESHOLD = 0.10
+
+INVOICE = dict(
+    asset="TON",
+    blockchain="TON",
+    network="testnet",
+    amount=1,
+    description="Benchmark",
+    metadata={"color": "red", "size": "large"},
+    success_url="https://example.com/success",
+    cancel_url="https://example.com/cancel",
+    expires_at=30,
+)
+
+
+def measure(fn: Callable[[], object], number: int = 100, repeat: int = 5) -> dict:
+    """
+    Time `number` calls of `fn`, `repeat` times, returning seconds per call
+    """
+    fn()
+    timings = []
+    for _ in range(repeat):
+        start = perf_counter()
+        for _ in range(number):
+            fn()
+        timings.append((perf_counter() - start) / number)
+    return {
+        "best": min(timings),
+        "median": statistics.median(timings),
+        "number": number,
+        "repeat": repeat,
+    }
+
+
+def invoice_json(index: int) -> dict:
+    return {
+        "asset": "TON",
+        "blockchain": "TON",
+        "network": "mainnet",
+        "amount": "1.5",
+        "description": "Benchmark",
+        "number": f"{index:010d}",
+        "status": "pending",
+        "metadata": {"color": "red", "size": "large"},
+        "success_url": "https://example.com/success",
+        "cancel_url": "https://example.com/cancel",
+        "created_at": "2023-01-01T00:00:00.000000Z",
+        "updated_at": "2023-01-01T00:05:00.000000Z",
+        "expires_at": "2023-01-01T00:30:00.000000Z",
+        "checkout_url": f"https://telepay.cash/checkout/{index:010d}",
+        "onchain_url": "ton://transfer/address",
+        "explorer_url": None,
+    }
+
+
+def populated_api(invoices: int = 0, **kwargs) -> MockTelePayAPI:
+    api = MockTelePayAPI(seed=0, **kwargs)
+    api.set_balance("TON", "TON", "testnet", 1000)
+    for index in range(invoices):
+        api.invoices[f"{index:010d}"] = invoice_json(index)
+    return api
+
+
+def save_results(results: Dict[str, dict], name: Optional[str] = None) -> Path:
+    RESULTS_DIR.mkdir(exist_ok=True)
+    now = datetime.utcnow()
+    name = name or now.strftime("%Y%m%dT%H%M%S")
+    path = RESULTS_DIR / f"{name}.json"
+    path.write_text(
+        json.dumps(
+            {
+                "recorded_at": now.isoformat(),
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "results": results,
+            },
+            indent=2,
+            sort_keys=True,
+        )
+    )
+    return path
+
+
+def latest_results(exclude: Optional[Path] = None) -> Optional[dict]:
+    """
+    The results of the latest run, by the time they were recorded: runs can
+    be named, so their file names don't sort by time. Files without it, from
+    older runs, are dated by their modification time.
+    """
+    runs = []
+    for path in RESULTS_DIR.glob("*.json"):
+        if path == exclude:
+            continue
+        run = json.loads(path.read_text())
+        recorded_at = run.get("recorded_at")
+        if recorded_at is None:
+            recorded_at = datetime.utcfromtimestamp(path.stat().st_mtime).isoformat()
+        runs.append((recorded_at, run["results"]))
+    if not runs:
+        return None
+    return max(runs, key=lambda run: run[0])[1]
+
+
+def compare(previous: Dict[str, dict], current: Dict[str, dict]) -> list:
+    """
+    Benchmarks slower than in the previous results. Timings are compared on
+    their `best` value, rates on their `per_second` value
+    """
+    regressions = []
+    for name, result in current.items():
+        before = previous.get(name)
+        if not before:
+            continue
+        if "best" in result and "best" in before:
+            change = result["best"] / before["best"] - 1
+        elif "per_second" in result and "per_second" in before:
+            change = before["per_second"] / result["per_second"] - 1
+        else:
+            continue
+        if change > REGRESSION_THRESHOLD:
+            regressions.append((name, change))
+    return regressions
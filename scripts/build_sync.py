@@ -0,0 +1,45 @@
+"""
+Generates the sync client from the async one: `python scripts/build_sync.py`.
+The files in `telepay/v1/_sync` must not be edited by hand.
+"""
+from pathlib import Path
+
+import unasync
+
+ROOT = Path(__file__).parent.parent
+SOURCES = (
+    "batching.py",
+    "client.py",
+    "concurrency.py",
+    "export.py",
+    "middlewares.py",
+    "payouts.py",
+    "pipeline.py",
+    "pool.py",
+    "sweeper.py",
+    "waiters.py",
+)
+
+RULES = [
+    unasync.Rule(
+        fromdir="/telepay/v1/_async/",
+        todir="/telepay/v1/_sync/",
+        additional_replacements={
+            "TelePayAsyncClient": "TelePaySyncClient",
+            "AsyncBaseTransport": "BaseTransport",
+            "aread": "read",
+            "aiter_text": "iter_text",
+        },
+    ),
+]
+
+
+def main() -> None:
+    unasync.unasync_files(
+        [str(ROOT / "telepay" / "v1" / "_async" / name) for name in SOURCES],
+        rules=RULES,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,64 @@
+from ._async.batching import AsyncPayoutScheduler  # noqa: F401
 from ._async.client import TelePayAsyncClient  # noqa: F401
+from ._async.concurrency import AsyncConcurrencyLimiter  # noqa: F401
+from ._async.middlewares import (  # noqa: F401
+    AsyncBalanceCacheMiddleware,
+    AsyncCacheMiddleware,
+    AsyncCircuitBreakerMiddleware,
+    AsyncDeadlineMiddleware,
+    AsyncHedgingMiddleware,
+    AsyncIdempotencyMiddleware,
+    AsyncRateLimitMiddleware,
+    AsyncRetryMiddleware,
+)
+from ._async.payouts import AsyncPayoutPlanner  # noqa: F401
+from ._async.pipeline import AsyncMiddleware, AsyncPipeline  # noqa: F401
+from ._async.pool import AsyncInvoicePool  # noqa: F401
+from ._async.sweeper import AsyncInvoiceSweeper  # noqa: F401
+from ._sync.batching import SyncPayoutScheduler  # noqa: F401
 from ._sync.client import TelePaySyncClient  # noqa: F401
-from .auth import TelePayAuth  # noqa: F401
+from ._sync.concurrency import SyncConcurrencyLimiter  # noqa: F401
+from ._sync.middlewares import (  # noqa: F401
+    SyncBalanceCacheMiddleware,
+    SyncCacheMiddleware,
+    SyncCircuitBreakerMiddleware,
+    SyncDeadlineMiddleware,
+    SyncHedgingMiddleware,
+    SyncIdempotencyMiddleware,
+    SyncRateLimitMiddleware,
+    SyncRetryMiddleware,
+)
+from ._sync.payouts import SyncPayoutPlanner  # noqa: F401
+from ._sync.pipeline import SyncMiddleware, SyncPipeline  # noqa: F401
+from ._sync.pool import SyncInvoicePool  # noqa: F401
+from ._sync.sweeper import SyncInvoiceSweeper  # noqa: F401
+from .analytics import InvoiceColumns, usd_prices  # noqa: F401
+from .auth import (  # noqa: F401
+    CallableCredentials,
+    CredentialChain,
+    CredentialProvider,
+    EnvCredentials,
+    ExplicitCredentials,
+    FileCredentials,
+    TelePayAuth,
+)
+from .balances import BalanceCache  # noqa: F401
+from .circuit import CircuitBreaker, CircuitPolicy  # noqa: F401
+from .concurrency import AdaptiveLimit  # noqa: F401
+from .deadlines import deadline  # noqa: F401
+from .endpoints import ENDPOINTS, Endpoint, RequestContext  # noqa: F401
 from .errors import TelePayError  # noqa: F401
+from .idempotency import (  # noqa: F401
+    FileIdempotencyStore,
+    IdempotencyRecord,
+    IdempotencyStore,
+    MemoryIdempotencyStore,
+)
 from .models.account import Account  # noqa: F401
 from .models.assets import Assets  # noqa: F401
 from .models.invoice import Invoice  # noqa: F401
 from .models.wallets import Wallet, Wallets  # noqa: F401
 from .models.webhooks import Webhook, Webhooks  # noqa: F401
+from .payouts import Payout, PayoutPlan, PayoutQuote  # noqa: F401
+from .pool import InvoiceTier  # noqa: F401
 from .webhooks import TelePayWebhookListener  # noqa: F401
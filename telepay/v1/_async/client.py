@@ -1,39 +1,179 @@
 import logging
 from dataclasses import dataclass, field
-from typing import Union
+from typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    Collection,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    TypeVar,
+    Union,
+)
 
+from httpx import Request, Response
 from httpx._config import Timeout
+from httpx._transports.base import AsyncBaseTransport
 from httpx._types import TimeoutTypes
 
-from ..auth import TelePayAuth
+from .._backends import AsyncBackend
+from ..analytics import InvoiceColumns
+from ..auth import (
+    CredentialAuth,
+    CredentialChain,
+    CredentialProvider,
+    ExplicitCredentials,
+    TelePayAuth,
+    default_credentials,
+)
+from ..balances import BalanceCache
+from ..endpoints import (
+    ACTIVATE_WEBHOOK,
+    CANCEL_INVOICE,
+    CLIENT_DEFAULT,
+    CREATE_INVOICE,
+    CREATE_WEBHOOK,
+    DEACTIVATE_WEBHOOK,
+    DEFAULT_TIMEOUT,
+    DELETE_INVOICE,
+    DELETE_WEBHOOK,
+    GET_ASSET,
+    GET_ASSETS,
+    GET_BALANCE,
+    GET_INVOICE,
+    GET_INVOICES,
+    GET_ME,
+    GET_WALLET_BALANCE,
+    GET_WEBHOOK,
+    GET_WEBHOOKS,
+    GET_WITHDRAW_FEE,
+    GET_WITHDRAW_MINIMUM,
+    TRANSFER,
+    UPDATE_WEBHOOK,
+    WITHDRAW,
+    Endpoint,
+    RequestContext,
+    endpoint_timeouts,
+)
+from ..export import CHUNK_SIZE, CSV, Destination
+from ..feed import InvoiceFeed
 from ..http_clients import AsyncClient
+from ..idempotency import IdempotencyStore
 from ..models.account import Account
 from ..models.assets import Asset, Assets
 from ..models.invoice import Invoice, InvoiceList
 from ..models.wallets import Wallet, Wallets
 from ..models.webhooks import Webhook, Webhooks
-from ..utils import validate_response
+from ..payouts import Payout, PayoutPlan
+from ..pool import InvoiceTier
+from ..stats import STREAMED, ClientStats
+from ..tracing import get_tracer, record_response
+from ..waiters import FINAL_STATUSES, InvoiceWaiters
+from .batching import AsyncPayoutScheduler
+from .concurrency import AsyncConcurrencyLimiter, bulk
+from .export import export_invoices
+from .middlewares import (
+    AsyncBalanceCacheMiddleware,
+    AsyncDeadlineMiddleware,
+    AsyncIdempotencyMiddleware,
+    AsyncTracingMiddleware,
+)
+from .payouts import AsyncPayoutPlanner
+from .pipeline import AsyncMiddleware, AsyncPipeline
+from .pool import AsyncInvoicePool
+from .sweeper import AsyncInvoiceSweeper
+from .waiters import AsyncInvoiceWaiter
 
 logger = logging.getLogger(__name__)
 
+T = TypeVar("T")
+
 
 @dataclass
 class TelePayAsyncClient:
     """
-    Creates a TelePay async client.
+    Creates a TelePay client.
     * API_SECRET: Your merchant private API key.
     Any requests without this authentication key will result in error 403.
+    * timeouts: Timeouts by endpoint name, in seconds, like
+    `{"getInvoices": 300}`. Without a `timeout`, the other endpoints use
+    their default timeout, 15 seconds for the calls made while a customer
+    waits, including `create_invoice` and `get_invoice`, or 60 seconds.
+    Otherwise they use `timeout`, even when it's 60 seconds too.
+    * middlewares: Steps every call goes through, like retries or caching.
+    * idempotency_store: Where the outcomes of `create_invoice`, `transfer`
+    and `withdraw` are recorded, by idempotency key. In memory by default.
+    * limiter: Adaptive concurrency limit of the bulk operations.
+    * balance_max_age: When given, `get_balance` is served from a cache for
+    up to this many seconds, see `AsyncBalanceCacheMiddleware`.
+    * waiters: Where webhook listeners publish the invoices of their events,
+    to resolve `wait_for_invoice` and invalidate the balance cache: pass
+    `client.waiters` to the listener. Each client has its own by default.
     """
 
-    timeout: TimeoutTypes = field(default=Timeout(60))
+    timeout: TimeoutTypes = field(default_factory=lambda: Timeout(60))
 
-    def __init__(self, secret_api_key, timeout=Timeout(60)) -> None:
+    def __init__(
+        self,
+        secret_api_key: Optional[str] = None,
+        timeout=CLIENT_DEFAULT,
+        event_hooks: Optional[Dict[str, List[Callable]]] = None,
+        collect_stats: bool = True,
+        trace_metadata: bool = False,
+        credentials: Optional[CredentialProvider] = None,
+        transport: Optional[AsyncBaseTransport] = None,
+        middlewares: Sequence[AsyncMiddleware] = (),
+        timeouts: Optional[Dict[str, float]] = None,
+        idempotency_store: Optional[IdempotencyStore] = None,
+        limiter: Optional[AsyncConcurrencyLimiter] = None,
+        balance_max_age: Optional[float] = None,
+        waiters: Optional[InvoiceWaiters] = None,
+    ) -> None:
         self.base_url = "https://api.telepay.cash/rest/"
-        self.timeout = timeout
+        self.timeout = DEFAULT_TIMEOUT if timeout is CLIENT_DEFAULT else timeout
+        self.timeouts = endpoint_timeouts(timeout, timeouts)
+        self.trace_metadata = trace_metadata
+        if credentials is None:
+            credentials = (
+                CredentialChain([ExplicitCredentials(secret_api_key)])
+                if secret_api_key is not None
+                else default_credentials()
+            )
+        elif not isinstance(credentials, CredentialChain):
+            credentials = CredentialChain([credentials])
+        self.credentials = credentials
+        self._stats = ClientStats() if collect_stats else None
+        hooks = {"request": [self._on_request], "response": [self._on_response]}
+        for event, callbacks in (event_hooks or {}).items():
+            hooks.setdefault(event, []).extend(callbacks)
         self.http_client = AsyncClient(
             base_url=self.base_url,
-            headers={"Authorization": secret_api_key},
+            auth=CredentialAuth(self.credentials),
             timeout=self.timeout,
+            event_hooks=hooks,
+            transport=transport,
+        )
+        default_middlewares: List[AsyncMiddleware] = [AsyncDeadlineMiddleware()]
+        if get_tracer() is not None:
+            default_middlewares.append(AsyncTracingMiddleware(trace_metadata))
+        self.waiters = waiters if waiters is not None else InvoiceWaiters()
+        self.balance_cache: Optional[BalanceCache] = None
+        if balance_max_age is not None:
+            self.balance_cache = BalanceCache(balance_max_age)
+            default_middlewares.append(
+                AsyncBalanceCacheMiddleware(self.balance_cache, self.waiters)
+            )
+        self.idempotency = AsyncIdempotencyMiddleware(idempotency_store)
+        self.limiter = limiter or AsyncConcurrencyLimiter()
+        self.invoice_waiter = AsyncInvoiceWaiter(self, self.waiters)
+        self.payout_planner = AsyncPayoutPlanner(self)
+        self.pipeline = AsyncPipeline(
+            self.http_client,
+            [*default_middlewares, *middlewares, self.idempotency],
+            stats=self._stats,
         )
 
     async def __aenter__(self) -> "TelePayAsyncClient":
@@ -46,17 +186,66 @@ class TelePayAsyncClient:
         await self.http_client.aclose()
 
     @staticmethod
-    def from_auth(auth: TelePayAuth, timeout=Timeout(60)) -> "TelePayAsyncClient":
-        return TelePayAsyncClient(auth.secret_api_key, timeout=timeout)
+    def from_auth(
+        auth: TelePayAuth, timeout=CLIENT_DEFAULT, **kwargs
+    ) -> "TelePayAsyncClient":
+        return TelePayAsyncClient(auth.secret_api_key, timeout=timeout, **kwargs)
+
+    async def _on_request(self, request: Request) -> None:
+        if self._stats is not None:
+            self._stats.request_started(request)
+
+    async def _on_response(self, response: Response) -> None:
+        record_response(response)
+        if self._stats is not None and not response.request.extensions.get(STREAMED):
+            await response.aread()
+            self._stats.response_received(response)
+
+    async def _request(
+        self,
+        endpoint: Endpoint,
+        json: Optional[dict] = None,
+        idempotency_key: Optional[str] = None,
+        **params: str,
+    ) -> Any:
+        context = RequestContext(endpoint, endpoint.url(**params), json)
+        context.options["timeout"] = self.timeouts.get(endpoint.name)
+        if idempotency_key is not None:
+            context.options["idempotency_key"] = idempotency_key
+        return await self.pipeline(context)
+
+    async def _request_json(
+        self, endpoint: Endpoint, json: Optional[dict] = None, **params: str
+    ) -> Any:
+        """
+        Like `_request`, but returning the JSON response, without parsing it
+        """
+        context = RequestContext(endpoint, endpoint.url(**params), json)
+        context.options["timeout"] = self.timeouts.get(endpoint.name)
+        await self.pipeline(context)
+        return context.response
+
+    def rotate_secret_api_key(self, secret_api_key: str) -> None:
+        """
+        Use a new secret API key from the next request on, keeping the
+        connection pool
+        """
+        self.credentials.rotate(secret_api_key)
+
+    def stats(self) -> dict:
+        """
+        Per-endpoint requests, errors, latency and bytes, plus the connection
+        pool utilization
+        """
+        if self._stats is None:
+            return {}
+        return self._stats.snapshot(self.http_client)
 
     async def get_me(self) -> Account:
         """
         Info about the current account
         """
-        response = await self.http_client.get("getMe")
-        logger.debug(f"Response: {response.text}")
-        validate_response(response)
-        return Account.from_json(response.json())
+        return await self._request(GET_ME)
 
     async def get_balance(
         self, asset=None, blockchain=None, network=None
@@ -65,61 +254,51 @@ class TelePayAsyncClient:
         Get your merchant wallet assets with corresponding balance
         """
         if asset and blockchain and network:
-            response = await self.http_client.post(
-                "getBalance",
+            return await self._request(
+                GET_WALLET_BALANCE,
                 json={"asset": asset, "blockchain": blockchain, "network": network},
             )
-            logger.debug(f"Response: {response.text}")
-            validate_response(response)
-            return Wallets.from_json(response.json())
-        else:
-            response = await self.http_client.get("getBalance")
-            logger.debug(f"Response: {response.text}")
-            validate_response(response)
-            return Wallets.from_json(response.json())
+        return await self._request(GET_BALANCE)
 
     async def get_asset(self, asset: str, blockchain: str) -> Asset:
         """
         Get asset details
         """
-        response = await self.http_client.request(
-            method="GET",
-            url="getAsset",
+        return await self._request(
+            GET_ASSET,
             json={
                 "asset": asset,
                 "blockchain": blockchain,
             },
         )
-        logger.debug(f"Response: {response.text}")
-        validate_response(response)
-        return Asset.from_json(response.json())
 
     async def get_assets(self) -> Assets:
         """
         Get assets suported by TelePay
         """
-        response = await self.http_client.get("getAssets")
-        logger.debug(f"Response: {response.text}")
-        validate_response(response)
-        return Assets.from_json(response.json())
+        return await self._request(GET_ASSETS)
 
     async def get_invoices(self) -> InvoiceList:
         """
         Get your merchant invoices
         """
-        response = await self.http_client.get("getInvoices")
-        logger.debug(f"Response: {response.text}")
-        validate_response(response)
-        return InvoiceList.from_json(response.json())
+        return await self._request(GET_INVOICES)
+
+    async def get_invoice_columns(
+        self, use_numpy: Optional[bool] = None
+    ) -> InvoiceColumns:
+        """
+        Your merchant invoices as columns, to aggregate them with
+        `InvoiceColumns.totals`
+        """
+        response = await self._request_json(GET_INVOICES)
+        return InvoiceColumns.from_json(response["invoices"], use_numpy)
 
     async def get_invoice(self, number: str) -> Invoice:
         """
         Get invoice details, by ID
         """
-        response = await self.http_client.get(f"getInvoice/{number}")
-        logger.debug(f"Response: {response.text}")
-        validate_response(response)
-        return Invoice.from_json(response.json())
+        return await self._request(GET_INVOICE, number=number)
 
     async def create_invoice(
         self,
@@ -132,12 +311,14 @@ class TelePayAsyncClient:
         expires_at: int,
         metadata: dict = None,
         description: str = None,
+        idempotency_key: Optional[str] = None,
     ) -> Invoice:
         """
-        Create an invoice
+        Create an invoice.
+        Pass the same `idempotency_key` to safely create it again.
         """
-        response = await self.http_client.post(
-            "createInvoice",
+        return await self._request(
+            CREATE_INVOICE,
             json={
                 "asset": asset,
                 "blockchain": blockchain,
@@ -149,28 +330,48 @@ class TelePayAsyncClient:
                 "cancel_url": cancel_url,
                 "expires_at": expires_at,
             },
+            idempotency_key=idempotency_key,
         )
-        logger.debug(f"Response: {response.text}")
-        validate_response(response)
-        return Invoice.from_json(response.json())
+
+    async def wait_for_invoice(
+        self,
+        number: str,
+        statuses: Collection[str] = FINAL_STATUSES,
+        timeout: Optional[float] = None,
+    ) -> Invoice:
+        """
+        Wait until an invoice reaches one of `statuses`, or a final status.
+        Resolved by the webhooks when a `TelePayWebhookListener` runs in this
+        process, by polling the invoices otherwise.
+        * timeout: Seconds to wait, after which TelePayError
+        `deadline.exceeded` is raised.
+        """
+        return await self.invoice_waiter.wait(number, statuses, timeout)
+
+    async def watch_invoices(self, interval: float = 10.0) -> AsyncIterator[dict]:
+        """
+        Yield the changes of the invoices, shaped like the webhook events, by
+        comparing the invoices fetched every `interval` seconds. For when the
+        webhooks can't reach you.
+        """
+        feed = InvoiceFeed()
+        while True:
+            response = await self._request_json(GET_INVOICES)
+            for event in feed.update(response.get("invoices", [])):
+                yield event
+            await AsyncBackend.sleep(interval)
 
     async def cancel_invoice(self, number: str) -> Invoice:
         """
         Cancel an invoice
         """
-        response = await self.http_client.post(f"cancelInvoice/{number}")
-        logger.debug(f"Response: {response.text}")
-        validate_response(response)
-        return Invoice.from_json(response.json())
+        return await self._request(CANCEL_INVOICE, number=number)
 
     async def delete_invoice(self, number: str) -> dict:
         """
         Delete an invoice
         """
-        response = await self.http_client.post(f"deleteInvoice/{number}")
-        logger.debug(f"Response: {response.text}")
-        validate_response(response)
-        return response.json()
+        return await self._request(DELETE_INVOICE, number=number)
 
     async def transfer(
         self,
@@ -180,13 +381,19 @@ class TelePayAsyncClient:
         amount: float,
         username: str,
         message: str = None,
+        idempotency_key: Optional[str] = None,
     ) -> dict:
         """
         Transfer funds between internal wallets.
         Off-chain operation.
-        """
-        response = await self.http_client.post(
-            "transfer",
+        When its outcome is unknown, like after a timeout, TelePayError
+        `payout.outcome-unknown` is raised, and it's never retried. With an
+        `idempotency_key`, a call that succeeded returns its recorded result,
+        and one whose outcome is unknown isn't sent again until
+        `client.idempotency.forget(idempotency_key)`.
+        """
+        return await self._request(
+            TRANSFER,
             json={
                 "asset": asset,
                 "blockchain": blockchain,
@@ -195,10 +402,8 @@ class TelePayAsyncClient:
                 "username": username,
                 "message": message,
             },
+            idempotency_key=idempotency_key,
         )
-        logger.debug(f"Response: {response.text}")
-        validate_response(response)
-        return response.json()
 
     async def get_withdraw_minimum(
         self,
@@ -209,32 +414,29 @@ class TelePayAsyncClient:
         """
         Get minimum withdraw amount.
         """
-        response = await self.http_client.post(
-            "getWithdrawMinimum",
+        return await self._request(
+            GET_WITHDRAW_MINIMUM,
             json={
                 "asset": asset,
                 "blockchain": blockchain,
                 "network": network,
             },
         )
-        logger.debug(f"Response: {response.text}")
-        validate_response(response)
-        return response.json()
 
     async def get_withdraw_fee(
         self,
+        to_address: str,
         asset: str,
         blockchain: str,
         network: str,
         amount: float,
-        to_address: str,
         message: str = None,
     ) -> dict:
         """
         Get estimated withdraw fee, composed of blockchain fee and processing fee.
         """
-        response = await self.http_client.post(
-            "getWithdrawFee",
+        return await self._request(
+            GET_WITHDRAW_FEE,
             json={
                 "to_address": to_address,
                 "asset": asset,
@@ -244,9 +446,6 @@ class TelePayAsyncClient:
                 "message": message,
             },
         )
-        logger.debug(f"Response: {response.text}")
-        validate_response(response)
-        return response.json()
 
     async def withdraw(
         self,
@@ -256,13 +455,19 @@ class TelePayAsyncClient:
         network: str,
         amount: float,
         message: str,
+        idempotency_key: Optional[str] = None,
     ) -> dict:
         """
         Withdraw funds from merchant wallet to external wallet.
         On-chain operation.
-        """
-        response = await self.http_client.post(
-            "withdraw",
+        When its outcome is unknown, like after a timeout, TelePayError
+        `payout.outcome-unknown` is raised, and it's never retried. With an
+        `idempotency_key`, a call that succeeded returns its recorded result,
+        and one whose outcome is unknown isn't sent again until
+        `client.idempotency.forget(idempotency_key)`.
+        """
+        return await self._request(
+            WITHDRAW,
             json={
                 "to_address": to_address,
                 "asset": asset,
@@ -271,10 +476,26 @@ class TelePayAsyncClient:
                 "amount": amount,
                 "message": message,
             },
+            idempotency_key=idempotency_key,
         )
-        logger.debug(f"Response: {response.text}")
-        validate_response(response)
-        return response.json()
+
+    async def plan_payouts(self, payouts: Iterable[Union[Payout, dict]]) -> PayoutPlan:
+        """
+        Check withdrawals before making them: their fees and minimums are
+        quoted concurrently, and their total checked against the balances.
+        Each payout is a `Payout`, or a dict with the arguments of `withdraw`.
+        """
+        return await self.payout_planner.plan(payouts)
+
+    def payout_scheduler(
+        self, window: float = 60.0, max_size: int = 50, concurrency: int = 4
+    ) -> AsyncPayoutScheduler:
+        """
+        A scheduler aggregating the withdrawals and transfers queued to the
+        same destination, to send them as a single payout. See
+        `AsyncPayoutScheduler`.
+        """
+        return AsyncPayoutScheduler(self, window, max_size, concurrency)
 
     async def create_webhook(
         self, url: str, secret: str, events: list, active: bool
@@ -282,8 +503,8 @@ class TelePayAsyncClient:
         """
         Create a webhook
         """
-        response = await self.http_client.post(
-            "createWebhook",
+        return await self._request(
+            CREATE_WEBHOOK,
             json={
                 "url": url,
                 "secret": secret,
@@ -291,9 +512,6 @@ class TelePayAsyncClient:
                 "active": active,
             },
         )
-        logger.debug(f"Response: {response.text}")
-        validate_response(response)
-        return Webhook.from_json(response.json())
 
     async def update_webhook(
         self, id: str, url: str, secret: str, events: list, active: bool
@@ -301,58 +519,128 @@ class TelePayAsyncClient:
         """
         Update a webhook
         """
-        response = await self.http_client.post(
-            f"updateWebhook/{id}",
+        return await self._request(
+            UPDATE_WEBHOOK,
             json={
                 "url": url,
                 "secret": secret,
                 "events": events,
                 "active": active,
             },
+            id=id,
         )
-        logger.debug(f"Response: {response.text}")
-        validate_response(response)
-        return Webhook.from_json(response.json())
 
     async def activate_webhook(self, id: str) -> Webhook:
         """
         Activate a webhook
         """
-        response = await self.http_client.post(f"activateWebhook/{id}")
-        validate_response(response)
-        return Webhook.from_json(response.json())
+        return await self._request(ACTIVATE_WEBHOOK, id=id)
 
     async def deactivate_webhook(self, id: str) -> Webhook:
         """
         Deactivate a webhook
         """
-        response = await self.http_client.post(f"deactivateWebhook/{id}")
-        validate_response(response)
-        return Webhook.from_json(response.json())
+        return await self._request(DEACTIVATE_WEBHOOK, id=id)
 
     async def delete_webhook(self, id: str) -> dict:
         """
         Delete a webhook
         """
-        response = await self.http_client.post(f"deleteWebhook/{id}")
-        logger.debug(f"Response: {response.text}")
-        validate_response(response)
-        return response.json()
+        return await self._request(DELETE_WEBHOOK, id=id)
 
     async def get_webhook(self, id: str) -> Webhook:
         """
         Get webhook
         """
-        response = await self.http_client.get(f"getWebhook/{id}")
-        logger.debug(f"Response: {response.text}")
-        validate_response(response)
-        return Webhook.from_json(response.json())
+        return await self._request(GET_WEBHOOK, id=id)
 
     async def get_webhooks(self) -> Webhooks:
         """
         Get webhooks
         """
-        response = await self.http_client.get("getWebhooks")
-        logger.debug(f"Response: {response.text}")
-        validate_response(response)
-        return Webhooks.from_json(response.json())
+        return await self._request(GET_WEBHOOKS)
+
+    def invoice_pool(
+        self,
+        sizes: Dict[InvoiceTier, int],
+        success_url: str,
+        cancel_url: str,
+        **kwargs: Any,
+    ) -> AsyncInvoicePool:
+        """
+        A pool of invoices created in advance, `sizes` telling how many to keep
+        ready per `(asset, blockchain, network, amount)`. Run `pool.run()` in
+        the background to refill it.
+        """
+        return AsyncInvoicePool(self, sizes, success_url, cancel_url, **kwargs)
+
+    async def export_invoices(
+        self,
+        destination: Destination,
+        format: str = CSV,
+        columns: Optional[Sequence[str]] = None,
+        chunk_size: int = CHUNK_SIZE,
+        progress: Optional[Callable[[int], Any]] = None,
+    ) -> int:
+        """
+        Export all your invoices to a CSV, JSON lines or Parquet file (with
+        pyarrow), streaming them, so the memory used doesn't grow with the
+        number of invoices. Returns the number of invoices exported.
+        * destination: A path, or an open file.
+        * format: `"csv"`, `"jsonl"` or `"parquet"`.
+        * columns: Exported fields, `DEFAULT_COLUMNS` by default. The metadata
+        values are selected as `metadata.<key>`, nested keys separated by dots.
+        * progress: Called with the number of invoices written so far.
+        """
+        return await export_invoices(
+            self, destination, format, columns, chunk_size, progress
+        )
+
+    async def sweep_invoices(
+        self,
+        action: str = "cancel",
+        statuses: Collection[str] = ("pending",),
+        older_than: float = 0.0,
+        **kwargs: Any,
+    ) -> dict:
+        """
+        Cancel or delete, in bulk, the invoices in `statuses` created more than
+        `older_than` seconds ago. See `AsyncInvoiceSweeper` for the options,
+        like `checkpoint`, to resume an interrupted sweep.
+        """
+        sweeper = AsyncInvoiceSweeper(self, action, statuses, older_than, **kwargs)
+        return await sweeper.sweep()
+
+    async def bulk(
+        self,
+        function: Callable[[T], Any],
+        items: Iterable[T],
+        limiter: Optional[AsyncConcurrencyLimiter] = None,
+    ) -> List[Any]:
+        """
+        Call `function` on every item, concurrently, adapting the concurrency
+        to what the API tolerates. Returns the results in order, with the
+        exceptions of the failed items.
+        """
+        return await bulk(function, items, limiter or self.limiter)
+
+    async def create_invoices(
+        self, invoices: Iterable[dict]
+    ) -> List[Union[Invoice, Exception]]:
+        """
+        Create invoices concurrently, each given by the arguments of
+        `create_invoice`
+        """
+
+        async def create(invoice: dict) -> Invoice:
+            return await self.create_invoice(**invoice)
+
+        return await self.bulk(create, invoices)
+
+    async def get_invoices_by_number(
+        self, numbers: Iterable[str]
+    ) -> List[Union[Invoice, Exception]]:
+        """
+        Get invoices details concurrently
+        """
+        return await self.bulk(self.get_invoice, numbers)
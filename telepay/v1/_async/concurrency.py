@@ -0,0 +1,106 @@
+import logging
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, TypeVar
+
+from .._backends import AsyncBackend
+from ..concurrency import AdaptiveLimit
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class AsyncSlot:
+    """
+    A call holding a place in the limiter, released with its outcome
+    """
+
+    def __init__(self, limiter: "AsyncConcurrencyLimiter") -> None:
+        self.limiter = limiter
+        self.started = 0.0
+
+    async def __aenter__(self) -> "AsyncSlot":
+        await self.limiter.acquire()
+        self.started = AsyncBackend.time()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
+        # released even when the call is cancelled, or the place would leak
+        with AsyncBackend.shield():
+            await self.limiter.release(AsyncBackend.time() - self.started, exc_val)
+
+
+class AsyncConcurrencyLimiter:
+    """
+    Bounds the calls running at the same time to an adaptive limit, so bulk
+    operations find the highest concurrency the API tolerates. Share one
+    limiter between the operations hitting the same API.
+    """
+
+    def __init__(self, limit: Optional[AdaptiveLimit] = None) -> None:
+        self.limit = limit or AdaptiveLimit()
+        self.in_flight = 0
+        self._condition = AsyncBackend.condition()
+
+    async def acquire(self) -> None:
+        async with self._condition:
+            while self.in_flight >= self.limit.current:
+                await self._condition.wait()
+            self.in_flight += 1
+
+    async def release(
+        self, seconds: float, error: Optional[BaseException] = None
+    ) -> None:
+        async with self._condition:
+            self.in_flight -= 1
+            self.limit.update(seconds, error)
+            self._condition.notify_all()
+
+    def slot(self) -> AsyncSlot:
+        return AsyncSlot(self)
+
+    def stats(self) -> dict:
+        return {
+            "limit": self.limit.current,
+            "in_flight": self.in_flight,
+            "latency": self.limit.latency,
+        }
+
+
+async def bulk(
+    function: Callable[[T], Any],
+    items: Iterable[T],
+    limiter: Optional[AsyncConcurrencyLimiter] = None,
+) -> List[Any]:
+    """
+    Call `function` on every item, concurrently within the limits of
+    `limiter`. Returns the results in the order of the items, with the
+    exception raised for the items that failed.
+    """
+    limiter = limiter or AsyncConcurrencyLimiter()
+    pending = enumerate(items)
+    lock = threading.Lock()
+    results: Dict[int, Any] = {}
+
+    def take() -> Optional[Tuple[int, T]]:
+        with lock:
+            return next(pending, None)
+
+    async def worker() -> None:
+        while True:
+            task = take()
+            if task is None:
+                return
+            index, item = task
+            try:
+                async with limiter.slot():
+                    results[index] = await function(item)
+            except Exception as e:
+                logger.debug(f"Bulk call {index} failed: {e!r}")
+                results[index] = e
+
+    workers = limiter.limit.max_limit
+    async with AsyncBackend.task_group(workers) as group:
+        for _ in range(workers):
+            group.start_soon(worker)
+    return [results[index] for index in range(len(results))]
@@ -0,0 +1,590 @@
+import copy
+import json
+import logging
+import random
+import threading
+from collections import deque
+from dataclasses import replace
+from typing import Any, Collection, Deque, Dict, Optional, Set, Tuple
+
+from httpx import (
+    ConnectError,
+    ConnectTimeout,
+    PoolTimeout,
+    TimeoutException,
+    TransportError,
+)
+
+from .. import deadlines
+from .._backends import AsyncBackend
+from ..balances import BalanceCache, WalletKey, wallet_key
+from ..circuit import CircuitBreaker, CircuitPolicy
+from ..concurrency import TokenBucket
+from ..endpoints import GET_BALANCE, GET_INVOICES, TRANSFER, WITHDRAW, RequestContext
+from ..errors import TelePayError
+from ..idempotency import (
+    IDEMPOTENCY_KEY,
+    IDEMPOTENCY_KEY_ENDPOINTS,
+    IDEMPOTENCY_KEY_HEADER,
+    PAYOUT_ENDPOINTS,
+    RECOVERABLE_ENDPOINTS,
+    SUCCEEDED,
+    IdempotencyRecord,
+    IdempotencyStore,
+    MemoryIdempotencyStore,
+    outcome_unknown,
+)
+from ..tracing import client_span, inject_metadata
+from ..waiters import InvoiceWaiters
+from .pipeline import AsyncMiddleware, Handler
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class AsyncTracingMiddleware(AsyncMiddleware):
+    """
+    Opens a span per client call. With `trace_metadata`, the trace context is
+    stored in the metadata of the created invoices.
+    """
+
+    def __init__(self, trace_metadata: bool = False) -> None:
+        self.trace_metadata = trace_metadata
+
+    async def __call__(self, context: RequestContext, call_next: Handler) -> Any:
+        endpoint = context.endpoint
+        with client_span(endpoint.operation, endpoint.name):
+            if self.trace_metadata and endpoint.name == "createInvoice":
+                context.json = {
+                    **context.json,
+                    "metadata": inject_metadata(context.json.get("metadata")),
+                }
+            return await call_next(context)
+
+
+class AsyncDeadlineMiddleware(AsyncMiddleware):
+    """
+    Enforces the deadline set with `deadline()`: the outstanding work is
+    cancelled when it's exceeded, and TelePayError `deadline.exceeded` raised.
+    """
+
+    async def __call__(self, context: RequestContext, call_next: Handler) -> Any:
+        remaining = deadlines.remaining()
+        if remaining is None:
+            return await call_next(context)
+        if remaining <= 0:
+            raise deadlines.deadline_exceeded(context.endpoint.name)
+        try:
+            with AsyncBackend.fail_after(remaining):
+                return await call_next(context)
+        except (TimeoutError, TimeoutException) as e:
+            if deadlines.expired():
+                raise deadlines.deadline_exceeded(context.endpoint.name) from e
+            raise
+
+
+class AsyncRetryMiddleware(AsyncMiddleware):
+    """
+    Retries failed calls to idempotent endpoints, on transport errors and
+    retryable statuses, with exponential backoff and full jitter. A
+    `Retry-After` header is honoured. No retry is made when the wait would
+    exceed the deadline. `create_invoice` calls with an idempotency key are
+    retried too, as the invoice created by a lost attempt is looked up.
+    Transfers and withdrawals are never retried.
+    """
+
+    def __init__(
+        self,
+        attempts: int = 3,
+        backoff: float = 0.5,
+        max_backoff: float = 10.0,
+        statuses: Collection[int] = RETRY_STATUSES,
+        idempotent_only: bool = True,
+    ) -> None:
+        self.attempts = attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.statuses = statuses
+        self.idempotent_only = idempotent_only
+
+    def delay(self, attempt: int, error: Optional[TelePayError] = None) -> float:
+        if error is not None and error.retry_after is not None:
+            return error.retry_after
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2**attempt))
+
+    async def __call__(self, context: RequestContext, call_next: Handler) -> Any:
+        endpoint = context.endpoint
+        if endpoint.name in PAYOUT_ENDPOINTS or (
+            self.idempotent_only
+            and not endpoint.idempotent
+            and not (
+                endpoint.name in RECOVERABLE_ENDPOINTS
+                and "idempotency_key" in context.options
+            )
+        ):
+            return await call_next(context)
+        while True:
+            try:
+                return await call_next(context)
+            except TelePayError as e:
+                if e.status_code not in self.statuses:
+                    raise
+                if context.attempt + 1 >= self.attempts:
+                    raise
+                delay = self.delay(context.attempt, e)
+                if not deadlines.allows(delay):
+                    raise
+            except TransportError:
+                if context.attempt + 1 >= self.attempts:
+                    raise
+                delay = self.delay(context.attempt)
+                if not deadlines.allows(delay):
+                    raise
+            logger.debug(
+                f"Retrying {context.endpoint.name} in {delay:.2f}s "
+                f"(attempt {context.attempt + 1})"
+            )
+            context.attempt += 1
+            await AsyncBackend.sleep(delay)
+
+
+class AsyncRateLimitMiddleware(AsyncMiddleware):
+    """
+    Token bucket limiting the calls to `rate` per second, with bursts of up
+    to `burst` calls. Calls wait for their turn instead of failing.
+    """
+
+    def __init__(self, rate: float, burst: int = 1) -> None:
+        self.bucket = TokenBucket(rate, burst)
+
+    def reserve(self) -> float:
+        return self.bucket.reserve()
+
+    async def __call__(self, context: RequestContext, call_next: Handler) -> Any:
+        delay = self.reserve()
+        if delay:
+            await AsyncBackend.sleep(delay)
+        return await call_next(context)
+
+
+class AsyncCacheMiddleware(AsyncMiddleware):
+    """
+    Caches the responses of idempotent endpoints for `ttl` seconds. Only the
+    endpoints named in `endpoints` are cached, like `{"getAssets"}`. Every
+    call gets its own copy of the response, and at most `max_size` responses
+    are kept, evicting the oldest.
+    """
+
+    def __init__(
+        self,
+        ttl: float = 60.0,
+        endpoints: Collection[str] = ("getAssets", "getAsset"),
+        max_size: int = 256,
+    ) -> None:
+        self.ttl = ttl
+        self.endpoints = set(endpoints)
+        self.max_size = max_size
+        self._cache: Dict[Tuple[str, str, str], Tuple[float, Any]] = {}
+        # the sync client calls it from the threads of its bulk calls
+        self._lock = threading.Lock()
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._cache.clear()
+
+    def _get(self, key: Tuple[str, str, str]) -> Optional[Any]:
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is None:
+                return None
+            if cached[0] <= AsyncBackend.time():
+                self._cache.pop(key, None)
+                return None
+            return cached[1]
+
+    def _store(self, key: Tuple[str, str, str], result: Any) -> None:
+        result = copy.deepcopy(result)
+        with self._lock:
+            now = AsyncBackend.time()
+            self._cache.pop(key, None)
+            if len(self._cache) >= self.max_size:
+                for stale in [
+                    k for k, (expires, _) in self._cache.items() if expires <= now
+                ]:
+                    self._cache.pop(stale, None)
+            while self._cache and len(self._cache) >= self.max_size:
+                self._cache.pop(next(iter(self._cache)), None)
+            self._cache[key] = (now + self.ttl, result)
+
+    async def __call__(self, context: RequestContext, call_next: Handler) -> Any:
+        endpoint = context.endpoint
+        if endpoint.name not in self.endpoints or not endpoint.idempotent:
+            return await call_next(context)
+        key = (
+            endpoint.method,
+            context.url,
+            json.dumps(context.json, sort_keys=True, default=str),
+        )
+        cached = self._get(key)
+        if cached is not None:
+            return copy.deepcopy(cached)
+        result = await call_next(context)
+        self._store(key, result)
+        return result
+
+
+class AsyncBalanceCacheMiddleware(AsyncMiddleware):
+    """
+    Serves `get_balance` from a `BalanceCache`, while its wallets are fresh.
+    Concurrent calls missing the cache for the same wallet, or all of them,
+    share a single refresh. Transfers and withdrawals invalidate the wallet
+    they debit, and so do the completed invoices published by the webhook
+    listeners to `waiters`, when given. The cache hits return the same
+    parsed `Wallets`, until the cache changes: don't modify them.
+    """
+
+    def __init__(
+        self,
+        cache: Optional[BalanceCache] = None,
+        waiters: Optional[InvoiceWaiters] = None,
+    ) -> None:
+        self.cache = cache or BalanceCache()
+        # by wallet, or None for all of them
+        self._refreshes: Dict[Optional[WalletKey], Any] = {}
+        self._parsed: Dict[Optional[WalletKey], Tuple[int, Any]] = {}
+        if waiters is not None:
+            waiters.subscribe(self.cache)
+
+    def _refresh(self, key: Optional[WalletKey]) -> Any:
+        refresh = self._refreshes.get(key)
+        if refresh is None:
+            refresh = self._refreshes.setdefault(key, AsyncBackend.condition())
+        return refresh
+
+    async def __call__(self, context: RequestContext, call_next: Handler) -> Any:
+        endpoint = context.endpoint
+        if endpoint.name in (TRANSFER.name, WITHDRAW.name):
+            try:
+                return await call_next(context)
+            finally:
+                # debited, or maybe debited when it failed
+                self.cache.invalidate(wallet_key(context.json))
+        if endpoint.name != GET_BALANCE.name:
+            return await call_next(context)
+        key = wallet_key(context.json) if context.json else None
+        version = self.cache.version
+        wallets = self.cache.get(key)
+        if wallets is None:
+            async with self._refresh(key):
+                # refreshed by another call while this one waited
+                version = self.cache.version
+                wallets = self.cache.get(key, record=False)
+                if wallets is None:
+                    generation = self.cache.generation
+                    await call_next(context)
+                    wallets = context.response["wallets"]
+                    self.cache.update(wallets, key is None, generation)
+                    context.response = {"wallets": wallets}
+                    return endpoint.parse(context.response)
+        parsed = self._parsed.get(key)
+        if parsed is not None and parsed[0] == version:
+            return parsed[1]
+        context.response = {"wallets": wallets}
+        result = endpoint.parse(context.response)
+        # parsed once per version of the cache
+        self._parsed[key] = (version, result)
+        return result
+
+
+class AsyncHedgingMiddleware(AsyncMiddleware):
+    """
+    Sends a second request when an idempotent GET takes longer than the
+    `percentile` of its recent latencies, and uses whichever response comes
+    first, cancelling the other. Until `min_samples` latencies are known,
+    `initial_delay` is used. Hedges are capped, across endpoints, to
+    `max_extra_load` of the calls. With the sync client, the losing request
+    can't be cancelled: it runs to completion, or its timeout, in a bounded
+    pool of threads, and no hedge is sent while that pool is busy.
+    * endpoints: Endpoint names to hedge, or None for every idempotent GET.
+    """
+
+    def __init__(
+        self,
+        percentile: float = 95.0,
+        initial_delay: float = 1.0,
+        min_delay: float = 0.01,
+        max_extra_load: float = 0.05,
+        endpoints: Optional[Collection[str]] = ("getInvoice",),
+        window: int = 200,
+        min_samples: int = 20,
+    ) -> None:
+        self.percentile = percentile
+        self.initial_delay = initial_delay
+        self.min_delay = min_delay
+        self.max_extra_load = max_extra_load
+        self.endpoints = set(endpoints) if endpoints is not None else None
+        self.window = window
+        self.min_samples = min_samples
+        self.calls = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self._latencies: Dict[str, Deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def hedged(self, context: RequestContext) -> bool:
+        endpoint = context.endpoint
+        if endpoint.method != "GET" or not endpoint.idempotent:
+            return False
+        return self.endpoints is None or endpoint.name in self.endpoints
+
+    def delay(self, endpoint: str) -> float:
+        """
+        How long to wait for the first request before hedging it
+        """
+        with self._lock:
+            latencies = sorted(self._latencies.get(endpoint, ()))
+        if not latencies or len(latencies) < self.min_samples:
+            return self.initial_delay
+        index = min(len(latencies) - 1, int(len(latencies) * self.percentile / 100))
+        return max(self.min_delay, latencies[index])
+
+    def observe(self, endpoint: str, seconds: float) -> None:
+        with self._lock:
+            latencies = self._latencies.get(endpoint)
+            if latencies is None:
+                latencies = self._latencies[endpoint] = deque(maxlen=self.window)
+            latencies.append(seconds)
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.hedges + 1 > self.max_extra_load * self.calls:
+                return False
+            self.hedges += 1
+            return True
+
+    async def __call__(self, context: RequestContext, call_next: Handler) -> Any:
+        if not self.hedged(context):
+            return await call_next(context)
+        name = context.endpoint.name
+        with self._lock:
+            self.calls += 1
+        delay = self.delay(name)
+
+        async def call(hedged: bool) -> Any:
+            started = AsyncBackend.time()
+            attempt = replace(context, options=dict(context.options))
+            try:
+                result = await call_next(attempt)
+            except Exception:
+                raise
+            except BaseException:
+                # cancelled as the other request answered first: recording it
+                # as at least the delay keeps the slow requests in the latencies
+                self.observe(name, max(delay, AsyncBackend.time() - started))
+                raise
+            context.response = attempt.response
+            self.observe(name, AsyncBackend.time() - started)
+            if hedged:
+                logger.debug(f"Hedged request to {name} answered first")
+                with self._lock:
+                    self.hedge_wins += 1
+            return result
+
+        return await AsyncBackend.hedge(call, delay, self.allow)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "hedges": self.hedges,
+                "hedge_wins": self.hedge_wins,
+            }
+
+
+class AsyncIdempotencyMiddleware(AsyncMiddleware):
+    """
+    Makes `createInvoice`, `transfer` and `withdraw` safe to call again with
+    the same idempotency key. The key is sent in the `Idempotency-Key` header,
+    stored in the metadata of the invoice, and the outcome recorded in
+    `store`:
+    * A call whose key already succeeded returns the recorded result.
+    * When the outcome of an invoice creation is unknown, like after a
+    timeout, the invoice created with the key is looked up before creating it
+    again.
+    * Transfers and withdrawals whose outcome is unknown are never sent
+    again: TelePayError `payout.outcome-unknown` is raised until the key is
+    forgotten. They raise it without a key too.
+    * API errors, which mean the operation wasn't performed, forget the key:
+    `4xx`, and `5xx` with an error body. A `5xx` without one, like from a
+    proxy, is an unknown outcome.
+    """
+
+    def __init__(self, store: Optional[IdempotencyStore] = None) -> None:
+        self.store = store if store is not None else MemoryIdempotencyStore()
+        self._in_flight: Set[str] = set()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def performed(error: Exception) -> bool:
+        """
+        Whether the operation may have been performed, despite the error
+        """
+        if isinstance(error, TelePayError):
+            if error.status_code >= 500:
+                # the API answered with an error body when it rejected it
+                return not isinstance(error.error, str)
+            # 4xx, like 429, are rejected before being processed; 0 are
+            # raised by the client during the call
+            return error.status_code == 0
+        # the request never reached the API
+        return not isinstance(error, (ConnectError, ConnectTimeout, PoolTimeout))
+
+    def forget(self, key: str) -> None:
+        """
+        Forget a key whose outcome is unknown, once you checked that the
+        operation wasn't performed, so it can be sent again
+        """
+        self.store.delete(key)
+
+    async def find_invoice(self, key: str, call_next: Handler) -> Optional[dict]:
+        lookup = RequestContext(GET_INVOICES, GET_INVOICES.url())
+        await call_next(lookup)
+        for invoice in lookup.response.get("invoices", []):
+            metadata = invoice.get("metadata")
+            if isinstance(metadata, dict) and metadata.get(IDEMPOTENCY_KEY) == key:
+                return invoice
+        return None
+
+    async def __call__(self, context: RequestContext, call_next: Handler) -> Any:
+        endpoint = context.endpoint
+        key = context.options.get("idempotency_key")
+        if endpoint.name not in IDEMPOTENCY_KEY_ENDPOINTS:
+            return await call_next(context)
+        if key is None:
+            return await self._send(context, None, call_next)
+        with self._lock:
+            if key in self._in_flight:
+                raise TelePayError(
+                    status_code=0,
+                    error="idempotency.in-progress",
+                    message=f"A call with the idempotency key {key} is in progress",
+                )
+            self._in_flight.add(key)
+        try:
+            return await self._call(context, key, call_next)
+        finally:
+            with self._lock:
+                self._in_flight.discard(key)
+
+    async def _call(self, context: RequestContext, key: str, call_next: Handler):
+        endpoint = context.endpoint
+        record = self.store.get(key)
+        if record is not None:
+            if record.endpoint != endpoint.name:
+                raise TelePayError(
+                    status_code=0,
+                    error="idempotency.key-reused",
+                    message=f"The idempotency key {key} was used for "
+                    f"{record.endpoint}",
+                )
+            if record.status == SUCCEEDED:
+                logger.debug(f"Returning the recorded result of {key}")
+                return endpoint.parse(record.response)
+            if endpoint.name in PAYOUT_ENDPOINTS:
+                raise outcome_unknown(endpoint.name, key)
+            invoice = await self.find_invoice(key, call_next)
+            if invoice is not None:
+                logger.debug(f"Found the invoice created with {key}")
+                self.store.put(
+                    IdempotencyRecord(key, endpoint.name, SUCCEEDED, invoice)
+                )
+                return endpoint.parse(invoice)
+        else:
+            self.store.put(IdempotencyRecord(key, endpoint.name))
+
+        request = dict(context.options.get("request", {}))
+        request["headers"] = {
+            **request.get("headers", {}),
+            IDEMPOTENCY_KEY_HEADER: key,
+        }
+        context.options["request"] = request
+        if endpoint.name == "createInvoice":
+            # to find the invoice when the outcome of its creation is unknown
+            context.json = {
+                **context.json,
+                "metadata": {
+                    **(context.json.get("metadata") or {}),
+                    IDEMPOTENCY_KEY: key,
+                },
+            }
+        result = await self._send(context, key, call_next)
+        self.store.put(
+            IdempotencyRecord(key, endpoint.name, SUCCEEDED, context.response)
+        )
+        return result
+
+    async def _send(
+        self, context: RequestContext, key: Optional[str], call_next: Handler
+    ) -> Any:
+        endpoint = context.endpoint
+        try:
+            return await call_next(context)
+        except (TelePayError, TransportError) as e:
+            if not self.performed(e):
+                if key is not None:
+                    self.store.delete(key)
+                raise
+            if endpoint.name in PAYOUT_ENDPOINTS:
+                logger.warning(f"The outcome of the {endpoint.name} is unknown: {e!r}")
+                status_code = e.status_code if isinstance(e, TelePayError) else 0
+                raise outcome_unknown(endpoint.name, key, status_code) from e
+            raise
+
+
+class AsyncCircuitBreakerMiddleware(AsyncMiddleware):
+    """
+    Fails fast, with TelePayError `circuit.open`, the calls to an endpoint
+    whose recent calls mostly failed or were slow, until probe calls succeed
+    again. Transport errors, `429` and `5xx` responses count as failures.
+    """
+
+    def __init__(
+        self,
+        policy: Optional[CircuitPolicy] = None,
+        policies: Optional[Dict[str, CircuitPolicy]] = None,
+        breaker: Optional[CircuitBreaker] = None,
+    ) -> None:
+        self.breaker = breaker or CircuitBreaker(policy, policies)
+
+    @staticmethod
+    def failed(error: Exception) -> bool:
+        if isinstance(error, TelePayError):
+            return error.status_code >= 500 or error.status_code == 429
+        return isinstance(error, (TransportError, TimeoutError))
+
+    async def __call__(self, context: RequestContext, call_next: Handler) -> Any:
+        name = context.endpoint.name
+        self.breaker.acquire(name)
+        started = AsyncBackend.time()
+        try:
+            result = await call_next(context)
+        except Exception as e:
+            if self.failed(e):
+                self.breaker.record(name, True, AsyncBackend.time() - started)
+            elif isinstance(e, TelePayError) and e.status_code:
+                self.breaker.record(name, False, AsyncBackend.time() - started)
+            else:
+                self.breaker.release(name)
+            raise
+        except BaseException:
+            self.breaker.release(name)
+            raise
+        self.breaker.record(name, False, AsyncBackend.time() - started)
+        return result
+
+    def stats(self) -> Dict[str, dict]:
+        """
+        State, failure and slow call rates of each endpoint's circuit
+        """
+        return self.breaker.snapshot()
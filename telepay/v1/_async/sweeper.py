@@ -0,0 +1,111 @@
+import logging
+from collections import Counter
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Collection, Optional, Union
+
+from .._backends import AsyncBackend
+from ..concurrency import AdaptiveLimit, TokenBucket
+from ..endpoints import GET_INVOICES
+from ..errors import TelePayError
+from ..sweeper import CANCEL, DELETE, SETTLED_ERRORS, SweepCheckpoint, select_invoices
+from .concurrency import AsyncConcurrencyLimiter
+
+if TYPE_CHECKING:
+    from .client import TelePayAsyncClient
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncInvoiceSweeper:
+    """
+    Cancels or deletes, in bulk, the invoices in `statuses` created more than
+    `older_than` seconds ago.
+    * action: `"cancel"` or `"delete"`.
+    * concurrency: Maximum calls at the same time; the concurrency adapts
+    below it to what the API tolerates.
+    * rate: Maximum calls per second, if any.
+    * checkpoint: File recording the progress, to resume an interrupted sweep.
+    * progress: Called with the number of invoices processed, after each one.
+    """
+
+    def __init__(
+        self,
+        client: "TelePayAsyncClient",
+        action: str = CANCEL,
+        statuses: Collection[str] = ("pending",),
+        older_than: float = 0.0,
+        concurrency: int = 8,
+        rate: Optional[float] = None,
+        checkpoint: Optional[Union[str, Path]] = None,
+        progress: Optional[Callable[[int], Any]] = None,
+    ) -> None:
+        if action not in (CANCEL, DELETE):
+            raise ValueError(f"Unknown sweep action {action}")
+        self.client = client
+        self.action = action
+        self.statuses = statuses
+        self.older_than = older_than
+        self.limiter = AsyncConcurrencyLimiter(
+            AdaptiveLimit(initial=concurrency, max_limit=concurrency)
+        )
+        self.bucket = TokenBucket(rate, burst=concurrency) if rate else None
+        self.checkpoint = SweepCheckpoint(checkpoint) if checkpoint else None
+        self.progress = progress
+        self.counts: Counter = Counter()
+
+    async def select(self) -> list:
+        response = await self.client._request_json(GET_INVOICES)
+        return select_invoices(
+            response.get("invoices", []), self.statuses, self.older_than
+        )
+
+    async def _sweep(self, number: str) -> None:
+        if self.bucket is not None:
+            delay = self.bucket.reserve()
+            if delay:
+                await AsyncBackend.sleep(delay)
+        try:
+            if self.action == CANCEL:
+                await self.client.cancel_invoice(number)
+            else:
+                await self.client.delete_invoice(number)
+            self.counts["swept"] += 1
+        except TelePayError as e:
+            if e.error not in SETTLED_ERRORS:
+                self.counts["failed"] += 1
+                raise
+            self.counts["skipped"] += 1
+        except Exception:
+            self.counts["failed"] += 1
+            raise
+        finally:
+            if self.progress is not None:
+                self.progress(
+                    sum(self.counts[key] for key in ("swept", "skipped", "failed"))
+                )
+        if self.checkpoint is not None:
+            self.checkpoint.done(number)
+
+    async def sweep(self) -> dict:
+        """
+        Sweep the invoices, returning how many were selected, swept, skipped
+        (already settled) and failed. The failed ones are retried when the
+        sweep is resumed.
+        """
+        resumed = self.checkpoint.load(self.action) if self.checkpoint else None
+        if resumed is not None:
+            numbers, done = resumed
+            self.counts["resumed"] = len(done)
+            numbers = [number for number in numbers if number not in done]
+        else:
+            numbers = await self.select()
+            if self.checkpoint is not None:
+                self.checkpoint.start(self.action, numbers)
+        self.counts["selected"] = len(numbers)
+        logger.debug(f"Sweeping {len(numbers)} invoices ({self.action})")
+        results = await self.client.bulk(self._sweep, numbers, self.limiter)
+        if self.checkpoint is not None and not any(
+            isinstance(result, Exception) for result in results
+        ):
+            self.checkpoint.finish()
+        return dict(self.counts)
@@ -0,0 +1,119 @@
+import logging
+import threading
+from contextlib import nullcontext
+from typing import TYPE_CHECKING, Any, Collection, Optional
+
+from .. import deadlines
+from .._backends import AsyncBackend
+from ..endpoints import GET_INVOICES
+from ..models.invoice import Invoice
+from ..waiters import FINAL_STATUSES, InvoiceWaiters
+
+if TYPE_CHECKING:
+    from .client import TelePayAsyncClient
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncInvoiceWaiter:
+    """
+    Waits for invoices to reach a status. The invoices are resolved by the
+    webhook events published to `waiters` and, when no webhook listener runs,
+    by polling `getInvoices`, once for all the waits in progress. The polling
+    interval grows from `min_interval` to `max_interval` while the invoices
+    don't change. With a listener, the API is still polled every
+    `listener_interval`, in case an event is lost.
+    """
+
+    def __init__(
+        self,
+        client: "TelePayAsyncClient",
+        waiters: Optional[InvoiceWaiters] = None,
+        min_interval: float = 1.0,
+        max_interval: float = 30.0,
+        backoff: float = 1.5,
+        listener_interval: float = 60.0,
+        tick: float = 0.25,
+    ) -> None:
+        self.client = client
+        self.waiters = waiters if waiters is not None else InvoiceWaiters()
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.listener_interval = listener_interval
+        self.tick = tick
+        self.interval = min_interval
+        self.polls = 0
+        self._polled_at: Optional[float] = None
+        self._polling: Any = None
+        self._lock = threading.Lock()
+
+    def _next_poll(self) -> float:
+        """
+        Seconds until the API should be polled again
+        """
+        if self._polled_at is None:
+            return 0.0
+        interval = self.listener_interval if self.waiters.listening else self.interval
+        return self._polled_at + interval - AsyncBackend.time()
+
+    async def poll(self) -> None:
+        """
+        Fetch the invoices and publish the waited ones. Concurrent polls share
+        the same request.
+        """
+        with self._lock:
+            polling = self._polling
+            if polling is None:
+                self._polling = AsyncBackend.event()
+        if polling is not None:
+            await polling.wait()
+            return
+        try:
+            self.polls += 1
+            response = await self.client._request_json(GET_INVOICES)
+            changed = False
+            for invoice in response.get("invoices", []):
+                changed = self.waiters.publish(invoice) or changed
+            if changed:
+                self.interval = self.min_interval
+            else:
+                self.interval = min(self.max_interval, self.interval * self.backoff)
+        finally:
+            with self._lock:
+                self._polled_at = AsyncBackend.time()
+                polling, self._polling = self._polling, None
+            polling.set()
+
+    async def wait(
+        self,
+        number: str,
+        statuses: Collection[str] = FINAL_STATUSES,
+        timeout: Optional[float] = None,
+    ) -> Invoice:
+        self.waiters.register(number)
+        # a new wait polls quickly at first
+        self.interval = self.min_interval
+        try:
+            with deadlines.deadline(timeout) if timeout is not None else nullcontext():
+                while True:
+                    invoice = self.waiters.get(number)
+                    if invoice is not None:
+                        status = invoice.get("status")
+                        if status in statuses or status in FINAL_STATUSES:
+                            return Invoice.from_json(invoice)
+                    if deadlines.expired():
+                        raise deadlines.deadline_exceeded("wait_for_invoice")
+                    next_poll = self._next_poll()
+                    if next_poll <= 0:
+                        await self.poll()
+                        continue
+                    delay = next_poll
+                    if self.waiters.listening:
+                        delay = min(delay, self.tick)
+                    remaining = deadlines.remaining()
+                    if remaining is not None:
+                        delay = min(delay, max(remaining, 0.0))
+                    await AsyncBackend.sleep(delay)
+        finally:
+            self.waiters.unregister(number)
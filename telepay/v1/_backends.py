@@ -0,0 +1,277 @@
+import contextvars
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from contextlib import nullcontext
+from functools import partial
+from typing import Any, Awaitable, Callable, ContextManager, Deque, List, Optional
+
+import anyio
+
+# The code in `_async` only reaches the concurrency primitives through
+# `AsyncBackend`. When it is converted to `_sync`, `AsyncBackend` becomes
+# `SyncBackend`, which implements the same interface with threads.
+
+# threads shared by the task groups of the sync clients
+THREADS = 64
+# bound of the requests run by the sync hedges, as the losing ones can't be
+# cancelled and keep running until they finish or time out
+HEDGE_THREADS = 16
+
+_executor: Optional[ThreadPoolExecutor] = None
+_hedge_executor: Optional[ThreadPoolExecutor] = None
+_hedge_slots = threading.BoundedSemaphore(HEDGE_THREADS)
+_executor_lock = threading.Lock()
+
+
+def get_hedge_executor() -> ThreadPoolExecutor:
+    """
+    Threads running the hedged requests of the sync clients, created lazily
+    """
+    global _hedge_executor
+    with _executor_lock:
+        if _hedge_executor is None:
+            _hedge_executor = ThreadPoolExecutor(
+                HEDGE_THREADS, thread_name_prefix="telepay-hedge"
+            )
+        return _hedge_executor
+
+
+def _submit_hedge(call: Callable[[bool], Any], hedged: bool) -> Future:
+    """
+    Run `call(hedged)` in a hedge thread, releasing the slot acquired for it
+    once it finishes
+    """
+    future = get_hedge_executor().submit(contextvars.copy_context().run, call, hedged)
+    future.add_done_callback(lambda _: _hedge_slots.release())
+    return future
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """
+    Threads running the task groups of the sync clients, created lazily
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(THREADS, thread_name_prefix="telepay")
+        return _executor
+
+
+class ThreadTaskGroup:
+    """
+    Task group running up to `size` of its tasks at a time, in the shared
+    threads of `get_executor`, and waiting for all of them on exit. The first
+    error of the tasks is raised. The tasks that no thread picked up by then
+    run in the exiting thread, so nested groups can't exhaust the threads.
+    """
+
+    def __init__(self, size: int) -> None:
+        self.size = size
+        self._runners: List[Future] = []
+        self._tasks: Deque[Callable[[], Any]] = deque()
+        self._errors: List[Exception] = []
+        self._lock = threading.Lock()
+
+    def __enter__(self) -> "ThreadTaskGroup":
+        return self
+
+    def start_soon(self, function: Callable[..., Any], *args: Any) -> None:
+        task = partial(contextvars.copy_context().run, function, *args)
+        with self._lock:
+            self._tasks.append(task)
+            if len(self._runners) < self.size:
+                self._runners.append(get_executor().submit(self._run))
+
+    def _run(self) -> None:
+        while True:
+            with self._lock:
+                if not self._tasks:
+                    return
+                task = self._tasks.popleft()
+            try:
+                task()
+            except Exception as e:
+                self._errors.append(e)
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        for runner in self._runners:
+            if runner.cancel():
+                self._run()
+        wait(self._runners)
+        if exc_type is None and self._errors:
+            raise self._errors[0]
+
+
+class LimitedTaskGroup:
+    """
+    anyio task group running up to `size` of its tasks at a time
+    """
+
+    def __init__(self, size: int) -> None:
+        self._limiter = anyio.CapacityLimiter(size)
+        self._group = anyio.create_task_group()
+
+    async def __aenter__(self) -> "LimitedTaskGroup":
+        await self._group.__aenter__()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb) -> Optional[bool]:
+        return await self._group.__aexit__(exc_type, exc_val, exc_tb)
+
+    def start_soon(self, function: Callable[..., Awaitable[Any]], *args: Any) -> None:
+        async def run() -> None:
+            async with self._limiter:
+                await function(*args)
+
+        self._group.start_soon(run)
+
+
+class AsyncBackend:
+    @staticmethod
+    async def sleep(seconds: float) -> None:
+        await anyio.sleep(seconds)
+
+    @staticmethod
+    def fail_after(seconds: float) -> ContextManager:
+        """
+        Cancel the work of the block, raising TimeoutError, after `seconds`
+        """
+        return anyio.fail_after(seconds)
+
+    @staticmethod
+    def time() -> float:
+        return time.monotonic()
+
+    @staticmethod
+    def condition() -> anyio.Condition:
+        return anyio.Condition()
+
+    @staticmethod
+    def event() -> anyio.Event:
+        return anyio.Event()
+
+    @staticmethod
+    async def wait(event: anyio.Event, timeout: float) -> None:
+        """
+        Wait until the event is set, or `timeout` seconds
+        """
+        with anyio.move_on_after(timeout):
+            await event.wait()
+
+    @staticmethod
+    def task_group(size: int) -> LimitedTaskGroup:
+        """
+        Task group running up to `size` tasks at a time
+        """
+        return LimitedTaskGroup(size)
+
+    @staticmethod
+    def shield() -> ContextManager:
+        """
+        Protect the block from cancellation, for cleanups that must complete
+        """
+        return anyio.CancelScope(shield=True)
+
+    @staticmethod
+    async def hedge(
+        call: Callable[[bool], Awaitable[Any]],
+        delay: float,
+        allow: Callable[[], bool],
+    ) -> Any:
+        """
+        Run `call(False)`, and `call(True)` too if it hasn't finished after
+        `delay` seconds and `allow()`. The first result is returned and the
+        other call cancelled; when both fail, the first error is raised.
+        """
+        results: List[Any] = []
+        errors: List[Exception] = []
+        failed = anyio.Event()
+
+        async with anyio.create_task_group() as task_group:
+
+            async def run(hedged: bool) -> None:
+                try:
+                    result = await call(hedged)
+                except Exception as e:
+                    errors.append(e)
+                    failed.set()
+                else:
+                    results.append(result)
+                    task_group.cancel_scope.cancel()
+
+            task_group.start_soon(run, False)
+            with anyio.move_on_after(delay):
+                await failed.wait()
+            if not failed.is_set() and allow():
+                task_group.start_soon(run, True)
+
+        if results:
+            return results[0]
+        raise errors[0]
+
+
+class SyncBackend:
+    @staticmethod
+    def sleep(seconds: float) -> None:
+        time.sleep(seconds)
+
+    @staticmethod
+    def fail_after(seconds: float) -> ContextManager:
+        # a no-op: blocking calls can't be cancelled, they are bounded by the
+        # request timeouts, clamped to the deadline, instead
+        return nullcontext()
+
+    @staticmethod
+    def time() -> float:
+        return time.monotonic()
+
+    @staticmethod
+    def condition() -> threading.Condition:
+        return threading.Condition()
+
+    @staticmethod
+    def event() -> threading.Event:
+        return threading.Event()
+
+    @staticmethod
+    def wait(event: threading.Event, timeout: float) -> None:
+        event.wait(timeout)
+
+    @staticmethod
+    def task_group(size: int) -> ThreadTaskGroup:
+        return ThreadTaskGroup(size)
+
+    @staticmethod
+    def shield() -> ContextManager:
+        # threads are never cancelled
+        return nullcontext()
+
+    @staticmethod
+    def hedge(
+        call: Callable[[bool], Any], delay: float, allow: Callable[[], bool]
+    ) -> Any:
+        """
+        Like `AsyncBackend.hedge`, but the losing call can't be cancelled: it
+        finishes in the background, in a bounded pool of threads. While the
+        pool is busy, `call(False)` runs in the calling thread, without hedge.
+        """
+        if not _hedge_slots.acquire(blocking=False):
+            return call(False)
+        pending = {_submit_hedge(call, False)}
+        done, _ = wait(pending, timeout=delay)
+        if not done and _hedge_slots.acquire(blocking=False):
+            if allow():
+                pending.add(_submit_hedge(call, True))
+            else:
+                _hedge_slots.release()
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+                if error is None:
+                    error = future.exception()
+        raise error
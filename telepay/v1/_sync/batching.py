@@ -0,0 +1,215 @@
+import logging
+import threading
+from collections import Counter
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+
+from .._backends import SyncBackend
+from ..batching import (
+    CANCELLED,
+    FAILED,
+    QUEUED,
+    SENT,
+    TRANSFER,
+    UNKNOWN,
+    WITHDRAW,
+    BatchKey,
+    PayoutBatch,
+    PayoutRequest,
+)
+from ..concurrency import AdaptiveLimit
+from .concurrency import SyncConcurrencyLimiter
+
+if TYPE_CHECKING:
+    from .client import TelePaySyncClient
+
+logger = logging.getLogger(__name__)
+
+
+class SyncPayoutScheduler:
+    """
+    Queues withdrawals and transfers, and sends the ones to the same
+    destination and wallet, with the same message, as a single payout: once
+    the oldest has waited `window` seconds, or `max_size` are queued. Each
+    batch is sent once: when its outcome is unknown, like after a timeout,
+    its requests are `unknown` and it's up to you to check whether it was
+    paid.
+    * concurrency: Maximum batches sent at the same time.
+    * tick: Seconds between checks for due batches, in `run()`.
+    """
+
+    def __init__(
+        self,
+        client: "TelePaySyncClient",
+        window: float = 60.0,
+        max_size: int = 50,
+        concurrency: int = 4,
+        tick: float = 1.0,
+    ) -> None:
+        self.client = client
+        self.window = window
+        self.max_size = max_size
+        self.tick = tick
+        self.limiter = SyncConcurrencyLimiter(
+            AdaptiveLimit(initial=concurrency, max_limit=concurrency)
+        )
+        self.counts: Counter = Counter()
+        self._queues: Dict[BatchKey, List[PayoutRequest]] = {}
+        self._lock = threading.Lock()
+        # created by run(), in the event loop
+        self._wake: Any = None
+        self._stopped = False
+
+    def _queue(self, key: BatchKey, amount: float) -> PayoutRequest:
+        if not amount > 0:
+            raise ValueError(f"The amount of a payout must be positive, got {amount}")
+        request = PayoutRequest(key, amount, SyncBackend.time())
+        with self._lock:
+            queue = self._queues.setdefault(key, [])
+            queue.append(request)
+            full = len(queue) >= self.max_size
+        self.counts["queued"] += 1
+        if full:
+            self.wake()
+        return request
+
+    def withdraw(
+        self,
+        to_address: str,
+        asset: str,
+        blockchain: str,
+        network: str,
+        amount: float,
+        message: Optional[str] = None,
+    ) -> PayoutRequest:
+        """
+        Queue a withdrawal, returning the request tracking its outcome
+        """
+        key = BatchKey(WITHDRAW, to_address, asset, blockchain, network, message)
+        return self._queue(key, amount)
+
+    def transfer(
+        self,
+        asset: str,
+        blockchain: str,
+        network: str,
+        amount: float,
+        username: str,
+        message: Optional[str] = None,
+    ) -> PayoutRequest:
+        """
+        Queue a transfer, returning the request tracking its outcome
+        """
+        key = BatchKey(TRANSFER, username, asset, blockchain, network, message)
+        return self._queue(key, amount)
+
+    def cancel(self, request: PayoutRequest) -> bool:
+        """
+        Remove a queued request from its batch. False when it's too late,
+        its batch being sent already.
+        """
+        with self._lock:
+            queue = self._queues.get(request.key, [])
+            if request.status != QUEUED or not any(r is request for r in queue):
+                return False
+            queue[:] = [r for r in queue if r is not request]
+            if not queue:
+                del self._queues[request.key]
+            request.status = CANCELLED
+        self.counts["cancelled"] += 1
+        return True
+
+    def pending(self) -> int:
+        with self._lock:
+            return sum(len(queue) for queue in self._queues.values())
+
+    def _due(self, force: bool) -> List[PayoutBatch]:
+        now = SyncBackend.time()
+        batches = []
+        with self._lock:
+            for key, queue in list(self._queues.items()):
+                if (
+                    force
+                    or len(queue) >= self.max_size
+                    or now - queue[0].queued_at >= self.window
+                ):
+                    batches.append(PayoutBatch(key, queue))
+                    del self._queues[key]
+        return batches
+
+    def _send(self, batch: PayoutBatch) -> None:
+        key, amount = batch.key, batch.amount
+        try:
+            if key.kind == WITHDRAW:
+                batch.result = self.client.withdraw(
+                    key.destination,
+                    key.asset,
+                    key.blockchain,
+                    key.network,
+                    amount,
+                    batch.message,
+                    idempotency_key=batch.idempotency_key,
+                )
+            else:
+                batch.result = self.client.transfer(
+                    key.asset,
+                    key.blockchain,
+                    key.network,
+                    amount,
+                    key.destination,
+                    batch.message,
+                    idempotency_key=batch.idempotency_key,
+                )
+        except Exception as e:
+            # the batch isn't sent again: it may have been paid
+            status = UNKNOWN if self.client.idempotency.performed(e) else FAILED
+            logger.debug(f"Payout batch {batch.idempotency_key} {status}: {e!r}")
+            batch.finish(status, e)
+            self.counts[status] += len(batch.requests)
+            raise
+        except BaseException:
+            # cancelled while sending
+            batch.finish(UNKNOWN)
+            self.counts[UNKNOWN] += len(batch.requests)
+            raise
+        batch.finish(SENT)
+        self.counts["sent"] += len(batch.requests)
+        self.counts["calls"] += 1
+
+    def flush(self, force: bool = True) -> List[PayoutBatch]:
+        """
+        Send the queued payouts, or only the due batches when not `force`,
+        returning the batches sent. The outcome of each payout is in its
+        request.
+        """
+        batches = self._due(force)
+        if batches:
+            logger.debug(f"Sending {len(batches)} payout batches")
+            self.client.bulk(self._send, batches, self.limiter)
+        return batches
+
+    def run(self) -> None:
+        """
+        Send the batches as they're due, until `stop()` is called
+        """
+        while not self._stopped:
+            self._wake = SyncBackend.event()
+            self.flush(force=False)
+            SyncBackend.wait(self._wake, self.tick)
+
+    def wake(self) -> None:
+        if self._wake is not None:
+            self._wake.set()
+
+    def stop(self) -> None:
+        self._stopped = True
+        self.wake()
+
+    def close(self) -> List[PayoutBatch]:
+        """
+        Stop the scheduler, and send all the queued payouts
+        """
+        self.stop()
+        return self.flush()
+
+    def stats(self) -> dict:
+        return {"pending": self.pending(), **self.counts}
@@ -1,21 +1,96 @@
 import logging
 from dataclasses import dataclass, field
-from typing import Union
+from typing import (
+    Any,
+    Callable,
+    Collection,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    TypeVar,
+    Union,
+)
 
+from httpx import Request, Response
 from httpx._config import Timeout
+from httpx._transports.base import BaseTransport
 from httpx._types import TimeoutTypes
 
-from ..auth import TelePayAuth
+from .._backends import SyncBackend
+from ..analytics import InvoiceColumns
+from ..auth import (
+    CredentialAuth,
+    CredentialChain,
+    CredentialProvider,
+    ExplicitCredentials,
+    TelePayAuth,
+    default_credentials,
+)
+from ..balances import BalanceCache
+from ..endpoints import (
+    ACTIVATE_WEBHOOK,
+    CANCEL_INVOICE,
+    CLIENT_DEFAULT,
+    CREATE_INVOICE,
+    CREATE_WEBHOOK,
+    DEACTIVATE_WEBHOOK,
+    DEFAULT_TIMEOUT,
+    DELETE_INVOICE,
+    DELETE_WEBHOOK,
+    GET_ASSET,
+    GET_ASSETS,
+    GET_BALANCE,
+    GET_INVOICE,
+    GET_INVOICES,
+    GET_ME,
+    GET_WALLET_BALANCE,
+    GET_WEBHOOK,
+    GET_WEBHOOKS,
+    GET_WITHDRAW_FEE,
+    GET_WITHDRAW_MINIMUM,
+    TRANSFER,
+    UPDATE_WEBHOOK,
+    WITHDRAW,
+    Endpoint,
+    RequestContext,
+    endpoint_timeouts,
+)
+from ..export import CHUNK_SIZE, CSV, Destination
+from ..feed import InvoiceFeed
 from ..http_clients import SyncClient
+from ..idempotency import IdempotencyStore
 from ..models.account import Account
 from ..models.assets import Asset, Assets
 from ..models.invoice import Invoice, InvoiceList
 from ..models.wallets import Wallet, Wallets
 from ..models.webhooks import Webhook, Webhooks
-from ..utils import validate_response
+from ..payouts import Payout, PayoutPlan
+from ..pool import InvoiceTier
+from ..stats import STREAMED, ClientStats
+from ..tracing import get_tracer, record_response
+from ..waiters import FINAL_STATUSES, InvoiceWaiters
+from .batching import SyncPayoutScheduler
+from .concurrency import SyncConcurrencyLimiter, bulk
+from .export import export_invoices
+from .middlewares import (
+    SyncBalanceCacheMiddleware,
+    SyncDeadlineMiddleware,
+    SyncIdempotencyMiddleware,
+    SyncTracingMiddleware,
+)
+from .payouts import SyncPayoutPlanner
+from .pipeline import SyncMiddleware, SyncPipeline
+from .pool import SyncInvoicePool
+from .sweeper import SyncInvoiceSweeper
+from .waiters import SyncInvoiceWaiter
 
 logger = logging.getLogger(__name__)
 
+T = TypeVar("T")
+
 
 @dataclass
 class TelePaySyncClient:
@@ -23,17 +98,82 @@ class TelePaySyncClient:
     Creates a TelePay client.
     * API_SECRET: Your merchant private API key.
     Any requests without this authentication key will result in error 403.
+    * timeouts: Timeouts by endpoint name, in seconds, like
+    `{"getInvoices": 300}`. Without a `timeout`, the other endpoints use
+    their default timeout, 15 seconds for the calls made while a customer
+    waits, including `create_invoice` and `get_invoice`, or 60 seconds.
+    Otherwise they use `timeout`, even when it's 60 seconds too.
+    * middlewares: Steps every call goes through, like retries or caching.
+    * idempotency_store: Where the outcomes of `create_invoice`, `transfer`
+    and `withdraw` are recorded, by idempotency key. In memory by default.
+    * limiter: Adaptive concurrency limit of the bulk operations.
+    * balance_max_age: When given, `get_balance` is served from a cache for
+    up to this many seconds, see `AsyncBalanceCacheMiddleware`.
+    * waiters: Where webhook listeners publish the invoices of their events,
+    to resolve `wait_for_invoice` and invalidate the balance cache: pass
+    `client.waiters` to the listener. Each client has its own by default.
     """
 
-    timeout: TimeoutTypes = field(default=Timeout(60))
+    timeout: TimeoutTypes = field(default_factory=lambda: Timeout(60))
 
-    def __init__(self, secret_api_key, timeout=Timeout(60)) -> None:
+    def __init__(
+        self,
+        secret_api_key: Optional[str] = None,
+        timeout=CLIENT_DEFAULT,
+        event_hooks: Optional[Dict[str, List[Callable]]] = None,
+        collect_stats: bool = True,
+        trace_metadata: bool = False,
+        credentials: Optional[CredentialProvider] = None,
+        transport: Optional[BaseTransport] = None,
+        middlewares: Sequence[SyncMiddleware] = (),
+        timeouts: Optional[Dict[str, float]] = None,
+        idempotency_store: Optional[IdempotencyStore] = None,
+        limiter: Optional[SyncConcurrencyLimiter] = None,
+        balance_max_age: Optional[float] = None,
+        waiters: Optional[InvoiceWaiters] = None,
+    ) -> None:
         self.base_url = "https://api.telepay.cash/rest/"
-        self.timeout = timeout
+        self.timeout = DEFAULT_TIMEOUT if timeout is CLIENT_DEFAULT else timeout
+        self.timeouts = endpoint_timeouts(timeout, timeouts)
+        self.trace_metadata = trace_metadata
+        if credentials is None:
+            credentials = (
+                CredentialChain([ExplicitCredentials(secret_api_key)])
+                if secret_api_key is not None
+                else default_credentials()
+            )
+        elif not isinstance(credentials, CredentialChain):
+            credentials = CredentialChain([credentials])
+        self.credentials = credentials
+        self._stats = ClientStats() if collect_stats else None
+        hooks = {"request": [self._on_request], "response": [self._on_response]}
+        for event, callbacks in (event_hooks or {}).items():
+            hooks.setdefault(event, []).extend(callbacks)
         self.http_client = SyncClient(
             base_url=self.base_url,
-            headers={"Authorization": secret_api_key},
+            auth=CredentialAuth(self.credentials),
             timeout=self.timeout,
+            event_hooks=hooks,
+            transport=transport,
+        )
+        default_middlewares: List[SyncMiddleware] = [SyncDeadlineMiddleware()]
+        if get_tracer() is not None:
+            default_middlewares.append(SyncTracingMiddleware(trace_metadata))
+        self.waiters = waiters if waiters is not None else InvoiceWaiters()
+        self.balance_cache: Optional[BalanceCache] = None
+        if balance_max_age is not None:
+            self.balance_cache = BalanceCache(balance_max_age)
+            default_middlewares.append(
+                SyncBalanceCacheMiddleware(self.balance_cache, self.waiters)
+            )
+        self.idempotency = SyncIdempotencyMiddleware(idempotency_store)
+        self.limiter = limiter or SyncConcurrencyLimiter()
+        self.invoice_waiter = SyncInvoiceWaiter(self, self.waiters)
+        self.payout_planner = SyncPayoutPlanner(self)
+        self.pipeline = SyncPipeline(
+            self.http_client,
+            [*default_middlewares, *middlewares, self.idempotency],
+            stats=self._stats,
         )
 
     def __enter__(self) -> "TelePaySyncClient":
@@ -46,17 +186,66 @@ class TelePaySyncClient:
         self.http_client.aclose()
 
     @staticmethod
-    def from_auth(auth: TelePayAuth, timeout=Timeout(60)) -> "TelePaySyncClient":
-        return TelePaySyncClient(auth.secret_api_key, timeout=timeout)
+    def from_auth(
+        auth: TelePayAuth, timeout=CLIENT_DEFAULT, **kwargs
+    ) -> "TelePaySyncClient":
+        return TelePaySyncClient(auth.secret_api_key, timeout=timeout, **kwargs)
+
+    def _on_request(self, request: Request) -> None:
+        if self._stats is not None:
+            self._stats.request_started(request)
+
+    def _on_response(self, response: Response) -> None:
+        record_response(response)
+        if self._stats is not None and not response.request.extensions.get(STREAMED):
+            response.read()
+            self._stats.response_received(response)
+
+    def _request(
+        self,
+        endpoint: Endpoint,
+        json: Optional[dict] = None,
+        idempotency_key: Optional[str] = None,
+        **params: str,
+    ) -> Any:
+        context = RequestContext(endpoint, endpoint.url(**params), json)
+        context.options["timeout"] = self.timeouts.get(endpoint.name)
+        if idempotency_key is not None:
+            context.options["idempotency_key"] = idempotency_key
+        return self.pipeline(context)
+
+    def _request_json(
+        self, endpoint: Endpoint, json: Optional[dict] = None, **params: str
+    ) -> Any:
+        """
+        Like `_request`, but returning the JSON response, without parsing it
+        """
+        context = RequestContext(endpoint, endpoint.url(**params), json)
+        context.options["timeout"] = self.timeouts.get(endpoint.name)
+        self.pipeline(context)
+        return context.response
+
+    def rotate_secret_api_key(self, secret_api_key: str) -> None:
+        """
+        Use a new secret API key from the next request on, keeping the
+        connection pool
+        """
+        self.credentials.rotate(secret_api_key)
+
+    def stats(self) -> dict:
+        """
+        Per-endpoint requests, errors, latency and bytes, plus the connection
+        pool utilization
+        """
+        if self._stats is None:
+            return {}
+        return self._stats.snapshot(self.http_client)
 
     def get_me(self) -> Account:
         """
         Info about the current account
         """
-        response = self.http_client.get("getMe")
-        logger.debug(f"response: {response.text}")
-        validate_response(response)
-        return Account.from_json(response.json())
+        return self._request(GET_ME)
 
     def get_balance(
         self, asset=None, blockchain=None, network=None
@@ -65,61 +254,49 @@ class TelePaySyncClient:
         Get your merchant wallet assets with corresponding balance
         """
         if asset and blockchain and network:
-            response = self.http_client.post(
-                "getBalance",
+            return self._request(
+                GET_WALLET_BALANCE,
                 json={"asset": asset, "blockchain": blockchain, "network": network},
             )
-            logger.debug(f"response: {response.text}")
-            validate_response(response)
-            return Wallets.from_json(response.json())
-        else:
-            response = self.http_client.get("getBalance")
-            logger.debug(f"response: {response.text}")
-            validate_response(response)
-            return Wallets.from_json(response.json())
+        return self._request(GET_BALANCE)
 
     def get_asset(self, asset: str, blockchain: str) -> Asset:
         """
         Get asset details
         """
-        response = self.http_client.request(
-            method="GET",
-            url="getAsset",
+        return self._request(
+            GET_ASSET,
             json={
                 "asset": asset,
                 "blockchain": blockchain,
             },
         )
-        logger.debug(f"response: {response.text}")
-        validate_response(response)
-        return Asset.from_json(response.json())
 
     def get_assets(self) -> Assets:
         """
         Get assets suported by TelePay
         """
-        response = self.http_client.get("getAssets")
-        logger.debug(f"response: {response.text}")
-        validate_response(response)
-        return Assets.from_json(response.json())
+        return self._request(GET_ASSETS)
 
     def get_invoices(self) -> InvoiceList:
         """
         Get your merchant invoices
         """
-        response = self.http_client.get("getInvoices")
-        logger.debug(f"response: {response.text}")
-        validate_response(response)
-        return InvoiceList.from_json(response.json())
+        return self._request(GET_INVOICES)
+
+    def get_invoice_columns(self, use_numpy: Optional[bool] = None) -> InvoiceColumns:
+        """
+        Your merchant invoices as columns, to aggregate them with
+        `InvoiceColumns.totals`
+        """
+        response = self._request_json(GET_INVOICES)
+        return InvoiceColumns.from_json(response["invoices"], use_numpy)
 
     def get_invoice(self, number: str) -> Invoice:
         """
         Get invoice details, by ID
         """
-        response = self.http_client.get(f"getInvoice/{number}")
-        logger.debug(f"response: {response.text}")
-        validate_response(response)
-        return Invoice.from_json(response.json())
+        return self._request(GET_INVOICE, number=number)
 
     def create_invoice(
         self,
@@ -132,12 +309,14 @@ class TelePaySyncClient:
         expires_at: int,
         metadata: dict = None,
         description: str = None,
+        idempotency_key: Optional[str] = None,
     ) -> Invoice:
         """
-        Create an invoice
+        Create an invoice.
+        Pass the same `idempotency_key` to safely create it again.
         """
-        response = self.http_client.post(
-            "createInvoice",
+        return self._request(
+            CREATE_INVOICE,
             json={
                 "asset": asset,
                 "blockchain": blockchain,
@@ -149,28 +328,48 @@ class TelePaySyncClient:
                 "cancel_url": cancel_url,
                 "expires_at": expires_at,
             },
+            idempotency_key=idempotency_key,
         )
-        logger.debug(f"response: {response.text}")
-        validate_response(response)
-        return Invoice.from_json(response.json())
+
+    def wait_for_invoice(
+        self,
+        number: str,
+        statuses: Collection[str] = FINAL_STATUSES,
+        timeout: Optional[float] = None,
+    ) -> Invoice:
+        """
+        Wait until an invoice reaches one of `statuses`, or a final status.
+        Resolved by the webhooks when a `TelePayWebhookListener` runs in this
+        process, by polling the invoices otherwise.
+        * timeout: Seconds to wait, after which TelePayError
+        `deadline.exceeded` is raised.
+        """
+        return self.invoice_waiter.wait(number, statuses, timeout)
+
+    def watch_invoices(self, interval: float = 10.0) -> Iterator[dict]:
+        """
+        Yield the changes of the invoices, shaped like the webhook events, by
+        comparing the invoices fetched every `interval` seconds. For when the
+        webhooks can't reach you.
+        """
+        feed = InvoiceFeed()
+        while True:
+            response = self._request_json(GET_INVOICES)
+            for event in feed.update(response.get("invoices", [])):
+                yield event
+            SyncBackend.sleep(interval)
 
     def cancel_invoice(self, number: str) -> Invoice:
         """
         Cancel an invoice
         """
-        response = self.http_client.post(f"cancelInvoice/{number}")
-        logger.debug(f"response: {response.text}")
-        validate_response(response)
-        return Invoice.from_json(response.json())
+        return self._request(CANCEL_INVOICE, number=number)
 
     def delete_invoice(self, number: str) -> dict:
         """
         Delete an invoice
         """
-        response = self.http_client.post(f"deleteInvoice/{number}")
-        logger.debug(f"response: {response.text}")
-        validate_response(response)
-        return response.json()
+        return self._request(DELETE_INVOICE, number=number)
 
     def transfer(
         self,
@@ -180,13 +379,19 @@ class TelePaySyncClient:
         amount: float,
         username: str,
         message: str = None,
+        idempotency_key: Optional[str] = None,
     ) -> dict:
         """
         Transfer funds between internal wallets.
         Off-chain operation.
-        """
-        response = self.http_client.post(
-            "transfer",
+        When its outcome is unknown, like after a timeout, TelePayError
+        `payout.outcome-unknown` is raised, and it's never retried. With an
+        `idempotency_key`, a call that succeeded returns its recorded result,
+        and one whose outcome is unknown isn't sent again until
+        `client.idempotency.forget(idempotency_key)`.
+        """
+        return self._request(
+            TRANSFER,
             json={
                 "asset": asset,
                 "blockchain": blockchain,
@@ -195,10 +400,8 @@ class TelePaySyncClient:
                 "username": username,
                 "message": message,
             },
+            idempotency_key=idempotency_key,
         )
-        logger.debug(f"response: {response.text}")
-        validate_response(response)
-        return response.json()
 
     def get_withdraw_minimum(
         self,
@@ -209,17 +412,14 @@ class TelePaySyncClient:
         """
         Get minimum withdraw amount.
         """
-        response = self.http_client.post(
-            "getWithdrawMinimum",
+        return self._request(
+            GET_WITHDRAW_MINIMUM,
             json={
                 "asset": asset,
                 "blockchain": blockchain,
                 "network": network,
             },
         )
-        logger.debug(f"response: {response.text}")
-        validate_response(response)
-        return response.json()
 
     def get_withdraw_fee(
         self,
@@ -233,8 +433,8 @@ class TelePaySyncClient:
         """
         Get estimated withdraw fee, composed of blockchain fee and processing fee.
         """
-        response = self.http_client.post(
-            "getWithdrawFee",
+        return self._request(
+            GET_WITHDRAW_FEE,
             json={
                 "to_address": to_address,
                 "asset": asset,
@@ -244,9 +444,6 @@ class TelePaySyncClient:
                 "message": message,
             },
         )
-        logger.debug(f"response: {response.text}")
-        validate_response(response)
-        return response.json()
 
     def withdraw(
         self,
@@ -256,13 +453,19 @@ class TelePaySyncClient:
         network: str,
         amount: float,
         message: str,
+        idempotency_key: Optional[str] = None,
     ) -> dict:
         """
         Withdraw funds from merchant wallet to external wallet.
         On-chain operation.
-        """
-        response = self.http_client.post(
-            "withdraw",
+        When its outcome is unknown, like after a timeout, TelePayError
+        `payout.outcome-unknown` is raised, and it's never retried. With an
+        `idempotency_key`, a call that succeeded returns its recorded result,
+        and one whose outcome is unknown isn't sent again until
+        `client.idempotency.forget(idempotency_key)`.
+        """
+        return self._request(
+            WITHDRAW,
             json={
                 "to_address": to_address,
                 "asset": asset,
@@ -271,10 +474,26 @@ class TelePaySyncClient:
                 "amount": amount,
                 "message": message,
             },
+            idempotency_key=idempotency_key,
         )
-        logger.debug(f"response: {response.text}")
-        validate_response(response)
-        return response.json()
+
+    def plan_payouts(self, payouts: Iterable[Union[Payout, dict]]) -> PayoutPlan:
+        """
+        Check withdrawals before making them: their fees and minimums are
+        quoted concurrently, and their total checked against the balances.
+        Each payout is a `Payout`, or a dict with the arguments of `withdraw`.
+        """
+        return self.payout_planner.plan(payouts)
+
+    def payout_scheduler(
+        self, window: float = 60.0, max_size: int = 50, concurrency: int = 4
+    ) -> SyncPayoutScheduler:
+        """
+        A scheduler aggregating the withdrawals and transfers queued to the
+        same destination, to send them as a single payout. See
+        `AsyncPayoutScheduler`.
+        """
+        return SyncPayoutScheduler(self, window, max_size, concurrency)
 
     def create_webhook(
         self, url: str, secret: str, events: list, active: bool
@@ -282,8 +501,8 @@ class TelePaySyncClient:
         """
         Create a webhook
         """
-        response = self.http_client.post(
-            "createWebhook",
+        return self._request(
+            CREATE_WEBHOOK,
             json={
                 "url": url,
                 "secret": secret,
@@ -291,9 +510,6 @@ class TelePaySyncClient:
                 "active": active,
             },
         )
-        logger.debug(f"response: {response.text}")
-        validate_response(response)
-        return Webhook.from_json(response.json())
 
     def update_webhook(
         self, id: str, url: str, secret: str, events: list, active: bool
@@ -301,60 +517,126 @@ class TelePaySyncClient:
         """
         Update a webhook
         """
-        response = self.http_client.post(
-            f"updateWebhook/{id}",
+        return self._request(
+            UPDATE_WEBHOOK,
             json={
                 "url": url,
                 "secret": secret,
                 "events": events,
                 "active": active,
             },
+            id=id,
         )
-        logger.debug(f"response: {response.text}")
-        validate_response(response)
-        return Webhook.from_json(response.json())
 
     def activate_webhook(self, id: str) -> Webhook:
         """
         Activate a webhook
         """
-        response = self.http_client.post(f"activateWebhook/{id}")
-        logger.debug(f"response: {response.text}")
-        validate_response(response)
-        return Webhook.from_json(response.json())
+        return self._request(ACTIVATE_WEBHOOK, id=id)
 
     def deactivate_webhook(self, id: str) -> Webhook:
         """
         Deactivate a webhook
         """
-        response = self.http_client.post(f"deactivateWebhook/{id}")
-        logger.debug(f"response: {response.text}")
-        validate_response(response)
-        return Webhook.from_json(response.json())
+        return self._request(DEACTIVATE_WEBHOOK, id=id)
 
     def delete_webhook(self, id: str) -> dict:
         """
         Delete a webhook
         """
-        response = self.http_client.post(f"deleteWebhook/{id}")
-        logger.debug(f"response: {response.text}")
-        validate_response(response)
-        return response.json()
+        return self._request(DELETE_WEBHOOK, id=id)
 
     def get_webhook(self, id: str) -> Webhook:
         """
         Get webhook
         """
-        response = self.http_client.get(f"getWebhook/{id}")
-        logger.debug(f"response: {response.text}")
-        validate_response(response)
-        return Webhook.from_json(response.json())
+        return self._request(GET_WEBHOOK, id=id)
 
     def get_webhooks(self) -> Webhooks:
         """
         Get webhooks
         """
-        response = self.http_client.get("getWebhooks")
-        logger.debug(f"response: {response.text}")
-        validate_response(response)
-        return Webhooks.from_json(response.json())
+        return self._request(GET_WEBHOOKS)
+
+    def invoice_pool(
+        self,
+        sizes: Dict[InvoiceTier, int],
+        success_url: str,
+        cancel_url: str,
+        **kwargs: Any,
+    ) -> SyncInvoicePool:
+        """
+        A pool of invoices created in advance, `sizes` telling how many to keep
+        ready per `(asset, blockchain, network, amount)`. Run `pool.run()` in
+        the background to refill it.
+        """
+        return SyncInvoicePool(self, sizes, success_url, cancel_url, **kwargs)
+
+    def export_invoices(
+        self,
+        destination: Destination,
+        format: str = CSV,
+        columns: Optional[Sequence[str]] = None,
+        chunk_size: int = CHUNK_SIZE,
+        progress: Optional[Callable[[int], Any]] = None,
+    ) -> int:
+        """
+        Export all your invoices to a CSV, JSON lines or Parquet file (with
+        pyarrow), streaming them, so the memory used doesn't grow with the
+        number of invoices. Returns the number of invoices exported.
+        * destination: A path, or an open file.
+        * format: `"csv"`, `"jsonl"` or `"parquet"`.
+        * columns: Exported fields, `DEFAULT_COLUMNS` by default. The metadata
+        values are selected as `metadata.<key>`, nested keys separated by dots.
+        * progress: Called with the number of invoices written so far.
+        """
+        return export_invoices(self, destination, format, columns, chunk_size, progress)
+
+    def sweep_invoices(
+        self,
+        action: str = "cancel",
+        statuses: Collection[str] = ("pending",),
+        older_than: float = 0.0,
+        **kwargs: Any,
+    ) -> dict:
+        """
+        Cancel or delete, in bulk, the invoices in `statuses` created more than
+        `older_than` seconds ago. See `AsyncInvoiceSweeper` for the options,
+        like `checkpoint`, to resume an interrupted sweep.
+        """
+        sweeper = SyncInvoiceSweeper(self, action, statuses, older_than, **kwargs)
+        return sweeper.sweep()
+
+    def bulk(
+        self,
+        function: Callable[[T], Any],
+        items: Iterable[T],
+        limiter: Optional[SyncConcurrencyLimiter] = None,
+    ) -> List[Any]:
+        """
+        Call `function` on every item, concurrently, adapting the concurrency
+        to what the API tolerates. Returns the results in order, with the
+        exceptions of the failed items.
+        """
+        return bulk(function, items, limiter or self.limiter)
+
+    def create_invoices(
+        self, invoices: Iterable[dict]
+    ) -> List[Union[Invoice, Exception]]:
+        """
+        Create invoices concurrently, each given by the arguments of
+        `create_invoice`
+        """
+
+        def create(invoice: dict) -> Invoice:
+            return self.create_invoice(**invoice)
+
+        return self.bulk(create, invoices)
+
+    def get_invoices_by_number(
+        self, numbers: Iterable[str]
+    ) -> List[Union[Invoice, Exception]]:
+        """
+        Get invoices details concurrently
+        """
+        return self.bulk(self.get_invoice, numbers)
@@ -0,0 +1,104 @@
+import logging
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, TypeVar
+
+from .._backends import SyncBackend
+from ..concurrency import AdaptiveLimit
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class SyncSlot:
+    """
+    A call holding a place in the limiter, released with its outcome
+    """
+
+    def __init__(self, limiter: "SyncConcurrencyLimiter") -> None:
+        self.limiter = limiter
+        self.started = 0.0
+
+    def __enter__(self) -> "SyncSlot":
+        self.limiter.acquire()
+        self.started = SyncBackend.time()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        # released even when the call is cancelled, or the place would leak
+        with SyncBackend.shield():
+            self.limiter.release(SyncBackend.time() - self.started, exc_val)
+
+
+class SyncConcurrencyLimiter:
+    """
+    Bounds the calls running at the same time to an adaptive limit, so bulk
+    operations find the highest concurrency the API tolerates. Share one
+    limiter between the operations hitting the same API.
+    """
+
+    def __init__(self, limit: Optional[AdaptiveLimit] = None) -> None:
+        self.limit = limit or AdaptiveLimit()
+        self.in_flight = 0
+        self._condition = SyncBackend.condition()
+
+    def acquire(self) -> None:
+        with self._condition:
+            while self.in_flight >= self.limit.current:
+                self._condition.wait()
+            self.in_flight += 1
+
+    def release(self, seconds: float, error: Optional[BaseException] = None) -> None:
+        with self._condition:
+            self.in_flight -= 1
+            self.limit.update(seconds, error)
+            self._condition.notify_all()
+
+    def slot(self) -> SyncSlot:
+        return SyncSlot(self)
+
+    def stats(self) -> dict:
+        return {
+            "limit": self.limit.current,
+            "in_flight": self.in_flight,
+            "latency": self.limit.latency,
+        }
+
+
+def bulk(
+    function: Callable[[T], Any],
+    items: Iterable[T],
+    limiter: Optional[SyncConcurrencyLimiter] = None,
+) -> List[Any]:
+    """
+    Call `function` on every item, concurrently within the limits of
+    `limiter`. Returns the results in the order of the items, with the
+    exception raised for the items that failed.
+    """
+    limiter = limiter or SyncConcurrencyLimiter()
+    pending = enumerate(items)
+    lock = threading.Lock()
+    results: Dict[int, Any] = {}
+
+    def take() -> Optional[Tuple[int, T]]:
+        with lock:
+            return next(pending, None)
+
+    def worker() -> None:
+        while True:
+            task = take()
+            if task is None:
+                return
+            index, item = task
+            try:
+                with limiter.slot():
+                    results[index] = function(item)
+            except Exception as e:
+                logger.debug(f"Bulk call {index} failed: {e!r}")
+                results[index] = e
+
+    workers = limiter.limit.max_limit
+    with SyncBackend.task_group(workers) as group:
+        for _ in range(workers):
+            group.start_soon(worker)
+    return [results[index] for index in range(len(results))]
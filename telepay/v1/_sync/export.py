@@ -0,0 +1,61 @@
+import logging
+from typing import TYPE_CHECKING, Any, Callable, List, Optional, Sequence
+
+from .. import deadlines
+from ..endpoints import GET_INVOICES
+from ..export import CHUNK_SIZE, CSV, Destination, InvoiceStreamDecoder, open_writer
+from ..stats import STREAMED
+from ..utils import validate_response
+
+if TYPE_CHECKING:
+    from .client import TelePaySyncClient
+
+logger = logging.getLogger(__name__)
+
+
+def export_invoices(
+    client: "TelePaySyncClient",
+    destination: Destination,
+    format: str = CSV,
+    columns: Optional[Sequence[str]] = None,
+    chunk_size: int = CHUNK_SIZE,
+    progress: Optional[Callable[[int], Any]] = None,
+) -> int:
+    """
+    Stream the `getInvoices` response into `destination`, `chunk_size`
+    invoices at a time, returning the number of invoices exported. The
+    response goes straight to the file, without the middlewares. `progress`
+    is called with the number of invoices written, after each chunk.
+    """
+    options = {"extensions": {STREAMED: True}}
+    timeout = deadlines.clamp(client.timeouts.get(GET_INVOICES.name))
+    if timeout is not None:
+        options["timeout"] = timeout
+    with client.http_client.stream(
+        GET_INVOICES.method, GET_INVOICES.url(), **options
+    ) as response:
+        received = 0
+        try:
+            if not response.is_success:
+                received = len(response.read())
+                validate_response(response)
+            decoder = InvoiceStreamDecoder()
+            chunk: List[dict] = []
+            with open_writer(destination, format, columns) as writer:
+                for text in response.iter_text():
+                    received += len(text.encode())
+                    chunk.extend(decoder.feed(text))
+                    if len(chunk) >= chunk_size:
+                        writer.write(chunk)
+                        chunk = []
+                        if progress is not None:
+                            progress(writer.rows)
+                decoder.close()
+                writer.write(chunk)
+                if progress is not None:
+                    progress(writer.rows)
+        finally:
+            if client._stats is not None:
+                client._stats.stream_finished(response, received)
+    logger.debug(f"Exported {writer.rows} invoices ({format})")
+    return writer.rows
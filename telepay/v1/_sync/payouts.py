@@ -0,0 +1,110 @@
+import logging
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Tuple, Union
+
+from ..errors import TelePayError
+from ..payouts import (
+    BELOW_MINIMUM,
+    QUOTE_FAILED,
+    Payout,
+    PayoutPlan,
+    PayoutQuote,
+    QuoteCache,
+    WalletKey,
+)
+
+if TYPE_CHECKING:
+    from .client import TelePaySyncClient
+
+logger = logging.getLogger(__name__)
+
+BALANCES = "balances"
+FEE = "fee"
+MINIMUM = "minimum"
+
+
+class SyncPayoutPlanner:
+    """
+    Quotes the fees and minimums of many payouts concurrently, and checks
+    them against the balances, before any withdrawal. Each distinct quote is
+    requested once per plan, and cached across plans: the fees for `fee_ttl`
+    seconds, the minimums for `minimum_ttl`.
+    """
+
+    def __init__(
+        self,
+        client: "TelePaySyncClient",
+        fee_ttl: float = 30.0,
+        minimum_ttl: float = 300.0,
+    ) -> None:
+        self.client = client
+        self.fees = QuoteCache(fee_ttl)
+        self.minimums = QuoteCache(minimum_ttl)
+
+    def _quote(self, call: Tuple[str, Any]) -> Any:
+        kind, key = call
+        if kind == BALANCES:
+            wallets = (self.client.get_balance()).wallets
+            return {
+                (wallet["asset"], wallet["blockchain"], wallet["network"]): float(
+                    wallet["balance"]
+                )
+                for wallet in (
+                    wallet if isinstance(wallet, dict) else vars(wallet)
+                    for wallet in wallets
+                )
+            }
+        if kind == MINIMUM:
+            response = self.client.get_withdraw_minimum(*key)
+            minimum = float(response["withdraw_minimum"])
+            self.minimums.put(key, minimum)
+            return minimum
+        response = self.client.get_withdraw_fee(*key)
+        fee = float(response["total"])
+        self.fees.put(key, fee)
+        return fee
+
+    def plan(self, payouts: Iterable[Union[Payout, dict]]) -> PayoutPlan:
+        """
+        Feasibility report of the payouts, given as `Payout` or as the
+        arguments of `withdraw`
+        """
+        payouts = [
+            payout if isinstance(payout, Payout) else Payout(**payout)
+            for payout in payouts
+        ]
+        # the balances and the quotes missing from the caches, all at once
+        results: Dict[Tuple[str, Any], Any] = {}
+        calls: List[Tuple[str, Any]] = [(BALANCES, None)]
+        for payout in payouts:
+            for kind, key, cache in (
+                (MINIMUM, payout.wallet, self.minimums),
+                (FEE, payout.fee_key, self.fees),
+            ):
+                if (kind, key) in results:
+                    continue
+                cached = cache.get(key)
+                if cached is None:
+                    calls.append((kind, key))
+                results[(kind, key)] = cached
+        logger.debug(f"Planning {len(payouts)} payouts with {len(calls)} calls")
+        results.update(zip(calls, self.client.bulk(self._quote, calls)))
+
+        balances: Dict[WalletKey, float] = results.pop((BALANCES, None))
+        if isinstance(balances, Exception):
+            raise balances
+        quotes = []
+        for payout in payouts:
+            quote = PayoutQuote(payout)
+            for kind, key in ((MINIMUM, payout.wallet), (FEE, payout.fee_key)):
+                value = results[(kind, key)]
+                if isinstance(value, Exception):
+                    error = value.error if isinstance(value, TelePayError) else value
+                    quote.errors.append(f"{kind}: {error}")
+                    value = None
+                setattr(quote, kind, value)
+            if quote.errors:
+                quote.problems.append(QUOTE_FAILED)
+            elif float(payout.amount) < quote.minimum:
+                quote.problems.append(BELOW_MINIMUM)
+            quotes.append(quote)
+        return PayoutPlan(quotes, balances)
@@ -0,0 +1,84 @@
+import logging
+from functools import partial
+from time import perf_counter
+from typing import Any, Callable, Iterable, Optional
+
+from .. import deadlines
+from ..endpoints import RequestContext
+from ..http_clients import SyncClient
+from ..stats import ClientStats
+from ..utils import validate_response
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[[RequestContext], Any]
+
+
+class SyncMiddleware:
+    """
+    A step of the request pipeline. Subclasses do their work around
+    `call_next`, which runs the rest of the pipeline and returns the parsed
+    response.
+    """
+
+    def __call__(self, context: RequestContext, call_next: Handler) -> Any:
+        return call_next(context)
+
+
+class SyncPipeline:
+    """
+    Runs the client calls through the middlewares, in order, and finally
+    sends the request, validates the response and parses it.
+    * stats: Where the requests failing without a response, like timeouts and
+    connection errors, are accounted. The responses are accounted by the
+    client event hooks.
+    """
+
+    def __init__(
+        self,
+        http_client: SyncClient,
+        middlewares: Iterable[SyncMiddleware] = (),
+        stats: Optional[ClientStats] = None,
+    ) -> None:
+        self.http_client = http_client
+        self.middlewares = list(middlewares)
+        self.stats = stats
+        self._handler = self._build()
+
+    def _build(self) -> Handler:
+        handler = self.send
+        for middleware in reversed(self.middlewares):
+            handler = partial(middleware, call_next=handler)
+        return handler
+
+    def add(self, middleware: SyncMiddleware) -> None:
+        """
+        Append a middleware, closest to the request
+        """
+        self.middlewares.append(middleware)
+        self._handler = self._build()
+
+    def __call__(self, context: RequestContext) -> Any:
+        return self._handler(context)
+
+    def send(self, context: RequestContext) -> Any:
+        options = dict(context.options.get("request", {}))
+        timeout = deadlines.clamp(context.options.get("timeout"))
+        if timeout is not None:
+            options.setdefault("timeout", timeout)
+        start = perf_counter()
+        try:
+            response = self.http_client.request(
+                context.endpoint.method, context.url, json=context.json, **options
+            )
+        except Exception as e:
+            if self.stats is not None:
+                self.stats.request_failed(
+                    context.endpoint.name, perf_counter() - start, e
+                )
+            raise
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Response: {response.text}")
+        validate_response(response)
+        context.response = response.json()
+        return context.endpoint.parse(context.response)
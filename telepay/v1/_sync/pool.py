@@ -0,0 +1,172 @@
+import logging
+import threading
+from collections import Counter, deque
+from typing import TYPE_CHECKING, Any, Deque, Dict, List, Optional, Tuple
+
+from .._backends import SyncBackend
+from ..models.invoice import Invoice
+from ..pool import InvoiceTier
+
+if TYPE_CHECKING:
+    from .client import TelePaySyncClient
+
+logger = logging.getLogger(__name__)
+
+
+class SyncInvoicePool:
+    """
+    Keeps invoices created in advance, so a checkout doesn't wait for
+    `create_invoice`. `sizes` tells how many ready invoices to keep per tier.
+    Invoices older than `max_age` seconds (by default, half their lifetime)
+    aren't handed out, and are cancelled on the next refill.
+    * expires_at: Lifetime of the invoices, in minutes, as in `create_invoice`.
+    * interval: Seconds between refills, when `run()` isn't woken up sooner.
+    """
+
+    def __init__(
+        self,
+        client: "TelePaySyncClient",
+        sizes: Dict[InvoiceTier, int],
+        success_url: str,
+        cancel_url: str,
+        expires_at: int = 60,
+        description: Optional[str] = None,
+        max_age: Optional[float] = None,
+        interval: float = 30.0,
+    ) -> None:
+        self.client = client
+        self.sizes = {InvoiceTier(*tier): size for tier, size in sizes.items()}
+        self.success_url = success_url
+        self.cancel_url = cancel_url
+        self.expires_at = expires_at
+        self.description = description
+        self.max_age = max_age if max_age is not None else expires_at * 60 / 2
+        self.interval = interval
+        self.counts: Counter = Counter()
+        self._ready: Dict[InvoiceTier, Deque[Tuple[float, Invoice]]] = {
+            tier: deque() for tier in self.sizes
+        }
+        self._stale: List[Invoice] = []
+        self._lock = threading.Lock()
+        # created by run(), in the event loop
+        self._wake: Any = None
+        self._stopped = False
+
+    def ready(self, tier: InvoiceTier) -> int:
+        with self._lock:
+            return len(self._ready.get(InvoiceTier(*tier), ()))
+
+    def _pop(self, tier: InvoiceTier) -> Optional[Invoice]:
+        """
+        The oldest ready invoice of the tier that isn't stale
+        """
+        now = SyncBackend.time()
+        with self._lock:
+            ready = self._ready.get(tier)
+            while ready:
+                created_at, invoice = ready.popleft()
+                if now - created_at < self.max_age:
+                    return invoice
+                self._stale.append(invoice)
+        return None
+
+    def take(self, asset: str, blockchain: str, network: str, amount: float) -> Invoice:
+        """
+        Hand out a ready invoice, or create one when there's none left
+        """
+        tier = InvoiceTier(asset, blockchain, network, amount)
+        invoice = self._pop(tier)
+        self.wake()
+        if invoice is not None:
+            self.counts["hits"] += 1
+            return invoice
+        self.counts["misses"] += 1
+        logger.debug(f"No ready invoice for {tier}, creating one")
+        return self._create(tier)
+
+    def _create(self, tier: InvoiceTier) -> Invoice:
+        return self.client.create_invoice(
+            tier.asset,
+            tier.blockchain,
+            tier.network,
+            tier.amount,
+            success_url=self.success_url,
+            cancel_url=self.cancel_url,
+            expires_at=self.expires_at,
+            description=self.description,
+        )
+
+    def _cancel(self, invoices: List[Invoice]) -> None:
+        numbers = [invoice.number for invoice in invoices]
+        results = self.client.bulk(self.client.cancel_invoice, numbers)
+        for number, result in zip(numbers, results):
+            if isinstance(result, Exception):
+                logger.debug(f"Couldn't cancel invoice {number}: {result!r}")
+            else:
+                self.counts["cancelled"] += 1
+
+    def refill(self) -> None:
+        """
+        Cancel the stale invoices and create the missing ones
+        """
+        now = SyncBackend.time()
+        missing = []
+        with self._lock:
+            for tier, ready in self._ready.items():
+                while ready and now - ready[0][0] >= self.max_age:
+                    self._stale.append(ready.popleft()[1])
+                missing.extend([tier] * (self.sizes[tier] - len(ready)))
+            stale, self._stale = self._stale, []
+        if stale:
+            self._cancel(stale)
+        results = self.client.bulk(self._create, missing)
+        created_at = SyncBackend.time()
+        with self._lock:
+            for tier, result in zip(missing, results):
+                if isinstance(result, Exception):
+                    logger.debug(f"Couldn't create an invoice for {tier}: {result!r}")
+                    self.counts["errors"] += 1
+                    continue
+                self._ready[tier].append((created_at, result))
+                self.counts["created"] += 1
+
+    def run(self) -> None:
+        """
+        Refill the pool whenever an invoice is taken, or every `interval`
+        seconds, until `stop()` is called
+        """
+        while not self._stopped:
+            self._wake = SyncBackend.event()
+            self.refill()
+            SyncBackend.wait(self._wake, self.interval)
+
+    def wake(self) -> None:
+        """
+        Refill now, instead of waiting for the interval
+        """
+        if self._wake is not None:
+            self._wake.set()
+
+    def stop(self) -> None:
+        self._stopped = True
+        self.wake()
+
+    def close(self) -> None:
+        """
+        Stop refilling, and cancel the invoices that weren't handed out
+        """
+        self.stop()
+        with self._lock:
+            invoices = [
+                invoice for ready in self._ready.values() for _, invoice in ready
+            ]
+            invoices.extend(self._stale)
+            for ready in self._ready.values():
+                ready.clear()
+            self._stale = []
+        self._cancel(invoices)
+
+    def stats(self) -> dict:
+        with self._lock:
+            ready = {tier: len(invoices) for tier, invoices in self._ready.items()}
+        return {"ready": ready, **self.counts}
@@ -0,0 +1,218 @@
+import logging
+import math
+from collections import defaultdict
+from typing import Any, Collection, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .models.assets import Assets
+from .models.invoice import Invoice
+
+logger = logging.getLogger(__name__)
+
+# columns the invoices can be grouped by
+GROUP_COLUMNS = ("asset", "blockchain", "network", "status", "day")
+
+UsdPrices = Dict[Tuple[str, str], float]
+
+_numpy: Any = None
+
+
+def get_numpy() -> Any:
+    """
+    NumPy, or None when it isn't installed
+    """
+    global _numpy
+    if _numpy is None:
+        try:
+            import numpy
+        except ImportError:
+            logger.debug("NumPy is not installed, the analytics use plain lists")
+            _numpy = False
+        else:
+            _numpy = numpy
+    return _numpy or None
+
+
+def usd_prices(assets: Assets) -> UsdPrices:
+    """
+    USD price of each `(asset, blockchain)`, from `get_assets`
+    """
+    prices = {}
+    for asset in assets.assets:
+        if not isinstance(asset, dict):
+            asset = vars(asset)
+        prices[(asset["asset"], asset["blockchain"])] = float(asset["usd_price"])
+    return prices
+
+
+class InvoiceColumns:
+    """
+    Columnar view of invoices: a column per field, NumPy arrays when NumPy is
+    installed (unless `use_numpy` is False), lists otherwise. The `day`
+    column is the creation date, as `YYYY-MM-DD`.
+    """
+
+    def __init__(
+        self, columns: Dict[str, Sequence[Any]], use_numpy: Optional[bool] = None
+    ) -> None:
+        numpy = get_numpy() if use_numpy is not False else None
+        if use_numpy and numpy is None:
+            raise ImportError("NumPy is not installed: pip install numpy")
+        self.numpy = numpy
+        if numpy is not None:
+            columns = {
+                name: numpy.asarray(values, dtype=numpy.float64)
+                if name == "amount"
+                else numpy.asarray(values, dtype=str)
+                for name, values in columns.items()
+            }
+        self.columns = columns
+
+    @classmethod
+    def from_json(
+        cls, invoices: Iterable[dict], use_numpy: Optional[bool] = None
+    ) -> "InvoiceColumns":
+        """
+        Columns of the invoices JSON, like the `getInvoices` response, which
+        skips building an `Invoice` for each of them
+        """
+        columns: Dict[str, List[Any]] = {name: [] for name in ("number", "amount")}
+        columns.update({name: [] for name in GROUP_COLUMNS})
+        for invoice in invoices:
+            columns["number"].append(invoice["number"])
+            columns["amount"].append(float(invoice["amount"]))
+            columns["asset"].append(invoice["asset"])
+            columns["blockchain"].append(invoice["blockchain"])
+            columns["network"].append(invoice["network"])
+            columns["status"].append(invoice["status"])
+            columns["day"].append(invoice["created_at"][:10])
+        return cls(columns, use_numpy)
+
+    @classmethod
+    def from_invoices(
+        cls, invoices: Iterable[Invoice], use_numpy: Optional[bool] = None
+    ) -> "InvoiceColumns":
+        return cls.from_json(
+            (
+                {
+                    **vars(invoice),
+                    "created_at": invoice.created_at.date().isoformat(),
+                }
+                for invoice in invoices
+            ),
+            use_numpy,
+        )
+
+    def __len__(self) -> int:
+        return len(self.columns["number"])
+
+    def __getitem__(self, name: str) -> Sequence[Any]:
+        return self.columns[name]
+
+    def totals(
+        self,
+        by: Sequence[str] = ("asset", "status"),
+        prices: Optional[UsdPrices] = None,
+        statuses: Optional[Collection[str]] = None,
+    ) -> List[dict]:
+        """
+        Number of invoices and total amount of each group, sorted by group.
+        * by: Grouping columns, from `GROUP_COLUMNS`.
+        * prices: USD prices, from `usd_prices`, to add the total in USD. It's
+        None for the groups with an asset without a price.
+        * statuses: Only count the invoices in these statuses, like
+        `["completed"]` for the revenue.
+        """
+        unknown = set(by) - set(GROUP_COLUMNS)
+        if unknown:
+            raise ValueError(f"Can't group by {sorted(unknown)}")
+        if self.numpy is not None:
+            groups = self._numpy_totals(list(by), prices, statuses)
+        else:
+            groups = self._totals(list(by), prices, statuses)
+        rows = []
+        for key, (count, amount, usd) in sorted(groups.items()):
+            row: Dict[str, Any] = dict(zip(by, key))
+            row.update(count=count, amount=amount)
+            if prices is not None:
+                row["usd"] = None if math.isnan(usd) else usd
+            rows.append(row)
+        return rows
+
+    def _totals(
+        self,
+        by: List[str],
+        prices: Optional[UsdPrices],
+        statuses: Optional[Collection[str]],
+    ) -> Dict[tuple, list]:
+        groups: Dict[tuple, list] = defaultdict(lambda: [0, 0.0, 0.0])
+        keys = zip(*(self.columns[name] for name in by)) if by else iter(tuple, None)
+        rows = zip(
+            keys,
+            self.columns["amount"],
+            self.columns["asset"],
+            self.columns["blockchain"],
+            self.columns["status"],
+        )
+        prices = prices or {}
+        for key, amount, asset, blockchain, status in rows:
+            if statuses is not None and status not in statuses:
+                continue
+            group = groups[key]
+            group[0] += 1
+            group[1] += amount
+            group[2] += amount * prices.get((asset, blockchain), math.nan)
+        return groups
+
+    def _numpy_totals(
+        self,
+        by: List[str],
+        prices: Optional[UsdPrices],
+        statuses: Optional[Collection[str]],
+    ) -> Dict[tuple, list]:
+        numpy = self.numpy
+        columns = self.columns
+        if statuses is not None:
+            mask = numpy.isin(columns["status"], list(statuses))
+            columns = {name: values[mask] for name, values in columns.items()}
+        amount = columns["amount"]
+        # a code per row combining the codes of its values in each column
+        codes = numpy.zeros(len(amount), dtype=numpy.int64)
+        uniques = []
+        for name in by:
+            values, inverse = numpy.unique(columns[name], return_inverse=True)
+            codes = codes * len(values) + inverse
+            uniques.append(values)
+        group_codes, group_of_row = numpy.unique(codes, return_inverse=True)
+        size = len(group_codes)
+        counts = numpy.bincount(group_of_row, minlength=size)
+        amounts = numpy.bincount(group_of_row, weights=amount, minlength=size)
+        usd = numpy.full(size, numpy.nan)
+        if prices is not None and len(amount):
+            # the price of each (asset, blockchain) pair, looked up once
+            assets, asset_of_row = numpy.unique(columns["asset"], return_inverse=True)
+            chains, chain_of_row = numpy.unique(
+                columns["blockchain"], return_inverse=True
+            )
+            price = numpy.array(
+                [
+                    [prices.get((asset, chain), numpy.nan) for chain in chains.tolist()]
+                    for asset in assets.tolist()
+                ]
+            )
+            usd = numpy.bincount(
+                group_of_row,
+                weights=amount * price[asset_of_row, chain_of_row],
+                minlength=size,
+            )
+        groups = {}
+        for index, code in enumerate(group_codes.tolist()):
+            key = []
+            for values in reversed(uniques):
+                code, value = divmod(code, len(values))
+                key.append(str(values[value]))
+            groups[tuple(reversed(key))] = [
+                int(counts[index]),
+                float(amounts[index]),
+                float(usd[index]),
+            ]
+        return groups
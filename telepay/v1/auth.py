@@ -1,24 +1,258 @@
+import logging
+import threading
+from abc import ABC, abstractmethod
 from dataclasses import dataclass, field
 from os import environ
+from pathlib import Path
+from time import monotonic
+from typing import AsyncGenerator, Callable, Generator, List, Optional, Union
 
-from dotenv import load_dotenv
+import anyio
+from httpx import Auth, Request, Response
 
 from .errors import TelePayError
 
-load_dotenv()
+logger = logging.getLogger(__name__)
+
+SECRET_API_KEY_VARIABLE = "TELEPAY_SECRET_API_KEY"
+SECRET_API_KEY_FILE_VARIABLE = "TELEPAY_SECRET_API_KEY_FILE"
 
 
 @dataclass
 class TelePayAuth:
-    secret_api_key: str = field(default=environ["TELEPAY_SECRET_API_KEY"])
+    secret_api_key: Optional[str] = field(default=None)
 
     def __init__(self, secret_api_key=None):
         if secret_api_key:
             self.secret_api_key = secret_api_key
         else:
-            self.secret_api_key = environ["TELEPAY_SECRET_API_KEY"]
+            # the .env file is only read when the key is taken from the environment
+            from dotenv import load_dotenv
+
+            load_dotenv()
+            self.secret_api_key = environ.get(SECRET_API_KEY_VARIABLE)
         self.__post_init__()
 
     def __post_init__(self):
         if not self.secret_api_key:
             raise TelePayError(0, "TELEPAY_SECRET_API_KEY is not setted")
+
+
+class CredentialProvider(ABC):
+    """
+    Source of the secret API key. Returns None when it has no key, so the
+    next provider of a `CredentialChain` is tried.
+    """
+
+    @abstractmethod
+    def get_secret_api_key(self) -> Optional[str]:
+        ...
+
+
+@dataclass
+class ExplicitCredentials(CredentialProvider):
+    secret_api_key: Optional[str]
+
+    def get_secret_api_key(self) -> Optional[str]:
+        return self.secret_api_key
+
+
+@dataclass
+class EnvCredentials(CredentialProvider):
+    """
+    Key from an environment variable, also looked up in the .env file
+    """
+
+    variable: str = SECRET_API_KEY_VARIABLE
+    dotenv: bool = True
+
+    def get_secret_api_key(self) -> Optional[str]:
+        if self.variable not in environ and self.dotenv:
+            from dotenv import load_dotenv
+
+            load_dotenv()
+        return environ.get(self.variable)
+
+
+@dataclass
+class FileCredentials(CredentialProvider):
+    """
+    Key stored in a file, like a mounted secret. By default, the path is
+    taken from the `TELEPAY_SECRET_API_KEY_FILE` environment variable.
+    """
+
+    path: Optional[Union[str, Path]] = None
+
+    def get_secret_api_key(self) -> Optional[str]:
+        path = self.path or environ.get(SECRET_API_KEY_FILE_VARIABLE)
+        if not path:
+            return None
+        try:
+            return Path(path).read_text().strip() or None
+        except FileNotFoundError:
+            logger.debug(f"Secret API key file {path} not found")
+            return None
+
+
+@dataclass
+class CallableCredentials(CredentialProvider):
+    """
+    Key returned by a function, like a secrets manager lookup. The async
+    client calls it in a worker thread, so it may block.
+    """
+
+    function: Callable[[], Optional[str]]
+
+    def get_secret_api_key(self) -> Optional[str]:
+        return self.function()
+
+
+@dataclass
+class CredentialChain(CredentialProvider):
+    """
+    Resolves the key from the first provider that has one. The key is resolved
+    lazily and cached, for `ttl` seconds when given, until `refresh()` or
+    `rotate()` is called. A rotated key is kept until the providers return a
+    different key than before the rotation.
+    """
+
+    providers: List[CredentialProvider] = field(default_factory=list)
+    ttl: Optional[float] = None
+
+    def __post_init__(self):
+        self._secret_api_key: Optional[str] = None
+        # the latest key of the providers, and whether it's overridden
+        self._provided: Optional[str] = None
+        self._rotated = False
+        self._resolved_at = 0.0
+        self._lock = threading.Lock()
+
+    def _expired(self) -> bool:
+        if self._secret_api_key is None:
+            return True
+        return self.ttl is not None and monotonic() - self._resolved_at > self.ttl
+
+    def _provide(self) -> str:
+        for provider in self.providers:
+            secret_api_key = provider.get_secret_api_key()
+            if secret_api_key:
+                logger.debug(f"Secret API key resolved by {type(provider).__name__}")
+                return secret_api_key
+        raise TelePayError(
+            status_code=0,
+            error="credentials.not-found",
+            message="No TelePay secret API key found",
+        )
+
+    def _resolve(self) -> str:
+        try:
+            provided = self._provide()
+        except TelePayError:
+            if not self._rotated:
+                raise
+            provided = self._provided
+        # a key rotated before the first resolution is kept too
+        changed = self._provided is not None and provided != self._provided
+        if not self._rotated or changed:
+            self._secret_api_key = provided
+            self._rotated = False
+        self._provided = provided
+        self._resolved_at = monotonic()
+        return self._secret_api_key
+
+    def cached_secret_api_key(self) -> Optional[str]:
+        """
+        The key, when it's resolved and not expired, without resolving it
+        """
+        return None if self._expired() else self._secret_api_key
+
+    def get_secret_api_key(self) -> str:
+        if self._expired():
+            with self._lock:
+                if self._expired():
+                    return self._resolve()
+        return self._secret_api_key
+
+    def refresh(self, rejected: Optional[str] = None) -> bool:
+        """
+        Resolve the key again from the providers, returning whether it changed.
+        * rejected: The key the API rejected. When it's no longer the current
+        key, nothing is resolved, and it changed.
+        """
+        with self._lock:
+            previous = self._secret_api_key
+            if rejected is not None and previous is not None and rejected != previous:
+                return True
+            return self._resolve() != previous
+
+    def rotate(self, secret_api_key: str) -> None:
+        """
+        Use a new key instead of the key of the providers, until they return
+        another key
+        """
+        with self._lock:
+            self._secret_api_key = secret_api_key
+            self._rotated = True
+            self._resolved_at = monotonic()
+
+
+def default_credentials() -> CredentialChain:
+    """
+    The `TELEPAY_SECRET_API_KEY` environment variable (or .env file), then the
+    file in `TELEPAY_SECRET_API_KEY_FILE`
+    """
+    return CredentialChain([EnvCredentials(), FileCredentials()])
+
+
+class CredentialAuth(Auth):
+    """
+    httpx authentication setting the `Authorization` header on every request,
+    so the key can change without recreating the client connections. A 401 or
+    403 response to the current key refreshes the credentials and, when the
+    key changed, the request is sent again. The async flow resolves the key in a worker
+    thread, as the providers may block.
+    """
+
+    def __init__(self, credentials: CredentialProvider) -> None:
+        self.credentials = credentials
+
+    def auth_flow(self, request: Request) -> Generator[Request, Response, None]:
+        sent = self.credentials.get_secret_api_key()
+        request.headers["Authorization"] = sent
+        response = yield request
+        if response.status_code in (401, 403) and isinstance(
+            self.credentials, CredentialChain
+        ):
+            try:
+                changed = self.credentials.refresh(sent)
+            except TelePayError:
+                changed = False
+            if changed:
+                logger.debug("Secret API key changed, sending the request again")
+                request.headers["Authorization"] = self.credentials.get_secret_api_key()
+                yield request
+
+    async def async_auth_flow(
+        self, request: Request
+    ) -> AsyncGenerator[Request, Response]:
+        sent = await self._async_secret_api_key()
+        request.headers["Authorization"] = sent
+        response = yield request
+        if response.status_code in (401, 403) and isinstance(
+            self.credentials, CredentialChain
+        ):
+            try:
+                changed = await anyio.to_thread.run_sync(self.credentials.refresh, sent)
+            except TelePayError:
+                changed = False
+            if changed:
+                logger.debug("Secret API key changed, sending the request again")
+                request.headers["Authorization"] = await self._async_secret_api_key()
+                yield request
+
+    async def _async_secret_api_key(self) -> str:
+        if isinstance(self.credentials, CredentialChain):
+            secret_api_key = self.credentials.cached_secret_api_key()
+            if secret_api_key is not None:
+                return secret_api_key
+        return await anyio.to_thread.run_sync(self.credentials.get_secret_api_key)
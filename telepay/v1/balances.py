@@ -0,0 +1,155 @@
+import logging
+import threading
+from time import monotonic
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+WalletKey = Tuple[str, str, str]
+
+
+def wallet_key(wallet: Any) -> WalletKey:
+    if not isinstance(wallet, dict):
+        wallet = vars(wallet)
+    return (wallet["asset"], wallet["blockchain"], wallet["network"])
+
+
+class BalanceCache:
+    """
+    The latest `getBalance` wallets, served for `max_age` seconds. A wallet
+    is invalidated after a transfer or withdrawal from it, or an invoice
+    completed to it, so its next read fetches it again. A fetch started
+    before an invalidation isn't stored, as it may predate the change.
+    """
+
+    def __init__(self, max_age: float = 5.0) -> None:
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self._wallets: Dict[WalletKey, Tuple[float, dict]] = {}
+        # the wallets known when all of them were fetched, and when
+        self._keys: Optional[Set[WalletKey]] = None
+        self._fetched_at = 0.0
+        # the wallets invalidated since
+        self._invalidated: Set[WalletKey] = set()
+        # incremented by each invalidation, and each change
+        self._generation = 0
+        self._version = 0
+        self._lock = threading.Lock()
+
+    @property
+    def generation(self) -> int:
+        """
+        Taken before a fetch, to pass to `update`
+        """
+        return self._generation
+
+    @property
+    def version(self) -> int:
+        """
+        Changes whenever the cached wallets change
+        """
+        return self._version
+
+    def _fresh(self, fetched_at: float) -> bool:
+        return monotonic() - fetched_at < self.max_age
+
+    def get(
+        self, key: Optional[WalletKey] = None, record: bool = True
+    ) -> Optional[List[dict]]:
+        """
+        The cached wallets, or only the `key` wallet, or None when they're
+        stale or invalidated. `record` counts the read as a hit or miss.
+        """
+        with self._lock:
+            if key is not None:
+                cached = self._wallets.get(key)
+                if (
+                    cached is None
+                    and self._keys is not None
+                    and key not in self._invalidated
+                ):
+                    # a wallet missing from all of them has no balance
+                    wallets: Optional[List[dict]] = (
+                        [] if self._fresh(self._fetched_at) else None
+                    )
+                else:
+                    fresh = cached is not None and self._fresh(cached[0])
+                    wallets = [dict(cached[1])] if fresh else None
+            elif (
+                self._keys is not None
+                and not self._invalidated
+                and self._fresh(self._fetched_at)
+            ):
+                wallets = [dict(self._wallets[key][1]) for key in self._keys]
+            else:
+                wallets = None
+            if not record:
+                pass
+            elif wallets is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return wallets
+
+    def update(
+        self,
+        wallets: Iterable[dict],
+        complete: bool = True,
+        generation: Optional[int] = None,
+    ) -> None:
+        """
+        Store fetched wallets: all of them when `complete`. With the
+        `generation` taken before the fetch, they're discarded when the cache
+        was invalidated since.
+        """
+        now = monotonic()
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                logger.debug("Balance fetched before an invalidation, not stored")
+                return
+            keys = set()
+            for wallet in wallets:
+                key = wallet_key(wallet)
+                self._wallets[key] = (now, dict(wallet))
+                keys.add(key)
+            self._invalidated -= keys
+            if complete:
+                for key in set(self._wallets) - keys:
+                    del self._wallets[key]
+                self._keys = keys
+                self._fetched_at = now
+                self._invalidated.clear()
+            self._version += 1
+
+    def invalidate(self, key: Optional[WalletKey] = None) -> None:
+        """
+        Fetch the `key` wallet, or all of them, on their next read. The other
+        wallets are still served.
+        """
+        with self._lock:
+            if key is None:
+                self._wallets.clear()
+                self._keys = None
+                self._invalidated.clear()
+            else:
+                self._wallets.pop(key, None)
+                self._invalidated.add(key)
+            self._generation += 1
+            self._version += 1
+        logger.debug(f"Balance invalidated: {key or 'all wallets'}")
+
+    def on_invoice(self, invoice: dict) -> None:
+        """
+        An invoice event: a completed invoice credited its wallet
+        """
+        if invoice.get("status") == "completed":
+            try:
+                self.invalidate(wallet_key(invoice))
+            except KeyError:
+                self.invalidate()
+
+    def stats(self) -> dict:
+        with self._lock:
+            wallets = len(self._wallets)
+        return {"wallets": wallets, "hits": self.hits, "misses": self.misses}
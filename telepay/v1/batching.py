@@ -0,0 +1,82 @@
+from dataclasses import dataclass, field
+from decimal import Decimal
+from typing import Any, List, NamedTuple, Optional
+from uuid import uuid4
+
+# kinds of payout
+WITHDRAW = "withdraw"
+TRANSFER = "transfer"
+
+# outcomes of a payout request
+QUEUED = "queued"
+SENT = "sent"
+# rejected by the API, nothing was paid
+FAILED = "failed"
+# sent, but its outcome is unknown, like after a timeout: it may have been paid
+UNKNOWN = "unknown"
+CANCELLED = "cancelled"
+
+
+class BatchKey(NamedTuple):
+    """
+    Payouts sent together: same kind, destination, wallet and message. The
+    destination is the address of a withdrawal, or the username of a
+    transfer.
+    """
+
+    kind: str
+    destination: str
+    asset: str
+    blockchain: str
+    network: str
+    message: Optional[str] = None
+
+
+@dataclass
+class PayoutRequest:
+    """
+    A queued payout, updated with its outcome once its batch is sent
+    """
+
+    key: BatchKey
+    amount: float
+    queued_at: float = 0.0
+    status: str = QUEUED
+    batch: Optional["PayoutBatch"] = field(default=None, repr=False, compare=False)
+    error: Optional[Exception] = None
+
+    @property
+    def message(self) -> Optional[str]:
+        return self.key.message
+
+    @property
+    def done(self) -> bool:
+        return self.status != QUEUED
+
+
+@dataclass
+class PayoutBatch:
+    """
+    Payout requests aggregated into a single call, with the idempotency key
+    its outcome is recorded by
+    """
+
+    key: BatchKey
+    requests: List[PayoutRequest]
+    idempotency_key: str = field(default_factory=lambda: uuid4().hex)
+    result: Any = None
+
+    @property
+    def amount(self) -> float:
+        total = sum(Decimal(str(request.amount)) for request in self.requests)
+        return float(total)
+
+    @property
+    def message(self) -> Optional[str]:
+        return self.key.message
+
+    def finish(self, status: str, error: Optional[Exception] = None) -> None:
+        for request in self.requests:
+            request.status = status
+            request.batch = self
+            request.error = error
@@ -0,0 +1,200 @@
+import logging
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+from time import monotonic
+from typing import Callable, Deque, Dict, Optional, Tuple
+
+from .errors import TelePayError
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+CIRCUIT_OPEN = "circuit.open"
+
+
+@dataclass
+class CircuitPolicy:
+    """
+    When the circuit of an endpoint opens.
+    * window: Number of recent calls the rates are computed on.
+    * min_calls: Calls needed in the window before the circuit can open.
+    * failure_rate: Rate of failed calls opening the circuit.
+    * slow_call_duration: Calls longer than this, in seconds, are slow.
+    * slow_call_rate: Rate of slow calls opening the circuit.
+    * open_seconds: How long the circuit stays open before probing the API.
+    * half_open_calls: Probe calls let through; the circuit closes when they
+    all succeed, and opens again on the first failure.
+    """
+
+    window: int = 20
+    min_calls: int = 10
+    failure_rate: float = 0.5
+    slow_call_duration: float = 10.0
+    slow_call_rate: float = 0.8
+    open_seconds: float = 30.0
+    half_open_calls: int = 3
+
+
+@dataclass
+class Circuit:
+    """
+    State of the circuit of an endpoint
+    """
+
+    name: str
+    policy: CircuitPolicy
+    state: str = CLOSED
+    opened_at: float = 0.0
+    # (failed, slow) of the recent calls
+    outcomes: Deque[Tuple[bool, bool]] = field(default_factory=deque)
+    probes: int = 0
+    probe_successes: int = 0
+
+    def rates(self) -> Tuple[float, float]:
+        if not self.outcomes:
+            return 0.0, 0.0
+        calls = len(self.outcomes)
+        failed = sum(1 for failure, _ in self.outcomes if failure)
+        slow = sum(1 for _, is_slow in self.outcomes if is_slow)
+        return failed / calls, slow / calls
+
+    def _transition(self, state: str, now: float) -> None:
+        logger.info(f"Circuit of {self.name} is now {state}")
+        self.state = state
+        self.outcomes.clear()
+        self.probes = 0
+        self.probe_successes = 0
+        if state == OPEN:
+            self.opened_at = now
+
+    def acquire(self, now: float) -> bool:
+        """
+        Whether a call can be made now
+        """
+        if self.state == OPEN:
+            if now - self.opened_at < self.policy.open_seconds:
+                return False
+            self._transition(HALF_OPEN, now)
+        if self.state == HALF_OPEN:
+            if self.probes >= self.policy.half_open_calls:
+                return False
+            self.probes += 1
+        return True
+
+    def record(self, failed: bool, slow: bool, now: float) -> None:
+        if self.state == HALF_OPEN:
+            if failed or slow:
+                self._transition(OPEN, now)
+                return
+            self.probe_successes += 1
+            if self.probe_successes >= self.policy.half_open_calls:
+                self._transition(CLOSED, now)
+            return
+        if self.state == OPEN:
+            return
+        self.outcomes.append((failed, slow))
+        while len(self.outcomes) > self.policy.window:
+            self.outcomes.popleft()
+        if len(self.outcomes) < self.policy.min_calls:
+            return
+        failure_rate, slow_call_rate = self.rates()
+        if (
+            failure_rate >= self.policy.failure_rate
+            or slow_call_rate >= self.policy.slow_call_rate
+        ):
+            self._transition(OPEN, now)
+
+    def release(self) -> None:
+        """
+        Give back a probe whose outcome doesn't tell about the API health
+        """
+        if self.state == HALF_OPEN and self.probes:
+            self.probes -= 1
+
+    def snapshot(self, now: float) -> dict:
+        failure_rate, slow_call_rate = self.rates()
+        snapshot = {
+            "state": self.state,
+            "calls": len(self.outcomes),
+            "failure_rate": failure_rate,
+            "slow_call_rate": slow_call_rate,
+        }
+        if self.state == OPEN:
+            snapshot["retry_after"] = self.retry_after(now)
+        return snapshot
+
+    def retry_after(self, now: float) -> float:
+        return max(0.0, self.opened_at + self.policy.open_seconds - now)
+
+
+class CircuitBreaker:
+    """
+    Circuits tracked per endpoint, sharing the same policy, or the one given
+    for the endpoint in `policies`
+    """
+
+    def __init__(
+        self,
+        policy: Optional[CircuitPolicy] = None,
+        policies: Optional[Dict[str, CircuitPolicy]] = None,
+        clock: Callable[[], float] = monotonic,
+    ) -> None:
+        self.policy = policy or CircuitPolicy()
+        self.policies = policies or {}
+        self.clock = clock
+        self.circuits: Dict[str, Circuit] = {}
+        self._lock = threading.Lock()
+
+    def _circuit(self, endpoint: str) -> Circuit:
+        circuit = self.circuits.get(endpoint)
+        if circuit is None:
+            policy = self.policies.get(endpoint, self.policy)
+            circuit = self.circuits[endpoint] = Circuit(endpoint, policy)
+        return circuit
+
+    def acquire(self, endpoint: str) -> None:
+        """
+        Raise TelePayError `circuit.open` when the endpoint's circuit is open
+        """
+        with self._lock:
+            circuit = self._circuit(endpoint)
+            now = self.clock()
+            if circuit.acquire(now):
+                return
+            retry_after = circuit.retry_after(now)
+        raise TelePayError(
+            status_code=0,
+            error=CIRCUIT_OPEN,
+            message=f"The circuit of {endpoint} is open",
+            retry_after=retry_after,
+        )
+
+    def record(self, endpoint: str, failed: bool, seconds: float) -> None:
+        with self._lock:
+            circuit = self._circuit(endpoint)
+            slow = seconds >= circuit.policy.slow_call_duration
+            circuit.record(failed, slow, self.clock())
+
+    def release(self, endpoint: str) -> None:
+        with self._lock:
+            self._circuit(endpoint).release()
+
+    def state(self, endpoint: str) -> str:
+        with self._lock:
+            circuit = self.circuits.get(endpoint)
+            return circuit.state if circuit is not None else CLOSED
+
+    def snapshot(self) -> Dict[str, dict]:
+        with self._lock:
+            now = self.clock()
+            return {
+                name: circuit.snapshot(now) for name, circuit in self.circuits.items()
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self.circuits.clear()
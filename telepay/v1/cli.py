@@ -0,0 +1,324 @@
+"""
+The `telepay` command, for bulk jobs: `telepay --help`.
+The secret API key is taken from `TELEPAY_SECRET_API_KEY`, like the clients.
+"""
+import argparse
+import csv
+import hashlib
+import json
+import logging
+import sys
+import threading
+from pathlib import Path
+from time import monotonic
+from typing import IO, Any, Iterator, List, Optional, Tuple, Union
+
+from ._sync.client import TelePaySyncClient
+from ._sync.concurrency import SyncConcurrencyLimiter
+from ._sync.middlewares import SyncRetryMiddleware
+from .concurrency import AdaptiveLimit
+from .errors import TelePayError
+from .export import WRITERS
+
+logger = logging.getLogger(__name__)
+
+# columns of the invoices file converted from text
+INTEGER_FIELDS = ("expires_at",)
+FLOAT_FIELDS = ("amount",)
+JSON_FIELDS = ("metadata",)
+
+
+class Progress:
+    """
+    Progress and throughput of a job, refreshed on a single stderr line
+    """
+
+    def __init__(
+        self,
+        label: str,
+        total: Optional[int] = None,
+        stream: Optional[IO] = None,
+        interval: float = 0.5,
+    ) -> None:
+        self.label = label
+        self.total = total
+        self.stream = stream or sys.stderr
+        self.interval = interval
+        self.done = 0
+        self.failed = 0
+        self.started_at = monotonic()
+        self._shown_at = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def throughput(self) -> float:
+        elapsed = monotonic() - self.started_at
+        return self.done / elapsed if elapsed > 0 else 0.0
+
+    def line(self) -> str:
+        done = f"{self.done}/{self.total}" if self.total is not None else self.done
+        failed = f", {self.failed} failed" if self.failed else ""
+        return f"{self.label}: {done}{failed} ({self.throughput:.1f}/s)"
+
+    def _show(self) -> None:
+        # with the lock held
+        now = monotonic()
+        if now - self._shown_at >= self.interval:
+            self._shown_at = now
+            self.stream.write(f"\r{self.line()}")
+            self.stream.flush()
+
+    def update(self, done: int) -> None:
+        with self._lock:
+            self.done = max(self.done, done)
+            self._show()
+
+    def advance(self, failed: bool = False) -> None:
+        with self._lock:
+            if failed:
+                self.failed += 1
+            else:
+                self.done += 1
+            self._show()
+
+    def finish(self) -> None:
+        elapsed = monotonic() - self.started_at
+        self.stream.write(f"\r{self.line()} in {elapsed:.1f}s\n")
+        self.stream.flush()
+
+
+def parse_invoice(row: Any) -> dict:
+    """
+    The `create_invoice` arguments of a row, converted from text
+    """
+    if not isinstance(row, dict):
+        raise ValueError(f"Expected an object, got {type(row).__name__}")
+    invoice = {key: value for key, value in row.items() if value != ""}
+    for key in INTEGER_FIELDS:
+        if key in invoice:
+            invoice[key] = int(invoice[key])
+    for key in FLOAT_FIELDS:
+        if key in invoice:
+            invoice[key] = float(invoice[key])
+    for key in JSON_FIELDS:
+        if isinstance(invoice.get(key), str):
+            invoice[key] = json.loads(invoice[key])
+    return invoice
+
+
+def read_invoices(
+    path: Path, format: Optional[str] = None
+) -> Iterator[Tuple[int, Union[dict, ValueError]]]:
+    """
+    The `create_invoice` arguments of each row of a CSV or JSON lines file,
+    read lazily and numbered from 1. A row that can't be parsed gives its
+    error instead.
+    """
+    format = format or ("csv" if path.suffix.lower() == ".csv" else "jsonl")
+    with path.open(newline="", encoding="utf-8") as file:
+        if format == "csv":
+            rows: Iterator[Any] = csv.DictReader(file)
+        else:
+            rows = (line for line in file if line.strip())
+        for number, row in enumerate(rows, 1):
+            try:
+                yield number, parse_invoice(row if format == "csv" else json.loads(row))
+            except (ValueError, TypeError) as e:
+                yield number, ValueError(f"Invalid row: {e}")
+
+
+def client_from(args: argparse.Namespace) -> TelePaySyncClient:
+    # a single client, so every call of the job shares its connection pool
+    limit = AdaptiveLimit(initial=args.concurrency, max_limit=args.concurrency)
+    return TelePaySyncClient(
+        args.secret_api_key,
+        middlewares=[SyncRetryMiddleware()],
+        limiter=SyncConcurrencyLimiter(limit),
+    )
+
+
+def row_idempotency_key(path: Path, line: int, invoice: dict) -> str:
+    """
+    Idempotency key of a row, derived from its file, line and content
+    """
+    row = json.dumps([str(path.resolve()), line, invoice], sort_keys=True, default=str)
+    return hashlib.sha256(row.encode()).hexdigest()
+
+
+def describe(error: Exception) -> str:
+    if isinstance(error, TelePayError):
+        return f"{error.error}: {error.message}"
+    return str(error) or type(error).__name__
+
+
+def create_invoices(args: argparse.Namespace, output: IO) -> int:
+    progress = Progress("Created invoices")
+    lock = threading.Lock()
+
+    def write(result: dict) -> None:
+        with lock:
+            output.write(json.dumps(result) + "\n")
+
+    def create(item: Tuple[int, Union[dict, ValueError]]) -> Optional[Exception]:
+        line, invoice = item
+        if isinstance(invoice, ValueError):
+            # not sent, so not counted by the concurrency limit
+            progress.advance(failed=True)
+            return invoice
+        try:
+            # with a key, the calls that failed on the way are retried
+            key = row_idempotency_key(args.file, line, invoice)
+            created = client.create_invoice(**{"idempotency_key": key, **invoice})
+        except Exception:
+            # raised, so the concurrency limit backs off on errors like 429
+            progress.advance(failed=True)
+            raise
+        write(
+            {
+                "line": line,
+                "number": created.number,
+                "checkout_url": created.checkout_url,
+            }
+        )
+        progress.advance()
+        return None
+
+    with client_from(args) as client:
+        results = client.bulk(create, read_invoices(args.file, args.format))
+    progress.finish()
+    # the results are in the order of the rows, numbered from 1
+    failed = 0
+    for line, error in enumerate(results, 1):
+        if error is not None:
+            write({"line": line, "error": describe(error)})
+            failed += 1
+    return 1 if failed else 0
+
+
+def export_invoices(args: argparse.Namespace, output: IO) -> int:
+    progress = Progress("Exported invoices")
+    columns = args.columns.split(",") if args.columns else None
+    with client_from(args) as client:
+        client.export_invoices(
+            args.file, args.format, columns, progress=progress.update
+        )
+    progress.finish()
+    return 0
+
+
+def sweep_invoices(args: argparse.Namespace, output: IO) -> int:
+    progress = Progress(f"Swept invoices ({args.action})")
+    with client_from(args) as client:
+        counts = client.sweep_invoices(
+            args.action,
+            args.status or ["pending"],
+            args.older_than,
+            concurrency=args.concurrency,
+            rate=args.rate,
+            checkpoint=args.checkpoint,
+            progress=progress.update,
+        )
+    progress.finish()
+    output.write(json.dumps(counts) + "\n")
+    return 1 if counts.get("failed") else 0
+
+
+def show_balances(args: argparse.Namespace, output: IO) -> int:
+    with client_from(args) as client:
+        wallets = client.get_balance().wallets
+    for wallet in wallets:
+        if not isinstance(wallet, dict):
+            wallet = vars(wallet)
+        name = f"{wallet['asset']} {wallet['blockchain']} {wallet['network']}"
+        output.write(f"{name:<32} {wallet['balance']}\n")
+    return 0
+
+
+def listen(args: argparse.Namespace, output: IO) -> int:
+    from .webhooks import TelePayWebhookListener
+
+    def callback(headers: Any, data: str) -> None:
+        output.write(data + "\n")
+        output.flush()
+
+    listener = TelePayWebhookListener(
+        secret=args.secret, callback=callback, host=args.host, port=args.port
+    )
+    listener.listen()
+    return 0
+
+
+def parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="telepay", description="Bulk jobs on the TelePay API"
+    )
+    parser.add_argument(
+        "--secret-api-key", help="by default, from TELEPAY_SECRET_API_KEY"
+    )
+    parser.add_argument(
+        "--concurrency", type=int, default=8, help="maximum calls at the same time"
+    )
+    parser.add_argument("-v", "--verbose", action="store_true", help="debug logs")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    create = commands.add_parser(
+        "create-invoices",
+        help="create the invoices of a CSV or JSON lines file",
+        description="Create an invoice per row, with the create_invoice "
+        "arguments as columns. Writes a JSON line per row, with its invoice "
+        "number or error.",
+    )
+    create.add_argument("file", type=Path)
+    create.add_argument("--format", choices=["csv", "jsonl"])
+    create.set_defaults(run=create_invoices)
+
+    export = commands.add_parser("export", help="export the invoices to a file")
+    export.add_argument("file", type=Path)
+    export.add_argument("--format", choices=list(WRITERS), default="csv")
+    export.add_argument(
+        "--columns", help="comma separated, like number,status,metadata.order_id"
+    )
+    export.set_defaults(run=export_invoices)
+
+    sweep = commands.add_parser("sweep", help="cancel or delete stale invoices")
+    sweep.add_argument("--action", choices=["cancel", "delete"], default="cancel")
+    sweep.add_argument(
+        "--status", action="append", help="statuses swept, pending by default"
+    )
+    sweep.add_argument(
+        "--older-than", type=float, default=0.0, help="minimum age, in seconds"
+    )
+    sweep.add_argument("--rate", type=float, help="maximum calls per second")
+    sweep.add_argument("--checkpoint", type=Path, help="file to resume the sweep")
+    sweep.set_defaults(run=sweep_invoices)
+
+    balances = commands.add_parser("balances", help="show the wallet balances")
+    balances.set_defaults(run=show_balances)
+
+    listener = commands.add_parser(
+        "listen", help="run the webhook listener, printing the events"
+    )
+    listener.add_argument("--secret", required=True, help="webhook secret")
+    listener.add_argument("--host", default="localhost")
+    listener.add_argument("--port", type=int, default=5000)
+    listener.set_defaults(run=listen)
+    return parser
+
+
+def main(argv: Optional[List[str]] = None, output: IO = sys.stdout) -> int:
+    args = parser().parse_args(argv)
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.WARNING)
+    try:
+        return args.run(args, output)
+    except TelePayError as e:
+        sys.stderr.write(f"\n{e.error}: {e.message}\n")
+        return 1
+    except (OSError, ValueError, csv.Error) as e:
+        sys.stderr.write(f"\n{e}\n")
+        return 1
+    except KeyboardInterrupt:
+        return 130
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,105 @@
+import logging
+import threading
+from dataclasses import dataclass, field
+from time import monotonic
+from typing import Optional
+
+from httpx import TimeoutException
+
+from .errors import TelePayError
+
+logger = logging.getLogger(__name__)
+
+# statuses telling that the API is overloaded
+OVERLOAD_STATUSES = (429, 502, 503, 504)
+
+
+def overloaded(error: Optional[BaseException]) -> bool:
+    """
+    Whether a call failed because of too much concurrency
+    """
+    if isinstance(error, TelePayError):
+        return error.status_code in OVERLOAD_STATUSES
+    return isinstance(error, (TimeoutException, TimeoutError))
+
+
+@dataclass
+class AdaptiveLimit:
+    """
+    Concurrency limit converging on the highest concurrency the API
+    tolerates. It grows by one every `limit` successful calls (additive
+    increase), shrinks by `backoff` when the API is overloaded (multiplicative
+    decrease), and by the latency gradient when the smoothed latency goes
+    over `tolerance` times the lowest one seen.
+    """
+
+    initial: int = 4
+    min_limit: int = 1
+    max_limit: int = 64
+    tolerance: float = 2.0
+    backoff: float = 0.5
+    smoothing: float = 0.2
+    limit: float = field(init=False)
+    latency: Optional[float] = field(default=None, init=False)
+    baseline: Optional[float] = field(default=None, init=False)
+
+    def __post_init__(self):
+        self.limit = float(min(max(self.initial, self.min_limit), self.max_limit))
+
+    @property
+    def current(self) -> int:
+        return int(self.limit)
+
+    def update(self, seconds: float, error: Optional[BaseException] = None) -> None:
+        """
+        Adjust the limit after a call that took `seconds`
+        """
+        if overloaded(error):
+            self._set(self.limit * self.backoff)
+            return
+        if error is not None:
+            # the API answered, but the call was invalid: nothing learnt
+            return
+        if self.latency is None:
+            self.latency = self.baseline = seconds
+        else:
+            self.latency += (seconds - self.latency) * self.smoothing
+            # the baseline follows the lowest latencies, and slowly drifts up
+            self.baseline = min(seconds, self.baseline * 1.01)
+        threshold = self.baseline * self.tolerance
+        if self.latency > threshold > 0:
+            self._set(self.limit * max(self.backoff, threshold / self.latency))
+        else:
+            self._set(self.limit + 1 / self.limit)
+
+    def _set(self, limit: float) -> None:
+        limit = min(max(limit, self.min_limit), self.max_limit)
+        if int(limit) != int(self.limit):
+            logger.debug(f"Concurrency limit is now {int(limit)}")
+        self.limit = limit
+
+
+class TokenBucket:
+    """
+    Rate limit of `rate` calls per second, with bursts of up to `burst` calls
+    """
+
+    def __init__(self, rate: float, burst: int = 1) -> None:
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated_at = monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """
+        Take a token, returning how long to wait until it is available
+        """
+        with self._lock:
+            now = monotonic()
+            self._tokens = min(
+                self.burst, self._tokens + (now - self._updated_at) * self.rate
+            )
+            self._updated_at = now
+            self._tokens -= 1
+            return max(0.0, -self._tokens / self.rate)
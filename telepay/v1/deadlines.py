@@ -0,0 +1,72 @@
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import monotonic
+from typing import Iterator, Optional
+
+from .errors import TelePayError
+
+logger = logging.getLogger(__name__)
+
+DEADLINE_EXCEEDED = "deadline.exceeded"
+
+# absolute monotonic time by which the current client calls must finish
+_deadline: ContextVar[Optional[float]] = ContextVar("deadline", default=None)
+
+
+@contextmanager
+def deadline(seconds: float) -> Iterator[None]:
+    """
+    Bound the client calls made inside the block, with their retries, to
+    `seconds` in total. Nested deadlines can only shorten the budget.
+    The async clients cancel the outstanding work at the deadline. The sync
+    clients can't interrupt a blocking request, each request timeout is
+    shortened to the time left instead.
+    """
+    at = monotonic() + seconds
+    current = _deadline.get()
+    token = _deadline.set(at if current is None else min(at, current))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining() -> Optional[float]:
+    """
+    Seconds left before the current deadline, or None without a deadline
+    """
+    at = _deadline.get()
+    return None if at is None else at - monotonic()
+
+
+def expired() -> bool:
+    left = remaining()
+    return left is not None and left <= 0
+
+
+def allows(seconds: float) -> bool:
+    """
+    Whether waiting `seconds` still leaves time before the deadline
+    """
+    left = remaining()
+    return left is None or seconds < left
+
+
+def clamp(timeout: Optional[float]) -> Optional[float]:
+    """
+    The timeout of a request, shortened to the time left before the deadline
+    """
+    left = remaining()
+    if left is None:
+        return timeout
+    left = max(left, 0.0)
+    return left if timeout is None else min(timeout, left)
+
+
+def deadline_exceeded(endpoint: str) -> TelePayError:
+    return TelePayError(
+        status_code=0,
+        error=DEADLINE_EXCEEDED,
+        message=f"Deadline exceeded calling {endpoint}",
+    )
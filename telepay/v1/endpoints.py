@@ -0,0 +1,234 @@
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
+
+from httpx import Timeout
+from httpx._types import TimeoutTypes
+
+from .models.account import Account
+from .models.assets import Asset, Assets
+from .models.invoice import Invoice, InvoiceList
+from .models.wallets import Wallets
+from .models.webhooks import Webhook, Webhooks
+
+# timeout of the clients, when none is given
+DEFAULT_TIMEOUT = Timeout(60)
+# calls made while a customer waits, like in a checkout, get a short timeout:
+# create_invoice and get_invoice used to have the 60 seconds of the others
+INTERACTIVE_TIMEOUT = 15.0
+
+
+class _ClientDefault:
+    def __repr__(self) -> str:
+        return "CLIENT_DEFAULT"
+
+
+# default `timeout` of the clients, so that a given timeout, even equal to
+# `DEFAULT_TIMEOUT`, replaces the endpoint defaults
+CLIENT_DEFAULT: Any = _ClientDefault()
+
+
+@dataclass(frozen=True)
+class Endpoint:
+    """
+    A TelePay API endpoint.
+    * name: The endpoint name in the API, like `createInvoice`.
+    * operation: The client method calling it, like `create_invoice`.
+    * path: The url path, with the path parameters, like `getInvoice/{number}`.
+    * model: The model parsing the response, or None to return the JSON.
+    * idempotent: Whether sending the request twice is harmless.
+    * timeout: Default timeout of the requests, in seconds, when the client has
+    the default timeout, or None to use the client timeout.
+    """
+
+    name: str
+    operation: str
+    method: str
+    path: str
+    model: Optional[Any] = None
+    idempotent: bool = False
+    timeout: Optional[float] = None
+
+    def url(self, **params: str) -> str:
+        return self.path.format(**params) if params else self.path
+
+    def parse(self, json: Any) -> Any:
+        return self.model.from_json(json) if self.model is not None else json
+
+
+GET_ME = Endpoint(
+    "getMe",
+    "get_me",
+    "GET",
+    "getMe",
+    Account,
+    idempotent=True,
+    timeout=INTERACTIVE_TIMEOUT,
+)
+GET_BALANCE = Endpoint(
+    "getBalance",
+    "get_balance",
+    "GET",
+    "getBalance",
+    Wallets,
+    idempotent=True,
+    timeout=INTERACTIVE_TIMEOUT,
+)
+GET_WALLET_BALANCE = Endpoint(
+    "getBalance",
+    "get_balance",
+    "POST",
+    "getBalance",
+    Wallets,
+    idempotent=True,
+    timeout=INTERACTIVE_TIMEOUT,
+)
+GET_ASSET = Endpoint(
+    "getAsset",
+    "get_asset",
+    "GET",
+    "getAsset",
+    Asset,
+    idempotent=True,
+    timeout=INTERACTIVE_TIMEOUT,
+)
+GET_ASSETS = Endpoint(
+    "getAssets", "get_assets", "GET", "getAssets", Assets, idempotent=True
+)
+GET_INVOICES = Endpoint(
+    "getInvoices", "get_invoices", "GET", "getInvoices", InvoiceList, idempotent=True
+)
+GET_INVOICE = Endpoint(
+    "getInvoice",
+    "get_invoice",
+    "GET",
+    "getInvoice/{number}",
+    Invoice,
+    idempotent=True,
+    timeout=INTERACTIVE_TIMEOUT,
+)
+CREATE_INVOICE = Endpoint(
+    "createInvoice",
+    "create_invoice",
+    "POST",
+    "createInvoice",
+    Invoice,
+    timeout=INTERACTIVE_TIMEOUT,
+)
+CANCEL_INVOICE = Endpoint(
+    "cancelInvoice",
+    "cancel_invoice",
+    "POST",
+    "cancelInvoice/{number}",
+    Invoice,
+    # not idempotent: cancelling again answers `invoice.not-cancellable`
+    timeout=INTERACTIVE_TIMEOUT,
+)
+DELETE_INVOICE = Endpoint(
+    "deleteInvoice", "delete_invoice", "POST", "deleteInvoice/{number}"
+)
+TRANSFER = Endpoint("transfer", "transfer", "POST", "transfer")
+GET_WITHDRAW_MINIMUM = Endpoint(
+    "getWithdrawMinimum",
+    "get_withdraw_minimum",
+    "POST",
+    "getWithdrawMinimum",
+    idempotent=True,
+)
+GET_WITHDRAW_FEE = Endpoint(
+    "getWithdrawFee", "get_withdraw_fee", "POST", "getWithdrawFee", idempotent=True
+)
+WITHDRAW = Endpoint("withdraw", "withdraw", "POST", "withdraw")
+CREATE_WEBHOOK = Endpoint(
+    "createWebhook", "create_webhook", "POST", "createWebhook", Webhook
+)
+UPDATE_WEBHOOK = Endpoint(
+    "updateWebhook",
+    "update_webhook",
+    "POST",
+    "updateWebhook/{id}",
+    Webhook,
+    idempotent=True,
+)
+ACTIVATE_WEBHOOK = Endpoint(
+    "activateWebhook",
+    "activate_webhook",
+    "POST",
+    "activateWebhook/{id}",
+    Webhook,
+    idempotent=True,
+)
+DEACTIVATE_WEBHOOK = Endpoint(
+    "deactivateWebhook",
+    "deactivate_webhook",
+    "POST",
+    "deactivateWebhook/{id}",
+    Webhook,
+    idempotent=True,
+)
+DELETE_WEBHOOK = Endpoint(
+    "deleteWebhook", "delete_webhook", "POST", "deleteWebhook/{id}"
+)
+GET_WEBHOOK = Endpoint(
+    "getWebhook", "get_webhook", "GET", "getWebhook/{id}", Webhook, idempotent=True
+)
+GET_WEBHOOKS = Endpoint(
+    "getWebhooks", "get_webhooks", "GET", "getWebhooks", Webhooks, idempotent=True
+)
+
+ENDPOINTS = (
+    GET_ME,
+    GET_BALANCE,
+    GET_WALLET_BALANCE,
+    GET_ASSET,
+    GET_ASSETS,
+    GET_INVOICES,
+    GET_INVOICE,
+    CREATE_INVOICE,
+    CANCEL_INVOICE,
+    DELETE_INVOICE,
+    TRANSFER,
+    GET_WITHDRAW_MINIMUM,
+    GET_WITHDRAW_FEE,
+    WITHDRAW,
+    CREATE_WEBHOOK,
+    UPDATE_WEBHOOK,
+    ACTIVATE_WEBHOOK,
+    DEACTIVATE_WEBHOOK,
+    DELETE_WEBHOOK,
+    GET_WEBHOOK,
+    GET_WEBHOOKS,
+)
+
+
+def endpoint_timeouts(
+    timeout: TimeoutTypes, timeouts: Optional[Dict[str, float]] = None
+) -> Dict[str, Optional[float]]:
+    """
+    The timeout of each endpoint: the given one or, when the client wasn't
+    given a timeout (`CLIENT_DEFAULT`), its default. A timeout given to the
+    client applies to every endpoint without a timeout in `timeouts`.
+    """
+    resolved: Dict[str, Optional[float]] = {
+        endpoint.name: endpoint.timeout if timeout is CLIENT_DEFAULT else None
+        for endpoint in ENDPOINTS
+    }
+    resolved.update(timeouts or {})
+    return resolved
+
+
+@dataclass
+class RequestContext:
+    """
+    A client call going through the request pipeline.
+    * options: Per-call settings read by the middlewares, like `timeout`, in
+    seconds, or `request`, the extra arguments of the HTTP request.
+    * attempt: Number of the current attempt, starting at 0.
+    * response: The JSON response, before it's parsed.
+    """
+
+    endpoint: Endpoint
+    url: str
+    json: Optional[dict] = None
+    options: Dict[str, Any] = field(default_factory=dict)
+    attempt: int = 0
+    response: Any = None
@@ -7,3 +7,5 @@ class TelePayError(Exception):
     status_code: int
     error: str
     message: Optional[str] = field(default=None)
+    # seconds to wait before retrying, from the Retry-After header
+    retry_after: Optional[float] = field(default=None)
@@ -0,0 +1,252 @@
+import csv
+import json
+import logging
+import re
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import IO, Any, Dict, List, Optional, Sequence, Union
+
+from .errors import TelePayError
+
+logger = logging.getLogger(__name__)
+
+CSV = "csv"
+JSONL = "jsonl"
+PARQUET = "parquet"
+
+# invoices written per chunk, and rows per Parquet row group
+CHUNK_SIZE = 1000
+
+DEFAULT_COLUMNS = (
+    "number",
+    "status",
+    "asset",
+    "blockchain",
+    "network",
+    "amount",
+    "description",
+    "metadata",
+    "created_at",
+    "updated_at",
+    "expires_at",
+    "checkout_url",
+    "explorer_url",
+)
+
+Destination = Union[str, Path, IO]
+
+
+class InvoiceStreamDecoder:
+    """
+    Decodes the invoices of a `getInvoices` response while its text arrives,
+    so only the invoice being received is held in memory.
+    """
+
+    def __init__(self, key: str = "invoices") -> None:
+        self._start = re.compile(r'"%s"\s*:\s*\[' % re.escape(key))
+        self._decoder = json.JSONDecoder()
+        self._buffer = ""
+        self._started = False
+        self._finished = False
+
+    def feed(self, text: str) -> List[dict]:
+        """
+        Add text of the response, returning the invoices completed by it
+        """
+        buffer = self._buffer + text
+        invoices: List[dict] = []
+        position = 0
+        if not self._started:
+            match = self._start.search(buffer)
+            if match is None:
+                self._buffer = buffer
+                return invoices
+            self._started = True
+            position = match.end()
+        while not self._finished:
+            while position < len(buffer) and buffer[position] in " \t\r\n,":
+                position += 1
+            if position == len(buffer):
+                break
+            if buffer[position] == "]":
+                self._finished = True
+                break
+            try:
+                invoice, position = self._decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                # the invoice isn't complete yet
+                break
+            invoices.append(invoice)
+        self._buffer = "" if self._finished else buffer[position:]
+        return invoices
+
+    def close(self) -> None:
+        if not self._finished:
+            raise TelePayError(
+                status_code=0,
+                error="export.incomplete-response",
+                message="The invoices response ended before the invoices list",
+            )
+
+
+def flatten(value: Dict[str, Any], prefix: str = "") -> Dict[str, Any]:
+    """
+    Nested objects as dotted keys: `{"metadata": {"order": {"id": 1}}}` gives
+    `{"metadata.order.id": 1}`. Lists are kept as JSON.
+    """
+    flat: Dict[str, Any] = {}
+    for key, item in value.items():
+        if isinstance(item, dict) and item:
+            flat.update(flatten(item, f"{prefix}{key}."))
+        elif isinstance(item, list):
+            flat[f"{prefix}{key}"] = json.dumps(item)
+        else:
+            flat[f"{prefix}{key}"] = item
+    return flat
+
+
+def invoice_row(invoice: dict, columns: Optional[Sequence[str]] = None) -> dict:
+    """
+    An exported row: the invoice with its metadata flattened, restricted to
+    `columns` when given. The `metadata` column holds the whole metadata, as
+    JSON, and `metadata.<key>` columns its values.
+    """
+    metadata = invoice.get("metadata")
+    if isinstance(metadata, str):
+        try:
+            metadata = json.loads(metadata)
+        except ValueError:
+            pass
+    row = flatten({key: value for key, value in invoice.items() if key != "metadata"})
+    if isinstance(metadata, dict):
+        row.update(flatten(metadata, "metadata."))
+    else:
+        row["metadata"] = metadata
+    if columns is None:
+        return row
+    selected = {column: row.get(column) for column in columns}
+    if "metadata" in selected:
+        selected["metadata"] = (
+            json.dumps(metadata) if isinstance(metadata, (dict, list)) else metadata
+        )
+    return selected
+
+
+class ExportWriter(ABC):
+    """
+    Writes the exported rows, chunk by chunk, to a path or an open file.
+    * columns: Columns written, `DEFAULT_COLUMNS` by default.
+    """
+
+    binary = False
+
+    def __init__(
+        self, destination: Destination, columns: Optional[Sequence[str]] = None
+    ) -> None:
+        self.columns = list(columns) if columns is not None else None
+        self.rows = 0
+        if isinstance(destination, (str, Path)):
+            if self.binary:
+                self.file: IO = open(destination, "wb")
+            else:
+                self.file = open(destination, "w", newline="", encoding="utf-8")
+            self._owned = True
+        else:
+            self.file = destination
+            self._owned = False
+
+    def write(self, invoices: List[dict]) -> None:
+        rows = [invoice_row(invoice, self.columns) for invoice in invoices]
+        if rows:
+            self._write(rows)
+            self.rows += len(rows)
+
+    @abstractmethod
+    def _write(self, rows: List[dict]) -> None:
+        ...
+
+    def close(self) -> None:
+        if self._owned:
+            self.file.close()
+
+    def __enter__(self) -> "ExportWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+
+class CsvExportWriter(ExportWriter):
+    def __init__(
+        self, destination: Destination, columns: Optional[Sequence[str]] = None
+    ) -> None:
+        super().__init__(destination, columns or DEFAULT_COLUMNS)
+        self._writer = csv.DictWriter(self.file, self.columns)
+        self._writer.writeheader()
+
+    def _write(self, rows: List[dict]) -> None:
+        self._writer.writerows(rows)
+
+
+class JsonLinesExportWriter(ExportWriter):
+    """
+    One JSON object per invoice. Without `columns`, every field and metadata
+    value of the invoices is written.
+    """
+
+    def _write(self, rows: List[dict]) -> None:
+        self.file.write("".join(json.dumps(row) + "\n" for row in rows))
+
+
+class ParquetExportWriter(ExportWriter):
+    """
+    Parquet file, with a row group per chunk and every column as a string.
+    Requires pyarrow.
+    """
+
+    binary = True
+
+    def __init__(
+        self, destination: Destination, columns: Optional[Sequence[str]] = None
+    ) -> None:
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError as e:
+            raise ImportError(
+                "The Parquet export requires pyarrow: pip install pyarrow"
+            ) from e
+        super().__init__(destination, columns or DEFAULT_COLUMNS)
+        self._pyarrow = pyarrow
+        self._schema = pyarrow.schema(
+            [(column, pyarrow.string()) for column in self.columns]
+        )
+        self._writer = pyarrow.parquet.ParquetWriter(self.file, self._schema)
+
+    def _write(self, rows: List[dict]) -> None:
+        rows = [
+            {key: None if value is None else str(value) for key, value in row.items()}
+            for row in rows
+        ]
+        table = self._pyarrow.Table.from_pylist(rows, schema=self._schema)
+        self._writer.write_table(table)
+
+    def close(self) -> None:
+        self._writer.close()
+        super().close()
+
+
+WRITERS = {
+    CSV: CsvExportWriter,
+    JSONL: JsonLinesExportWriter,
+    PARQUET: ParquetExportWriter,
+}
+
+
+def open_writer(
+    destination: Destination, format: str, columns: Optional[Sequence[str]] = None
+) -> ExportWriter:
+    writer = WRITERS.get(format)
+    if writer is None:
+        raise ValueError(f"Unknown export format {format}, use one of {list(WRITERS)}")
+    return writer(destination, columns)
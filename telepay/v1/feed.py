@@ -0,0 +1,91 @@
+import logging
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from .waiters import FINAL_STATUSES
+from .webhooks import (
+    INVOICE_CANCELLED,
+    INVOICE_COMPLETED,
+    INVOICE_DELETED,
+    INVOICE_EXPIRED,
+)
+
+logger = logging.getLogger(__name__)
+
+STATUS_EVENTS = {
+    "completed": INVOICE_COMPLETED,
+    "cancelled": INVOICE_CANCELLED,
+    "expired": INVOICE_EXPIRED,
+    "deleted": INVOICE_DELETED,
+}
+
+
+def changed_at(invoice: dict) -> str:
+    # the API timestamps have a fixed format, so they sort as strings
+    return invoice.get("updated_at") or invoice.get("created_at") or ""
+
+
+class InvoiceFeed:
+    """
+    Turns successive snapshots of the invoices, from `getInvoices`, into the
+    webhook events they imply, like `{"event": "invoice.completed", "data":
+    {...}}`. Only the active (pending) invoices are kept between snapshots;
+    the others are recognized by their change time, and by their number and
+    status when they changed at the same time as the latest change seen.
+    """
+
+    def __init__(self) -> None:
+        self.active: Dict[str, dict] = {}
+        self.watermark: Optional[str] = None
+        # (number, status) of the final invoices changed at the watermark
+        self._at_watermark: Set[Tuple[str, str]] = set()
+
+    def update(self, invoices: Iterable[dict]) -> List[dict]:
+        """
+        Take a new snapshot, returning the events since the previous one
+        """
+        first = self.watermark is None
+        watermark = self.watermark or ""
+        events = []
+        seen = set()
+        finished: Dict[str, Set[Tuple[str, str]]] = {}
+        for invoice in invoices:
+            number = invoice.get("number")
+            seen.add(number)
+            changed = changed_at(invoice)
+            if changed > watermark:
+                watermark = changed
+            status = (number, invoice.get("status"))
+            previous = self.active.get(number)
+            if previous is not None and changed_at(previous) == changed:
+                # unchanged, nothing to parse
+                continue
+            final = invoice.get("status") in FINAL_STATUSES
+            if not final:
+                self.active[number] = invoice
+                continue
+            self.active.pop(number, None)
+            finished.setdefault(changed, set()).add(status)
+            if first:
+                continue
+            # changed at the previous watermark: new unless already seen then
+            new = changed > (self.watermark or "") or (
+                changed == self.watermark and status not in self._at_watermark
+            )
+            if previous is not None or new:
+                events.append(
+                    {"event": STATUS_EVENTS[invoice["status"]], "data": invoice}
+                )
+        for number in [number for number in self.active if number not in seen]:
+            invoice = self.active.pop(number)
+            if not first:
+                events.append(
+                    {"event": INVOICE_DELETED, "data": {**invoice, "status": "deleted"}}
+                )
+        if watermark == self.watermark:
+            self._at_watermark |= finished.get(watermark, set())
+        else:
+            self._at_watermark = finished.get(watermark, set())
+        self.watermark = watermark
+        if events:
+            logger.debug(f"{len(events)} invoice events")
+        return events
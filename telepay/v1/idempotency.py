@@ -0,0 +1,184 @@
+import json
+import logging
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Optional, Union
+
+from .errors import TelePayError
+
+logger = logging.getLogger(__name__)
+
+# header sent with the requests, and invoice metadata key, carrying the key
+IDEMPOTENCY_KEY_HEADER = "Idempotency-Key"
+IDEMPOTENCY_KEY = "idempotency_key"
+
+# endpoints whose calls are made safe to send again with an idempotency key
+IDEMPOTENCY_KEY_ENDPOINTS = ("createInvoice", "transfer", "withdraw")
+# moving funds: never sent again while their outcome is unknown, as the API
+# doesn't guarantee that it deduplicates them by idempotency key
+PAYOUT_ENDPOINTS = ("transfer", "withdraw")
+# the outcome of a lost call can be looked up, so it can be retried
+RECOVERABLE_ENDPOINTS = ("createInvoice",)
+
+OUTCOME_UNKNOWN = "payout.outcome-unknown"
+
+# the request was sent, but its outcome is unknown
+PENDING = "pending"
+SUCCEEDED = "succeeded"
+
+
+@dataclass
+class IdempotencyRecord:
+    """
+    Outcome of the operation identified by an idempotency key.
+    * response: The JSON response, once the operation succeeded.
+    """
+
+    key: str
+    endpoint: str
+    status: str = PENDING
+    response: Any = None
+    updated_at: float = field(default_factory=time.time)
+
+
+def outcome_unknown(
+    endpoint: str, key: Optional[str] = None, status_code: int = 0
+) -> TelePayError:
+    """
+    Error of a payout that may have been performed, like after a timeout
+    """
+    key = f" with the idempotency key {key}" if key is not None else ""
+    return TelePayError(
+        status_code=status_code,
+        error=OUTCOME_UNKNOWN,
+        message=f"The outcome of the {endpoint} call{key} is unknown, check "
+        "whether it was performed before sending it again",
+    )
+
+
+class IdempotencyStore(ABC):
+    """
+    Where the outcomes of the operations are recorded. Implement it to keep
+    them in your own database.
+    """
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[IdempotencyRecord]:
+        ...
+
+    @abstractmethod
+    def put(self, record: IdempotencyRecord) -> None:
+        ...
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        ...
+
+
+class MemoryIdempotencyStore(IdempotencyStore):
+    """
+    Records kept in memory, up to `max_records`, the oldest being dropped first
+    """
+
+    def __init__(self, max_records: int = 10_000) -> None:
+        self.max_records = max_records
+        self._records: "OrderedDict[str, IdempotencyRecord]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[IdempotencyRecord]:
+        with self._lock:
+            return self._records.get(key)
+
+    def put(self, record: IdempotencyRecord) -> None:
+        with self._lock:
+            self._records[record.key] = record
+            self._records.move_to_end(record.key)
+            while len(self._records) > self.max_records:
+                self._records.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._records.pop(key, None)
+
+
+class FileIdempotencyStore(IdempotencyStore):
+    """
+    Records appended to a JSON lines file, so they survive restarts. The file
+    is read once, when the store is created, and compacted when most of its
+    lines are outdated.
+    * max_age: Seconds the succeeded records are kept, dropped when the file
+    is compacted. The records of unknown outcomes are always kept.
+    """
+
+    # lines the file may have before it's compacted
+    min_compaction_lines = 1000
+
+    def __init__(self, path: Union[str, Path], max_age: Optional[float] = None) -> None:
+        self.path = Path(path)
+        self.max_age = max_age
+        self._records: Dict[str, IdempotencyRecord] = {}
+        self._lines = 0
+        self._lock = threading.Lock()
+        if self.path.exists():
+            self._load()
+
+    def _load(self) -> None:
+        with self.path.open() as file:
+            for line in file:
+                if not line.strip():
+                    continue
+                self._lines += 1
+                data = json.loads(line)
+                if data.get("deleted"):
+                    self._records.pop(data["key"], None)
+                else:
+                    self._records[data["key"]] = IdempotencyRecord(**data)
+        logger.debug(f"Loaded {len(self._records)} idempotency records")
+
+    def _append(self, data: dict) -> None:
+        with self.path.open("a") as file:
+            file.write(json.dumps(data, default=str) + "\n")
+        self._lines += 1
+        if self._lines > max(self.min_compaction_lines, 2 * len(self._records)):
+            self._compact()
+
+    def _compact(self) -> None:
+        if self.max_age is not None:
+            oldest = time.time() - self.max_age
+            for key, record in list(self._records.items()):
+                if record.status == SUCCEEDED and record.updated_at < oldest:
+                    del self._records[key]
+        # written aside and renamed, so a crash can't lose the records
+        compacted = self.path.with_name(self.path.name + ".tmp")
+        with compacted.open("w") as file:
+            for record in self._records.values():
+                file.write(json.dumps(asdict(record), default=str) + "\n")
+        os.replace(compacted, self.path)
+        self._lines = len(self._records)
+        logger.debug(f"Compacted {self.path} to {self._lines} idempotency records")
+
+    def compact(self) -> None:
+        """
+        Rewrite the file with the current records only
+        """
+        with self._lock:
+            self._compact()
+
+    def get(self, key: str) -> Optional[IdempotencyRecord]:
+        with self._lock:
+            return self._records.get(key)
+
+    def put(self, record: IdempotencyRecord) -> None:
+        with self._lock:
+            self._records[record.key] = record
+            self._append(asdict(record))
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            if self._records.pop(key, None) is not None:
+                self._append({"key": key, "deleted": True})
@@ -0,0 +1,228 @@
+import asyncio
+import logging
+import threading
+from bisect import bisect_left
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# upper bounds, in seconds, shared by every latency histogram
+DEFAULT_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+
+# outcomes of a webhook delivery
+OUTCOME_VERIFIED = "verified"
+OUTCOME_INVALID_SIGNATURE = "invalid_signature"
+OUTCOME_BAD_REQUEST = "bad_request"
+OUTCOME_CALLBACK_ERROR = "callback_error"
+
+MetricObserver = Callable[[str, float, Dict[str, str]], None]
+
+
+def escape_label(value: str) -> str:
+    """
+    Label value escaped for the Prometheus text format
+    """
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram. Observing a value is a bisect and two additions,
+    so it is safe to keep on hot paths.
+    """
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS) -> None:
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """
+        Estimate the q-quantile (0 <= q <= 1), interpolating inside the bucket
+        """
+        with self._lock:
+            counts = list(self.counts)
+            total = self.count
+        if not total:
+            return 0.0
+        rank = q * total
+        cumulative = 0
+        for index, count in enumerate(counts):
+            if cumulative + count >= rank and count:
+                lower = self.buckets[index - 1] if index > 0 else 0.0
+                if index == len(self.buckets):
+                    return lower
+                upper = self.buckets[index]
+                return lower + (upper - lower) * (rank - cumulative) / count
+            cumulative += count
+        return self.buckets[-1]
+
+    def snapshot(self) -> dict:
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+        }
+
+    def render(self, name: str, labels: str = "") -> List[str]:
+        """
+        Prometheus text lines for this histogram
+        """
+        prefix = f"{labels}," if labels else ""
+        lines = []
+        cumulative = 0
+        with self._lock:
+            counts = list(self.counts)
+            total, sum_ = self.count, self.sum
+        for bound, count in zip(self.buckets, counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{prefix}le="+Inf"}} {total}')
+        suffix = f"{{{labels}}}" if labels else ""
+        lines.append(f"{name}_sum{suffix} {sum_}")
+        lines.append(f"{name}_count{suffix} {total}")
+        return lines
+
+
+@dataclass
+class WebhookMetrics:
+    """
+    Metrics collected by the webhook listener.
+    * observers: plain callables receiving `(name, value, labels)` for every
+    measurement, to forward them to statsd, logs or any other backend.
+    """
+
+    observers: List[MetricObserver] = field(default_factory=list)
+    lag_interval: float = 0.5
+
+    def __post_init__(self):
+        self.requests: Dict[Tuple[str, str], int] = {}
+        self.signature_seconds = Histogram()
+        self.callback_seconds = Histogram()
+        self.event_loop_lag_seconds = Histogram()
+        self.in_flight = 0
+        self._lag_task: Optional[asyncio.Task] = None
+
+    def add_observer(self, observer: MetricObserver) -> None:
+        self.observers.append(observer)
+
+    def _emit(self, name: str, value: float, **labels: str) -> None:
+        for observer in self.observers:
+            try:
+                observer(name, value, labels)
+            except Exception:
+                logger.exception(f"Metrics observer {observer} failed")
+
+    def request_started(self) -> None:
+        self.in_flight += 1
+        self._emit("webhook_in_flight", self.in_flight)
+
+    def request_finished(self, event: str, outcome: str) -> None:
+        self.in_flight -= 1
+        key = (event, outcome)
+        self.requests[key] = self.requests.get(key, 0) + 1
+        self._emit("webhook_in_flight", self.in_flight)
+        self._emit("webhook_requests", 1, event=event, outcome=outcome)
+
+    def observe_signature(self, seconds: float) -> None:
+        self.signature_seconds.observe(seconds)
+        self._emit("webhook_signature_seconds", seconds)
+
+    def observe_callback(self, event: str, seconds: float) -> None:
+        self.callback_seconds.observe(seconds)
+        self._emit("webhook_callback_seconds", seconds, event=event)
+
+    def observe_event_loop_lag(self, seconds: float) -> None:
+        self.event_loop_lag_seconds.observe(seconds)
+        self._emit("webhook_event_loop_lag_seconds", seconds)
+
+    async def _monitor_event_loop_lag(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.lag_interval)
+            self.observe_event_loop_lag(
+                max(0.0, loop.time() - start - self.lag_interval)
+            )
+
+    def start(self) -> None:
+        """
+        Start measuring the event loop lag, must be called inside the loop
+        """
+        if self._lag_task is None:
+            self._lag_task = asyncio.create_task(self._monitor_event_loop_lag())
+
+    def stop(self) -> None:
+        if self._lag_task is not None:
+            self._lag_task.cancel()
+            self._lag_task = None
+
+    def render(self) -> str:
+        """
+        Render the metrics in the Prometheus text exposition format
+        """
+        lines = [
+            "# HELP telepay_webhook_requests_total Webhook deliveries received.",
+            "# TYPE telepay_webhook_requests_total counter",
+        ]
+        for (event, outcome), count in sorted(self.requests.items()):
+            lines.append(
+                "telepay_webhook_requests_total"
+                f'{{event="{escape_label(event)}",outcome="{outcome}"}} {count}'
+            )
+        lines += [
+            "# HELP telepay_webhook_in_flight Webhook deliveries being processed.",
+            "# TYPE telepay_webhook_in_flight gauge",
+            f"telepay_webhook_in_flight {self.in_flight}",
+        ]
+        histograms = (
+            (
+                "telepay_webhook_signature_seconds",
+                "Time spent verifying signatures.",
+                self.signature_seconds,
+            ),
+            (
+                "telepay_webhook_callback_seconds",
+                "Time spent running the callback.",
+                self.callback_seconds,
+            ),
+            (
+                "telepay_webhook_event_loop_lag_seconds",
+                "Delay of the event loop beyond its scheduled wake up.",
+                self.event_loop_lag_seconds,
+            ),
+        )
+        for name, help_text, histogram in histograms:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} histogram")
+            lines += histogram.render(name)
+        return "\n".join(lines) + "\n"
@@ -17,5 +17,5 @@ class Account:
     @classmethod
     def from_json(cls, json: Any) -> "Account":
         del json["version"]
-        logger.debug(f"Parsing Account from JSON: {json}")
+        logger.debug("Parsing Account from JSON: %s", json)
         return parse_json(cls, **json)
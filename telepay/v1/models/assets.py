@@ -30,5 +30,5 @@ class Assets:
 
     @classmethod
     def from_json(cls, json: Any) -> "Assets":
-        logger.debug(f"Parsing Assets from JSON: {json}")
+        logger.debug("Parsing Assets from JSON: %s", json)
         return parse_json(cls, **json)
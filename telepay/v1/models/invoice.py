@@ -55,7 +55,7 @@ class Invoice:
 
     @classmethod
     def from_json(cls, json: Any) -> "Invoice":
-        logger.debug(f"Parsing Invoice from JSON: {json}")
+        logger.debug("Parsing Invoice from JSON: %s", json)
         return parse_json(cls, **json)
 
 
@@ -68,5 +68,5 @@ class InvoiceList:
 
     @classmethod
     def from_json(cls, json: Any) -> "InvoiceList":
-        logger.debug(f"Parsing InvoiceList from JSON: {json}")
+        logger.debug("Parsing InvoiceList from JSON: %s", json)
         return parse_json(cls, **json)
@@ -16,7 +16,7 @@ class Wallet:
 
     @classmethod
     def from_json(cls, json: Any) -> "Wallet":
-        logger.debug(f"Parsing wallet from JSON: {json}")
+        logger.debug("Parsing wallet from JSON: %s", json)
         return parse_json(cls, **json)
 
 
@@ -29,5 +29,5 @@ class Wallets:
 
     @classmethod
     def from_json(cls, json: Any) -> "Wallets":
-        logger.debug(f"Parsing wallets from JSON: {json}")
+        logger.debug("Parsing wallets from JSON: %s", json)
         return parse_json(cls, **json)
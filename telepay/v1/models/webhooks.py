@@ -17,7 +17,7 @@ class Webhook:
 
     @classmethod
     def from_json(cls, json: Any) -> "Webhook":
-        logger.debug(f"Parsing Webhook from JSON: {json}")
+        logger.debug("Parsing Webhook from JSON: %s", json)
         return parse_json(cls, **json)
 
 
@@ -30,5 +30,5 @@ class Webhooks:
 
     @classmethod
     def from_json(cls, json: Any) -> "Webhooks":
-        logger.debug(f"Parsing Webhooks from JSON: {json}")
+        logger.debug("Parsing Webhooks from JSON: %s", json)
         return parse_json(cls, **json)
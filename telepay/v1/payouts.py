@@ -0,0 +1,152 @@
+import threading
+from dataclasses import dataclass, field
+from time import monotonic
+from typing import Any, Dict, Hashable, List, NamedTuple, Optional, Tuple
+
+# problems making a payout unfeasible
+BELOW_MINIMUM = "below-minimum"
+INSUFFICIENT_FUNDS = "insufficient-funds"
+QUOTE_FAILED = "quote-failed"
+
+WalletKey = Tuple[str, str, str]
+
+
+class Payout(NamedTuple):
+    """
+    A withdrawal to plan, with the arguments of `withdraw`
+    """
+
+    to_address: str
+    asset: str
+    blockchain: str
+    network: str
+    amount: float
+    message: Optional[str] = None
+
+    @property
+    def wallet(self) -> WalletKey:
+        return (self.asset, self.blockchain, self.network)
+
+    @property
+    def fee_key(self) -> tuple:
+        return (self.to_address, *self.wallet, float(self.amount), self.message)
+
+
+class QuoteCache:
+    """
+    Quotes by key, kept for `ttl` seconds
+    """
+
+    def __init__(self, ttl: float) -> None:
+        self.ttl = ttl
+        self._quotes: Dict[Hashable, Tuple[float, Any]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        cached = self._quotes.get(key)
+        if cached is None or cached[0] <= monotonic():
+            return None
+        return cached[1]
+
+    def put(self, key: Hashable, quote: Any) -> None:
+        with self._lock:
+            self._quotes[key] = (monotonic() + self.ttl, quote)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._quotes.clear()
+
+
+@dataclass
+class PayoutQuote:
+    """
+    A planned payout, with its fee and minimum and, when it isn't feasible,
+    why not
+    """
+
+    payout: Payout
+    fee: Optional[float] = None
+    minimum: Optional[float] = None
+    problems: List[str] = field(default_factory=list)
+    errors: List[str] = field(default_factory=list)
+
+    @property
+    def feasible(self) -> bool:
+        return not self.problems
+
+    @property
+    def total(self) -> float:
+        """
+        Amount debited from the wallet
+        """
+        return float(self.payout.amount) + (self.fee or 0.0)
+
+
+@dataclass
+class PayoutPlan:
+    """
+    Feasibility report of payouts. The wallet balances are spent in the order
+    of the payouts: a payout is `insufficient-funds` when the balance left
+    after the feasible payouts before it doesn't cover its amount and fee.
+    """
+
+    quotes: List[PayoutQuote]
+    balances: Dict[WalletKey, float]
+
+    def __post_init__(self):
+        left = dict(self.balances)
+        for quote in self.quotes:
+            if quote.problems:
+                continue
+            wallet = quote.payout.wallet
+            if left.get(wallet, 0.0) < quote.total:
+                quote.problems.append(INSUFFICIENT_FUNDS)
+            else:
+                left[wallet] -= quote.total
+
+    @property
+    def feasible(self) -> bool:
+        return all(quote.feasible for quote in self.quotes)
+
+    @property
+    def feasible_payouts(self) -> List[Payout]:
+        return [quote.payout for quote in self.quotes if quote.feasible]
+
+    def wallets(self) -> Dict[WalletKey, dict]:
+        """
+        By wallet: its balance, the amount and fees of all the payouts from
+        it, and the shortfall to pay them all
+        """
+        report: Dict[WalletKey, dict] = {}
+        for quote in self.quotes:
+            wallet = quote.payout.wallet
+            totals = report.setdefault(
+                wallet,
+                {
+                    "balance": self.balances.get(wallet, 0.0),
+                    "payouts": 0,
+                    "amount": 0.0,
+                    "fees": 0.0,
+                },
+            )
+            totals["payouts"] += 1
+            totals["amount"] += float(quote.payout.amount)
+            totals["fees"] += quote.fee or 0.0
+        for totals in report.values():
+            required = totals["amount"] + totals["fees"]
+            totals["shortfall"] = max(0.0, required - totals["balance"])
+        return report
+
+    def report(self) -> dict:
+        problems: Dict[str, int] = {}
+        for quote in self.quotes:
+            for problem in quote.problems:
+                problems[problem] = problems.get(problem, 0) + 1
+        return {
+            "payouts": len(self.quotes),
+            "feasible": sum(quote.feasible for quote in self.quotes),
+            "problems": problems,
+            "wallets": {
+                " ".join(wallet): totals for wallet, totals in self.wallets().items()
+            },
+        }
@@ -0,0 +1,12 @@
+from typing import NamedTuple
+
+
+class InvoiceTier(NamedTuple):
+    """
+    The kind of invoices a pool keeps ready
+    """
+
+    asset: str
+    blockchain: str
+    network: str
+    amount: float
@@ -0,0 +1,155 @@
+import logging
+import threading
+from dataclasses import dataclass, field
+from json import JSONDecodeError
+from time import perf_counter
+from typing import Any, Dict, Optional
+
+from httpx import Request, Response
+
+from .metrics import Histogram
+
+logger = logging.getLogger(__name__)
+
+STARTED_AT = "telepay.started_at"
+# request extension of the streamed responses, accounted once fully received
+STREAMED = "telepay.streamed"
+
+
+def endpoint_name(request: Request, base_path: str = "/rest/") -> str:
+    """
+    Endpoint of a request, without the path parameters: `getInvoice/ABC` is
+    accounted as `getInvoice`
+    """
+    path = request.url.path
+    if path.startswith(base_path):
+        path = path[len(base_path) :]
+    return path.strip("/").split("/", 1)[0]
+
+
+def response_error(response: Response) -> Optional[str]:
+    """
+    Same error code that `validate_response` puts in the `TelePayError`
+    """
+    if 200 <= response.status_code < 300:
+        return None
+    try:
+        return str(response.json().get("error", response.status_code))
+    except (JSONDecodeError, AttributeError):
+        return str(response.status_code)
+
+
+@dataclass
+class EndpointStats:
+    requests: int = 0
+    errors: Dict[str, int] = field(default_factory=dict)
+    latency: Histogram = field(default_factory=Histogram)
+    bytes_out: int = 0
+    bytes_in: int = 0
+
+    def snapshot(self) -> dict:
+        return {
+            "requests": self.requests,
+            "errors": dict(self.errors),
+            "latency": self.latency.snapshot(),
+            "bytes_out": self.bytes_out,
+            "bytes_in": self.bytes_in,
+        }
+
+
+class ClientStats:
+    """
+    Per-endpoint statistics of a client, fed by its httpx event hooks and, for
+    the requests without a response, by its pipeline
+    """
+
+    def __init__(self, base_path: str = "/rest/") -> None:
+        self.base_path = base_path
+        self.endpoints: Dict[str, EndpointStats] = {}
+        self._lock = threading.Lock()
+
+    def endpoint(self, name: str) -> EndpointStats:
+        stats = self.endpoints.get(name)
+        if stats is None:
+            with self._lock:
+                stats = self.endpoints.setdefault(name, EndpointStats())
+        return stats
+
+    def request_started(self, request: Request) -> None:
+        request.extensions[STARTED_AT] = perf_counter()
+
+    def response_received(self, response: Response) -> None:
+        request = response.request
+        started_at = request.extensions.get(STARTED_AT)
+        self.record(
+            endpoint_name(request, self.base_path),
+            perf_counter() - started_at if started_at else 0.0,
+            bytes_out=len(request.content),
+            bytes_in=len(response.content),
+            error=response_error(response),
+        )
+
+    def stream_finished(self, response: Response, bytes_in: int) -> None:
+        request = response.request
+        started_at = request.extensions.get(STARTED_AT)
+        self.record(
+            endpoint_name(request, self.base_path),
+            perf_counter() - started_at if started_at else 0.0,
+            bytes_out=len(request.content),
+            bytes_in=bytes_in,
+            error=response_error(response),
+        )
+
+    def request_failed(self, endpoint: str, seconds: float, error: Exception) -> None:
+        """
+        Account a request that got no response, by the exception type, like
+        `ReadTimeout` or `ConnectError`
+        """
+        self.record(endpoint, seconds, error=type(error).__name__)
+
+    def record(
+        self,
+        endpoint: str,
+        seconds: float,
+        bytes_out: int = 0,
+        bytes_in: int = 0,
+        error: Optional[str] = None,
+    ) -> None:
+        stats = self.endpoint(endpoint)
+        with self._lock:
+            stats.requests += 1
+            stats.bytes_out += bytes_out
+            stats.bytes_in += bytes_in
+            if error is not None:
+                stats.errors[error] = stats.errors.get(error, 0) + 1
+        stats.latency.observe(seconds)
+
+    def snapshot(self, http_client: Any = None) -> dict:
+        endpoints = {
+            name: stats.snapshot() for name, stats in list(self.endpoints.items())
+        }
+        return {"endpoints": endpoints, "pool": pool_stats(http_client)}
+
+
+def pool_stats(http_client: Any) -> dict:
+    """
+    Connection pool utilization of an httpx client, when its transport
+    exposes a connection pool. It relies on httpx and httpcore internals, so
+    it's empty when they change.
+    """
+    pool = getattr(getattr(http_client, "_transport", None), "_pool", None)
+    connections = getattr(pool, "connections", None)
+    if connections is None:
+        return {}
+    try:
+        connections = list(connections)
+        idle = sum(1 for connection in connections if connection.is_idle())
+    except Exception as e:
+        logger.debug(f"Can't inspect the connection pool: {e!r}")
+        return {}
+    return {
+        "connections": len(connections),
+        "active": len(connections) - idle,
+        "idle": idle,
+        "max_connections": getattr(pool, "_max_connections", None),
+    }
@@ -0,0 +1,90 @@
+import json
+import logging
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Collection, Iterable, List, Optional, Set, Tuple, Union
+
+from .models.invoice import FORMAT
+
+logger = logging.getLogger(__name__)
+
+CANCEL = "cancel"
+DELETE = "delete"
+
+# errors meaning the invoice doesn't need sweeping anymore
+SETTLED_ERRORS = ("invoice.not-found", "invoice.not-cancellable")
+
+
+def select_invoices(
+    invoices: Iterable[dict],
+    statuses: Collection[str],
+    older_than: float = 0.0,
+    now: Optional[datetime] = None,
+) -> List[str]:
+    """
+    Numbers of the invoices in `statuses`, created more than `older_than`
+    seconds ago. Works on the JSON, without building the invoices.
+    """
+    created_before = (now or datetime.utcnow()) - timedelta(seconds=older_than)
+    # the API timestamps have a fixed format, so they compare as strings
+    limit = created_before.strftime(FORMAT)
+    return [
+        invoice["number"]
+        for invoice in invoices
+        if invoice.get("status") in statuses and invoice.get("created_at", "") <= limit
+    ]
+
+
+class SweepCheckpoint:
+    """
+    Progress of a sweep, appended to a JSON lines file: the selected invoices
+    first, then every invoice swept. An interrupted sweep resumes from it,
+    without fetching the invoices again.
+    """
+
+    def __init__(self, path: Union[str, Path]) -> None:
+        self.path = Path(path)
+        self._lock = threading.Lock()
+
+    def load(self, action: str) -> Optional[Tuple[List[str], Set[str]]]:
+        """
+        The selected and swept invoices of an unfinished sweep
+        """
+        if not self.path.exists():
+            return None
+        numbers: Optional[List[str]] = None
+        done: Set[str] = set()
+        with self.path.open() as file:
+            for line in file:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                if "selected" in entry:
+                    if entry.get("action") != action:
+                        return None
+                    numbers = entry["selected"]
+                elif "done" in entry:
+                    done.add(entry["done"])
+                elif entry.get("finished"):
+                    return None
+        if numbers is None:
+            return None
+        logger.debug(f"Resuming the sweep, {len(done)}/{len(numbers)} done")
+        return numbers, done
+
+    def _append(self, entry: dict) -> None:
+        with self._lock, self.path.open("a") as file:
+            file.write(json.dumps(entry) + "\n")
+
+    def start(self, action: str, numbers: List[str]) -> None:
+        with self._lock:
+            self.path.write_text(
+                json.dumps({"action": action, "selected": numbers}) + "\n"
+            )
+
+    def done(self, number: str) -> None:
+        self._append({"done": number})
+
+    def finish(self) -> None:
+        self._append({"finished": True})
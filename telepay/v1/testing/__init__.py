@@ -0,0 +1,3 @@
+from .cassette import Cassette, RecordingTransport, ReplayTransport  # noqa: F401
+from .faults import FaultInjectionTransport, FaultPolicy  # noqa: F401
+from .mock_api import MockTelePayAPI, constant, lognormal, uniform  # noqa: F401
@@ -0,0 +1,258 @@
+import gzip
+import json
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from time import perf_counter
+from typing import Any, Deque, Dict, List, Optional, Tuple, Union
+
+import anyio
+from httpx import AsyncClient, Client, Request, Response
+from httpx._transports.base import AsyncBaseTransport, BaseTransport
+
+logger = logging.getLogger(__name__)
+
+REDACTED = "REDACTED"
+# JSON keys redacted from the recorded bodies, besides the Authorization header
+SECRET_KEYS = {"secret", "secret_api_key"}
+# response headers worth keeping, the others are recomputed when replaying
+KEPT_HEADERS = {"content-type", "retry-after"}
+
+
+def redact(body: Optional[str]) -> Optional[str]:
+    if not body:
+        return body
+    try:
+        data = json.loads(body)
+    except ValueError:
+        return body
+
+    def walk(value: Any) -> Any:
+        if isinstance(value, dict):
+            return {
+                key: REDACTED if key in SECRET_KEYS else walk(item)
+                for key, item in value.items()
+            }
+        if isinstance(value, list):
+            return [walk(item) for item in value]
+        return value
+
+    return json.dumps(walk(data), separators=(",", ":"))
+
+
+@dataclass
+class Interaction:
+    # seconds since the first recorded request
+    offset: float
+    # seconds until the response was received
+    elapsed: float
+    method: str
+    path: str
+    request: Optional[str]
+    status: int
+    headers: Dict[str, str]
+    response: str
+
+    def to_response(self) -> Response:
+        return Response(
+            self.status, headers=self.headers, content=self.response.encode()
+        )
+
+
+@dataclass
+class Cassette:
+    """
+    Requests and responses recorded from a client, stored as JSON Lines
+    (gzipped when the file name ends in `.gz`)
+    """
+
+    interactions: List[Interaction] = field(default_factory=list)
+
+    def __post_init__(self):
+        self._started_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def record(
+        self, request: Request, response: Response, content: bytes, started_at: float
+    ) -> None:
+        decoded = Response(
+            response.status_code, headers=response.headers, content=content
+        )
+        decoded.read()
+        with self._lock:
+            if self._started_at is None:
+                self._started_at = started_at
+            self.interactions.append(
+                Interaction(
+                    offset=started_at - self._started_at,
+                    elapsed=perf_counter() - started_at,
+                    method=request.method,
+                    path=request.url.path,
+                    request=redact(request.content.decode() or None),
+                    status=response.status_code,
+                    headers={
+                        key: value
+                        for key, value in response.headers.items()
+                        if key in KEPT_HEADERS
+                    },
+                    response=redact(decoded.text),
+                )
+            )
+
+    def save(self, path: Union[str, Path]) -> None:
+        path = Path(path)
+        opener = gzip.open if path.suffix == ".gz" else open
+        with opener(path, "wt", encoding="utf-8") as file:
+            for interaction in self.interactions:
+                file.write(json.dumps(asdict(interaction), separators=(",", ":")))
+                file.write("\n")
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> "Cassette":
+        path = Path(path)
+        opener = gzip.open if path.suffix == ".gz" else open
+        with opener(path, "rt", encoding="utf-8") as file:
+            return cls(
+                [Interaction(**json.loads(line)) for line in file if line.strip()]
+            )
+
+    def replay(self, http_client: Client, speed: float = 1.0) -> List[Response]:
+        """
+        Send the recorded requests again, honouring their inter-arrival times
+        divided by `speed` (0 sends them back to back)
+        """
+        start = perf_counter()
+        responses = []
+        for interaction in self.interactions:
+            if speed:
+                delay = interaction.offset / speed - (perf_counter() - start)
+                if delay > 0:
+                    time.sleep(delay)
+            responses.append(self._send(http_client, interaction))
+        return responses
+
+    async def areplay(
+        self, http_client: AsyncClient, speed: float = 1.0
+    ) -> List[Response]:
+        """
+        Async `replay`, requests overlap as they did when recorded
+        """
+        start = anyio.current_time()
+        responses: List[Optional[Response]] = [None] * len(self.interactions)
+
+        async def send(index: int, interaction: Interaction) -> None:
+            if speed:
+                await anyio.sleep_until(start + interaction.offset / speed)
+            responses[index] = await self._send(http_client, interaction)
+
+        async with anyio.create_task_group() as tg:
+            for index, interaction in enumerate(self.interactions):
+                tg.start_soon(send, index, interaction)
+        return responses
+
+    @staticmethod
+    def _send(http_client, interaction: Interaction):
+        return http_client.request(
+            interaction.method,
+            http_client.base_url.copy_with(raw_path=interaction.path.encode()),
+            content=interaction.request.encode() if interaction.request else None,
+            headers={"Content-Type": "application/json"}
+            if interaction.request
+            else None,
+        )
+
+
+class RecordingTransport(BaseTransport, AsyncBaseTransport):
+    """
+    Transport recording the traffic of a client into a cassette
+    """
+
+    def __init__(self, transport, cassette: Optional[Cassette] = None) -> None:
+        self.transport = transport
+        self.cassette = cassette if cassette is not None else Cassette()
+
+    def handle_request(self, request: Request) -> Response:
+        started_at = perf_counter()
+        response = self.transport.handle_request(request)
+        try:
+            content = b"".join(response.stream)
+        finally:
+            response.close()
+        self.cassette.record(request, response, content, started_at)
+        return Response(
+            response.status_code,
+            headers=response.headers,
+            content=content,
+            extensions=response.extensions,
+        )
+
+    async def handle_async_request(self, request: Request) -> Response:
+        started_at = perf_counter()
+        response = await self.transport.handle_async_request(request)
+        try:
+            content = b"".join([chunk async for chunk in response.stream])
+        finally:
+            await response.aclose()
+        self.cassette.record(request, response, content, started_at)
+        return Response(
+            response.status_code,
+            headers=response.headers,
+            content=content,
+            extensions=response.extensions,
+        )
+
+    def close(self) -> None:
+        self.transport.close()
+
+    async def aclose(self) -> None:
+        await self.transport.aclose()
+
+
+class ReplayTransport(BaseTransport, AsyncBaseTransport):
+    """
+    Transport serving the responses of a cassette. Requests are matched by
+    method and path, in recording order. Responses are delayed by their
+    recorded latency divided by `speed` (0 answers immediately).
+    """
+
+    def __init__(self, cassette: Cassette, speed: float = 1.0) -> None:
+        self.speed = speed
+        self._queues: Dict[Tuple[str, str], Deque[Interaction]] = defaultdict(deque)
+        for interaction in cassette.interactions:
+            self._queues[(interaction.method, interaction.path)].append(interaction)
+        self._lock = threading.Lock()
+
+    def _next(self, request: Request) -> Optional[Interaction]:
+        with self._lock:
+            queue = self._queues.get((request.method, request.url.path))
+            return queue.popleft() if queue else None
+
+    @staticmethod
+    def _exhausted(request: Request) -> Response:
+        logger.debug(f"No recorded response for {request.method} {request.url}")
+        return Response(
+            404,
+            json={
+                "error": "cassette.exhausted",
+                "message": f"No recorded response for {request.url.path}",
+            },
+        )
+
+    def handle_request(self, request: Request) -> Response:
+        interaction = self._next(request)
+        if interaction is None:
+            return self._exhausted(request)
+        if self.speed:
+            time.sleep(interaction.elapsed / self.speed)
+        return interaction.to_response()
+
+    async def handle_async_request(self, request: Request) -> Response:
+        interaction = self._next(request)
+        if interaction is None:
+            return self._exhausted(request)
+        if self.speed:
+            await anyio.sleep(interaction.elapsed / self.speed)
+        return interaction.to_response()
@@ -0,0 +1,160 @@
+import logging
+import random
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, Optional, Union
+
+import anyio
+from httpx import ReadError, ReadTimeout, Request, Response
+from httpx._transports.base import AsyncBaseTransport, BaseTransport
+
+from .mock_api import Latency, MockTelePayAPI
+
+logger = logging.getLogger(__name__)
+
+LATENCY = "latency"
+TIMEOUT = "timeout"
+RESET = "reset"
+RATE_LIMIT = "rate_limit"
+SERVER_ERROR = "server_error"
+
+
+@dataclass
+class FaultPolicy:
+    """
+    Faults injected in the requests to an endpoint.
+    * latency: Extra latency, in seconds or as a distribution.
+    * timeout_rate: Probability of a read timeout, raised after `timeout_delay`
+    seconds (by default, the read timeout of the request).
+    * reset_rate: Probability of a connection reset.
+    * rate_limit_rate: Probability of a 429 response with `Retry-After`.
+    * server_error_rate: Probability of starting a burst of `burst_length`
+    consecutive `server_error_status` responses.
+    """
+
+    latency: Latency = 0.0
+    timeout_rate: float = 0.0
+    timeout_delay: Optional[float] = None
+    reset_rate: float = 0.0
+    rate_limit_rate: float = 0.0
+    retry_after: float = 1.0
+    server_error_rate: float = 0.0
+    burst_length: int = 1
+    server_error_status: int = 503
+
+
+class FaultInjectionTransport(BaseTransport, AsyncBaseTransport):
+    """
+    Transport wrapper injecting faults, globally or by endpoint name (`"*"`
+    being the default policy). Randomness is seeded, so runs are reproducible.
+    """
+
+    def __init__(
+        self,
+        transport,
+        faults: Union[FaultPolicy, Dict[str, FaultPolicy]],
+        seed: Optional[int] = None,
+    ) -> None:
+        self.transport = transport
+        self.faults = faults if isinstance(faults, dict) else {"*": faults}
+        self.random = random.Random(seed)
+        self.injected: Counter = Counter()
+        self._bursts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _policy(self, endpoint: str) -> Optional[FaultPolicy]:
+        return self.faults.get(endpoint, self.faults.get("*"))
+
+    def _draw(self, request: Request):
+        """
+        Decide the faults of a request: the extra latency and the failure, if any
+        """
+        endpoint = MockTelePayAPI.endpoint(request)
+        policy = self._policy(endpoint)
+        if policy is None:
+            return 0.0, None, policy
+        with self._lock:
+            latency = policy.latency
+            if callable(latency):
+                latency = max(0.0, latency(self.random))
+            if latency:
+                self.injected[LATENCY] += 1
+
+            failure = None
+            if self._bursts.get(endpoint):
+                self._bursts[endpoint] -= 1
+                failure = SERVER_ERROR
+            else:
+                roll = self.random.random()
+                for fault, rate in (
+                    (TIMEOUT, policy.timeout_rate),
+                    (RESET, policy.reset_rate),
+                    (RATE_LIMIT, policy.rate_limit_rate),
+                    (SERVER_ERROR, policy.server_error_rate),
+                ):
+                    if roll < rate:
+                        failure = fault
+                        break
+                    roll -= rate
+                if failure == SERVER_ERROR:
+                    self._bursts[endpoint] = policy.burst_length - 1
+            if failure:
+                self.injected[failure] += 1
+                logger.debug(f"Injecting {failure} in {request.url}")
+        return latency, failure, policy
+
+    @staticmethod
+    def _timeout_delay(request: Request, policy: FaultPolicy) -> float:
+        if policy.timeout_delay is not None:
+            return policy.timeout_delay
+        return (request.extensions.get("timeout") or {}).get("read") or 0.0
+
+    @staticmethod
+    def _failure_response(failure: str, policy: FaultPolicy) -> Response:
+        if failure == RATE_LIMIT:
+            return Response(
+                429,
+                headers={"Retry-After": f"{policy.retry_after:g}"},
+                json={"error": "too-many-requests", "message": "Too many requests."},
+            )
+        return Response(
+            policy.server_error_status,
+            json={
+                "error": "unavailable",
+                "message": "This action is temporarly unavailable.",
+            },
+        )
+
+    def handle_request(self, request: Request) -> Response:
+        latency, failure, policy = self._draw(request)
+        if latency:
+            time.sleep(latency)
+        if failure == TIMEOUT:
+            time.sleep(self._timeout_delay(request, policy))
+            raise ReadTimeout("Injected read timeout", request=request)
+        if failure == RESET:
+            raise ReadError("Injected connection reset", request=request)
+        if failure:
+            return self._failure_response(failure, policy)
+        return self.transport.handle_request(request)
+
+    async def handle_async_request(self, request: Request) -> Response:
+        latency, failure, policy = self._draw(request)
+        if latency:
+            await anyio.sleep(latency)
+        if failure == TIMEOUT:
+            await anyio.sleep(self._timeout_delay(request, policy))
+            raise ReadTimeout("Injected read timeout", request=request)
+        if failure == RESET:
+            raise ReadError("Injected connection reset", request=request)
+        if failure:
+            return self._failure_response(failure, policy)
+        return await self.transport.handle_async_request(request)
+
+    def close(self) -> None:
+        self.transport.close()
+
+    async def aclose(self) -> None:
+        await self.transport.aclose()
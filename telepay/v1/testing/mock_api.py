@@ -0,0 +1,472 @@
+import json
+import logging
+import random
+import string
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+import anyio
+from httpx import MockTransport, Request, Response
+
+from ..models.invoice import FORMAT
+
+logger = logging.getLogger(__name__)
+
+# a latency is a number of seconds, or a distribution drawing them from a
+# seeded random generator
+Latency = Union[float, Callable[[random.Random], float]]
+
+ERRORS = {
+    "bad-request": (400, "Bad request."),
+    "forbidden": (403, "You are not authorized to perform this action."),
+    "unavailable": (503, "This action is temporarly unavailable."),
+    "not-found": (404, "Not found."),
+    "invoice.not-found": (404, "Invoice not found."),
+    "invoice.not-cancellable": (400, "Invoice can't be cancelled."),
+    "transfer.insufficient-funds": (400, "Transfer failed. Insufficient funds."),
+    "withdrawal.insufficient-funds": (400, "Withdrawal failed. Insufficient funds."),
+    "webhook.not-found": (404, "Webhook not found."),
+}
+
+
+def constant(seconds: float) -> Latency:
+    return lambda rng: seconds
+
+
+def uniform(low: float, high: float) -> Latency:
+    return lambda rng: rng.uniform(low, high)
+
+
+def lognormal(median: float, sigma: float = 0.5) -> Latency:
+    """
+    Long-tailed latency, like most network services
+    """
+    return lambda rng: median * rng.lognormvariate(0, sigma)
+
+
+def default_assets() -> List[dict]:
+    return [
+        {
+            "asset": "TON",
+            "blockchain": "TON",
+            "usd_price": 2.0,
+            "url": "https://ton.org",
+            "networks": ["mainnet", "testnet"],
+            "coingecko_id": "the-open-network",
+        },
+        {
+            "asset": "USDT",
+            "blockchain": "TRON",
+            "usd_price": 1.0,
+            "url": "https://tether.to",
+            "networks": ["mainnet", "testnet"],
+            "coingecko_id": "tether",
+        },
+    ]
+
+
+class MockError(Exception):
+    def __init__(self, error: str) -> None:
+        self.status_code, self.message = ERRORS[error]
+        self.error = error
+
+
+@dataclass
+class MockTelePayAPI:
+    """
+    In-process stand-in of the TelePay REST API, for offline tests and
+    benchmarks. State (invoices, wallets, webhooks) lives in memory.
+    * secret_api_key: The key the clients must send, others get error 403.
+    * latency: Response latency, global or by endpoint name.
+    * error_rate: Probability of answering `unavailable`, global or by endpoint.
+    * seed: Seed of the random generator, so runs are reproducible.
+    """
+
+    secret_api_key: str = "secret"
+    latency: Union[Latency, Dict[str, Latency]] = 0.0
+    error_rate: Union[float, Dict[str, float]] = 0.0
+    seed: Optional[int] = None
+    assets: List[dict] = field(default_factory=default_assets)
+    withdraw_minimum: float = 1.0
+    withdraw_fee: float = 0.1
+
+    def __post_init__(self):
+        self.random = random.Random(self.seed)
+        self.invoices: Dict[str, dict] = {}
+        self.webhooks: Dict[str, dict] = {}
+        self.wallets: Dict[Tuple[str, str, str], float] = {}
+        self.requests: List[Tuple[str, str]] = []
+        self._failures: Dict[str, List[str]] = {}
+        self._lock = threading.RLock()
+        self._routes: Dict[str, Callable[..., Any]] = {
+            "getMe": self.get_me,
+            "getBalance": self.get_balance,
+            "getAsset": self.get_asset,
+            "getAssets": self.get_assets,
+            "getInvoices": self.get_invoices,
+            "getInvoice": self.get_invoice,
+            "createInvoice": self.create_invoice,
+            "cancelInvoice": self.cancel_invoice,
+            "deleteInvoice": self.delete_invoice,
+            "transfer": self.transfer,
+            "getWithdrawMinimum": self.get_withdraw_minimum,
+            "getWithdrawFee": self.get_withdraw_fee,
+            "withdraw": self.withdraw,
+            "createWebhook": self.create_webhook,
+            "updateWebhook": self.update_webhook,
+            "activateWebhook": self.activate_webhook,
+            "deactivateWebhook": self.deactivate_webhook,
+            "deleteWebhook": self.delete_webhook,
+            "getWebhook": self.get_webhook,
+            "getWebhooks": self.get_webhooks,
+        }
+
+    # transports
+
+    def transport(self) -> MockTransport:
+        """
+        httpx transport for `TelePaySyncClient`
+        """
+
+        def handler(request: Request) -> Response:
+            delay = self.draw_latency(self.endpoint(request))
+            if delay:
+                time.sleep(delay)
+            return self.handle(request)
+
+        return MockTransport(handler)
+
+    def async_transport(self) -> MockTransport:
+        """
+        httpx transport for `TelePayAsyncClient`
+        """
+
+        async def handler(request: Request) -> Response:
+            delay = self.draw_latency(self.endpoint(request))
+            if delay:
+                await anyio.sleep(delay)
+            return self.handle(request)
+
+        return MockTransport(handler)
+
+    async def __call__(self, scope, receive, send) -> None:
+        """
+        ASGI application, to serve the mock API with any ASGI server
+        """
+        if scope["type"] != "http":
+            return
+        body = b""
+        more_body = True
+        while more_body:
+            message = await receive()
+            body += message.get("body", b"")
+            more_body = message.get("more_body", False)
+        query = scope.get("query_string", b"").decode()
+        url = f"http://mock{scope['path']}" + (f"?{query}" if query else "")
+        request = Request(
+            scope["method"],
+            url,
+            headers=[(k.decode(), v.decode()) for k, v in scope["headers"]],
+            content=body,
+        )
+        delay = self.draw_latency(self.endpoint(request))
+        if delay:
+            await anyio.sleep(delay)
+        response = self.handle(request)
+        await send(
+            {
+                "type": "http.response.start",
+                "status": response.status_code,
+                "headers": [
+                    (k.encode(), v.encode()) for k, v in response.headers.items()
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": response.content})
+
+    # configuration
+
+    def draw_latency(self, endpoint: str) -> float:
+        latency = self.latency
+        if isinstance(latency, dict):
+            latency = latency.get(endpoint, latency.get("*", 0.0))
+        if callable(latency):
+            with self._lock:
+                return max(0.0, latency(self.random))
+        return latency
+
+    def fail_next(self, endpoint: str, error: str = "unavailable", times=1) -> None:
+        """
+        Answer the next requests to an endpoint with an error
+        """
+        self._failures.setdefault(endpoint, []).extend([error] * times)
+
+    def set_balance(self, asset, blockchain, network, balance: float) -> None:
+        self.wallets[(asset, blockchain, network)] = balance
+
+    def complete_invoice(self, number: str) -> dict:
+        """
+        Simulate the payment of an invoice, crediting the merchant wallet
+        """
+        with self._lock:
+            invoice = self._invoice(number)
+            invoice["status"] = "completed"
+            invoice["updated_at"] = self.now()
+            invoice["explorer_url"] = f"https://explorer.example/{number}"
+            key = (invoice["asset"], invoice["blockchain"], invoice["network"])
+            self.wallets[key] = self.wallets.get(key, 0.0) + float(invoice["amount"])
+            return invoice
+
+    # handling
+
+    @staticmethod
+    def endpoint(request: Request) -> str:
+        parts = request.url.path.strip("/").split("/")
+        if parts and parts[0] == "rest":
+            parts = parts[1:]
+        return parts[0] if parts else ""
+
+    @staticmethod
+    def now() -> str:
+        return datetime.utcnow().strftime(FORMAT)
+
+    def handle(self, request: Request) -> Response:
+        parts = request.url.path.strip("/").split("/")
+        if parts and parts[0] == "rest":
+            parts = parts[1:]
+        endpoint, args = (parts[0], parts[1:]) if parts else ("", [])
+        with self._lock:
+            self.requests.append((request.method, endpoint))
+        try:
+            if request.headers.get("Authorization") != self.secret_api_key:
+                raise MockError("forbidden")
+            self._inject_error(endpoint)
+            route = self._routes.get(endpoint)
+            if route is None:
+                raise MockError("not-found")
+            try:
+                body = json.loads(request.content) if request.content else {}
+                with self._lock:
+                    return Response(200, json=route(*args, **body))
+            except (TypeError, ValueError):
+                raise MockError("bad-request")
+        except MockError as e:
+            return Response(
+                e.status_code, json={"error": e.error, "message": e.message}
+            )
+
+    def _inject_error(self, endpoint: str) -> None:
+        failures = self._failures.get(endpoint)
+        if failures:
+            raise MockError(failures.pop(0))
+        error_rate = self.error_rate
+        if isinstance(error_rate, dict):
+            error_rate = error_rate.get(endpoint, error_rate.get("*", 0.0))
+        if error_rate:
+            with self._lock:
+                failed = self.random.random() < error_rate
+            if failed:
+                raise MockError("unavailable")
+
+    def _invoice(self, number: str) -> dict:
+        invoice = self.invoices.get(number)
+        if invoice is None:
+            raise MockError("invoice.not-found")
+        if (
+            invoice["status"] == "pending"
+            and datetime.strptime(invoice["expires_at"], FORMAT) < datetime.utcnow()
+        ):
+            invoice["status"] = "expired"
+            invoice["updated_at"] = self.now()
+        return invoice
+
+    def _webhook(self, id: str) -> dict:
+        webhook = self.webhooks.get(id)
+        if webhook is None:
+            raise MockError("webhook.not-found")
+        return webhook
+
+    def _withdraw_from(self, error, asset, blockchain, network, amount) -> None:
+        key = (asset, blockchain, network)
+        balance = self.wallets.get(key, 0.0)
+        if float(amount) > balance:
+            raise MockError(error)
+        self.wallets[key] = balance - float(amount)
+
+    def _new_id(self) -> str:
+        chars = string.ascii_uppercase + string.digits
+        return "".join(self.random.choice(chars) for _ in range(10))
+
+    # endpoints
+
+    def get_me(self) -> dict:
+        return {
+            "version": "v1",
+            "merchant": {
+                "name": "Mock merchant",
+                "url": "https://example.com",
+                "logo_url": None,
+                "logo_thumbnail_url": None,
+                "verified": False,
+                "username": "mock",
+                "public_profile": "https://telepay.cash/to/mock",
+                "owner": {"first_name": "Mock", "last_name": "", "username": "mock"},
+                "created_at": self.now(),
+                "updated_at": None,
+            },
+        }
+
+    def get_balance(self, asset=None, blockchain=None, network=None) -> dict:
+        wallets = [
+            {
+                "asset": wallet_asset,
+                "blockchain": wallet_blockchain,
+                "network": wallet_network,
+                "balance": balance,
+            }
+            for (wallet_asset, wallet_blockchain, wallet_network), balance in (
+                self.wallets.items()
+            )
+            if asset is None
+            or (wallet_asset, wallet_blockchain, wallet_network)
+            == (asset, blockchain, network)
+        ]
+        return {"wallets": wallets}
+
+    def get_asset(self, asset, blockchain) -> dict:
+        for item in self.assets:
+            if item["asset"] == asset and item["blockchain"] == blockchain:
+                return dict(item)
+        raise MockError("not-found")
+
+    def get_assets(self) -> dict:
+        return {"assets": [dict(asset) for asset in self.assets]}
+
+    def get_invoices(self) -> dict:
+        return {
+            "invoices": [dict(self._invoice(number)) for number in list(self.invoices)]
+        }
+
+    def get_invoice(self, number) -> dict:
+        return dict(self._invoice(number))
+
+    def create_invoice(
+        self,
+        asset,
+        blockchain,
+        network,
+        amount,
+        success_url,
+        cancel_url,
+        expires_at,
+        description=None,
+        metadata=None,
+    ) -> dict:
+        number = self._new_id()
+        created_at = datetime.utcnow()
+        invoice = {
+            "asset": asset,
+            "blockchain": blockchain,
+            "network": network,
+            "amount": str(amount),
+            "description": description,
+            "number": number,
+            "status": "pending",
+            "metadata": metadata,
+            "success_url": success_url,
+            "cancel_url": cancel_url,
+            "created_at": created_at.strftime(FORMAT),
+            "updated_at": None,
+            "expires_at": (created_at + timedelta(minutes=expires_at)).strftime(FORMAT),
+            "checkout_url": f"https://telepay.cash/checkout/{number}",
+            "onchain_url": f"ton://transfer/mock?amount={amount}&text={number}",
+            "explorer_url": None,
+        }
+        self.invoices[number] = invoice
+        return dict(invoice)
+
+    def cancel_invoice(self, number) -> dict:
+        invoice = self._invoice(number)
+        if invoice["status"] != "pending":
+            raise MockError("invoice.not-cancellable")
+        invoice["status"] = "cancelled"
+        invoice["updated_at"] = self.now()
+        return dict(invoice)
+
+    def delete_invoice(self, number) -> dict:
+        self._invoice(number)
+        del self.invoices[number]
+        return {"success": True, "message": "Invoice deleted."}
+
+    def transfer(self, asset, blockchain, network, amount, username, message=None):
+        self._withdraw_from(
+            "transfer.insufficient-funds", asset, blockchain, network, amount
+        )
+        return {"success": True, "message": "Transfer performed."}
+
+    def get_withdraw_minimum(self, asset, blockchain, network=None) -> dict:
+        self.get_asset(asset, blockchain)
+        return {"withdraw_minimum": self.withdraw_minimum}
+
+    def get_withdraw_fee(
+        self, to_address, asset, blockchain, network, amount, message=None
+    ) -> dict:
+        self.get_asset(asset, blockchain)
+        return {
+            "blockchain_fee": self.withdraw_fee / 2,
+            "processing_fee": self.withdraw_fee / 2,
+            "total": self.withdraw_fee,
+        }
+
+    def withdraw(
+        self, to_address, asset, blockchain, network, amount, message=None
+    ) -> dict:
+        self._withdraw_from(
+            "withdrawal.insufficient-funds",
+            asset,
+            blockchain,
+            network,
+            float(amount) + self.withdraw_fee,
+        )
+        return {"success": True, "message": "Withdrawal performed."}
+
+    def create_webhook(self, url, secret, events, active) -> dict:
+        id = self._new_id()
+        webhook = {
+            "id": id,
+            "url": url,
+            "secret": secret,
+            "events": events,
+            "active": active,
+        }
+        self.webhooks[id] = webhook
+        return dict(webhook)
+
+    def update_webhook(self, id, url, secret, events, active) -> dict:
+        webhook = self._webhook(id)
+        webhook.update(url=url, secret=secret, events=events, active=active)
+        return dict(webhook)
+
+    def activate_webhook(self, id) -> dict:
+        webhook = self._webhook(id)
+        webhook["active"] = True
+        return dict(webhook)
+
+    def deactivate_webhook(self, id) -> dict:
+        webhook = self._webhook(id)
+        webhook["active"] = False
+        return dict(webhook)
+
+    def delete_webhook(self, id) -> dict:
+        self._webhook(id)
+        del self.webhooks[id]
+        return {"success": True, "message": "Webhook deleted."}
+
+    def get_webhook(self, id) -> dict:
+        return dict(self._webhook(id))
+
+    def get_webhooks(self) -> dict:
+        return {"webhooks": [dict(webhook) for webhook in self.webhooks.values()]}
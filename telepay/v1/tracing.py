@@ -0,0 +1,109 @@
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# spans are only created when opentelemetry-api is installed, otherwise every
+# helper is a no-op and opentelemetry is never imported
+TRACER_NAME = "telepay"
+# metadata key carrying the W3C trace context of the invoice creation
+TRACEPARENT = "traceparent"
+
+_tracer: Any = None
+_attempts: ContextVar[Optional[List[int]]] = ContextVar("attempts", default=None)
+
+
+def get_tracer() -> Any:
+    """
+    The OpenTelemetry tracer, or None when OpenTelemetry isn't installed
+    """
+    global _tracer
+    if _tracer is None:
+        try:
+            from opentelemetry import trace
+        except ImportError:
+            logger.debug("OpenTelemetry is not installed, tracing is disabled")
+            _tracer = False
+        else:
+            _tracer = trace.get_tracer(TRACER_NAME)
+    return _tracer or None
+
+
+@contextmanager
+def start_span(
+    name: str, attributes: Optional[Dict[str, Any]] = None, links: Any = None
+) -> Iterator[Any]:
+    tracer = get_tracer()
+    if tracer is None:
+        yield None
+        return
+    with tracer.start_as_current_span(name, attributes=attributes, links=links) as span:
+        yield span
+
+
+@contextmanager
+def client_span(operation: str, endpoint: str) -> Iterator[Any]:
+    """
+    Span around a client call, annotated with the API endpoint, the response
+    status and the number of attempts
+    """
+    token = _attempts.set([0])
+    try:
+        with start_span(f"telepay.{operation}", {"telepay.endpoint": endpoint}) as span:
+            yield span
+    finally:
+        _attempts.reset(token)
+
+
+def record_response(response: Any) -> None:
+    """
+    Annotate the current client span with a response, called by the clients
+    event hooks
+    """
+    attempts = _attempts.get()
+    if attempts is None:
+        return
+    from opentelemetry import trace
+
+    attempts[0] += 1
+    span = trace.get_current_span()
+    span.set_attribute("http.status_code", response.status_code)
+    span.set_attribute("telepay.attempts", attempts[0])
+    span.set_attribute("telepay.retries", attempts[0] - 1)
+
+
+def inject_metadata(metadata: Optional[dict]) -> Optional[dict]:
+    """
+    Copy of the invoice metadata carrying the current trace context, so the
+    webhook deliveries of the invoice can be linked to its creation
+    """
+    if get_tracer() is None:
+        return metadata
+    from opentelemetry.propagate import inject
+
+    carrier: Dict[str, str] = {}
+    inject(carrier)
+    if TRACEPARENT not in carrier:
+        return metadata
+    return {**(metadata or {}), TRACEPARENT: carrier[TRACEPARENT]}
+
+
+def links_from_metadata(metadata: Any) -> Optional[list]:
+    """
+    Span links to the invoice creation span, from the webhook metadata
+    """
+    if get_tracer() is None or not isinstance(metadata, dict):
+        return None
+    if TRACEPARENT not in metadata:
+        return None
+    from opentelemetry import trace
+    from opentelemetry.propagate import extract
+
+    context = trace.get_current_span(
+        extract({TRACEPARENT: metadata[TRACEPARENT]})
+    ).get_span_context()
+    if not context.is_valid:
+        return None
+    return [trace.Link(context)]
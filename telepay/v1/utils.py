@@ -1,7 +1,7 @@
 import logging
 from inspect import signature
 from json import JSONDecodeError
-from typing import Any, Type, TypeVar
+from typing import Any, Optional, Type, TypeVar
 
 from httpx import Response
 
@@ -27,9 +27,21 @@ def validate_response(response: Response) -> None:
                 status_code=response.status_code,
                 error=error,
                 message=message,
+                retry_after=parse_retry_after(response),
             )
 
 
+def parse_retry_after(response: Response) -> Optional[float]:
+    value = response.headers.get("Retry-After")
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        # HTTP dates aren't used by the API
+        return None
+
+
 def parse_json(cls: Type[T], **json: Any) -> T:
     cls_fields = {field for field in signature(cls).parameters}
     native_args, new_args = {}, {}
@@ -0,0 +1,98 @@
+import logging
+import threading
+import weakref
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# statuses an invoice doesn't leave
+FINAL_STATUSES = ("completed", "expired", "cancelled", "deleted")
+
+
+class InvoiceWaiters:
+    """
+    Registry of the invoices being waited for by a client. The webhook
+    listeners given the registry publish the invoices of their events, and
+    the waits in progress poll the API only when no listener runs.
+    Subscribers, like the balance caches, get every invoice published.
+    """
+
+    def __init__(self) -> None:
+        self._waiting: Counter = Counter()
+        self._invoices: Dict[str, dict] = {}
+        self._listeners = 0
+        self._subscribers: "weakref.WeakSet[Any]" = weakref.WeakSet()
+        self._lock = threading.Lock()
+
+    @property
+    def listening(self) -> bool:
+        return self._listeners > 0
+
+    def attach(self) -> None:
+        """
+        A webhook listener started publishing its events
+        """
+        with self._lock:
+            self._listeners += 1
+
+    def detach(self) -> None:
+        with self._lock:
+            self._listeners = max(0, self._listeners - 1)
+
+    def register(self, number: str) -> None:
+        with self._lock:
+            self._waiting[number] += 1
+
+    def unregister(self, number: str) -> None:
+        with self._lock:
+            self._waiting[number] -= 1
+            if self._waiting[number] <= 0:
+                del self._waiting[number]
+                self._invoices.pop(number, None)
+
+    def waiting(self) -> List[str]:
+        with self._lock:
+            return list(self._waiting)
+
+    def subscribe(self, subscriber: Any) -> None:
+        """
+        Call `subscriber.on_invoice(invoice)` with the invoices published,
+        while the subscriber is alive
+        """
+        with self._lock:
+            self._subscribers.add(subscriber)
+
+    def unsubscribe(self, subscriber: Any) -> None:
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def publish(self, invoice: Any) -> bool:
+        """
+        Record the latest state of an invoice, returning whether it's waited
+        for and its status changed
+        """
+        if not isinstance(invoice, dict) or "number" not in invoice:
+            return False
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            try:
+                subscriber.on_invoice(invoice)
+            except Exception:
+                # the other subscribers and the waiters still get the event
+                logger.exception(f"Invoice subscriber {subscriber!r} failed")
+        number = str(invoice["number"])
+        with self._lock:
+            if number not in self._waiting:
+                return False
+            previous = self._invoices.get(number)
+            self._invoices[number] = invoice
+        changed = previous is None or previous.get("status") != invoice.get("status")
+        if changed:
+            logger.debug(f"Invoice {number} is {invoice.get('status')}")
+        return changed
+
+    def get(self, number: str) -> Optional[dict]:
+        with self._lock:
+            return self._invoices.get(number)
@@ -1,13 +1,20 @@
 import hashlib
 import json
 import logging
-from dataclasses import dataclass
-
-import uvicorn
-from colorama import Fore, Style
-from fastapi import FastAPI, Request
+from dataclasses import dataclass, field
+from time import perf_counter
+from typing import Optional
 
 from .errors import TelePayError
+from .metrics import (
+    OUTCOME_BAD_REQUEST,
+    OUTCOME_CALLBACK_ERROR,
+    OUTCOME_INVALID_SIGNATURE,
+    OUTCOME_VERIFIED,
+    WebhookMetrics,
+)
+from .tracing import links_from_metadata, start_span
+from .waiters import InvoiceWaiters
 
 logger = logging.getLogger(__name__)
 
@@ -28,6 +35,14 @@ def get_signature(data, secret):
     return signature
 
 
+def get_metadata(payload):
+    """
+    Metadata of the invoice a webhook payload is about
+    """
+    data = payload.get("data") if isinstance(payload, dict) else None
+    return data.get("metadata") if isinstance(data, dict) else None
+
+
 @dataclass
 class TelePayWebhookListener:
     secret: str
@@ -36,32 +51,108 @@ class TelePayWebhookListener:
     port: str = 5000
     url: str = "/webhook"
     log_level: str = "error"
-
-    app = FastAPI()
+    metrics: WebhookMetrics = field(default_factory=WebhookMetrics)
+    metrics_url: Optional[str] = "/metrics"
+    # publishes the invoices of the events to a client, like `client.waiters`,
+    # to resolve its waits and invalidate its balance cache
+    waiters: Optional[InvoiceWaiters] = None
 
     def __post_init__(self):
+        try:
+            from fastapi import FastAPI, Request
+            from fastapi.responses import JSONResponse, PlainTextResponse
+        except ImportError as e:
+            raise ImportError(
+                "TelePayWebhookListener requires the webhooks extra, "
+                "install it with: pip install telepay[webhooks]"
+            ) from e
+
+        self.app = FastAPI()
+
+        @self.app.on_event("startup")
+        async def startup():
+            self.metrics.start()
+            if self.waiters is not None:
+                self.waiters.attach()
+
+        @self.app.on_event("shutdown")
+        async def shutdown():
+            self.metrics.stop()
+            if self.waiters is not None:
+                self.waiters.detach()
+
+        @self.app.exception_handler(TelePayError)
+        async def telepay_error(request: Request, e: TelePayError):
+            return JSONResponse(
+                {"error": e.error, "message": e.message}, status_code=e.status_code
+            )
+
+        if self.metrics_url:
+
+            @self.app.get(self.metrics_url, response_class=PlainTextResponse)
+            async def get_metrics():
+                return self.metrics.render()
+
         @self.app.post(self.url)
         async def listen_webhook(request: Request):
-            data = str(json.loads(await request.json()))
-
-            request_signature = request.headers["Webhook-Signature"]
-
-            signature = get_signature(str(data), self.secret)
-
-            if signature != request_signature:
-                logger.debug(f"Signature mismatch: {signature} != {request_signature}")
-
-                raise TelePayError(
-                    message="Invalid signature",
-                    status_code=400,
-                    error="invalid_signature",
-                )
-
-            self.callback(request.headers, data)
-
-            return "Thanks TelePay"
+            self.metrics.request_started()
+            event, outcome = "unknown", OUTCOME_BAD_REQUEST
+            try:
+                payload = json.loads(await request.json())
+
+                with start_span(
+                    "telepay.webhook",
+                    links=links_from_metadata(get_metadata(payload)),
+                ) as span:
+                    try:
+                        outcome = OUTCOME_INVALID_SIGNATURE
+                        self.verify(request.headers, payload)
+                        # the event is only trusted, and used as a label, once
+                        # the payload is verified
+                        if isinstance(payload, dict):
+                            event = str(payload.get("event", event))
+                        if span is not None:
+                            span.set_attribute("telepay.event", event)
+                        if self.waiters is not None and isinstance(payload, dict):
+                            self.waiters.publish(payload.get("data"))
+                        outcome = OUTCOME_CALLBACK_ERROR
+                        start = perf_counter()
+                        try:
+                            self.callback(request.headers, str(payload))
+                        finally:
+                            self.metrics.observe_callback(event, perf_counter() - start)
+                        outcome = OUTCOME_VERIFIED
+                    finally:
+                        if span is not None:
+                            span.set_attribute("telepay.outcome", outcome)
+
+                return "Thanks TelePay"
+            finally:
+                self.metrics.request_finished(event, outcome)
+
+    def verify(self, headers, payload) -> None:
+        """
+        Verify the signature of a webhook payload, raising `TelePayError`
+        """
+        request_signature = headers["Webhook-Signature"]
+
+        start = perf_counter()
+        signature = get_signature(str(payload), self.secret)
+        self.metrics.observe_signature(perf_counter() - start)
+
+        if signature != request_signature:
+            logger.debug(f"Signature mismatch: {signature} != {request_signature}")
+
+            raise TelePayError(
+                message="Invalid signature",
+                status_code=400,
+                error="invalid_signature",
+            )
 
     def listen(self):
+        import uvicorn
+        from colorama import Fore, Style
+
         url = f"http://{self.host}:{self.port}{self.url}"
         logger.debug(f"Listening on {url}")
 
@@ -0,0 +1,127 @@
+import random
+
+import pytest
+from pytest import mark as pytest_mark
+
+from telepay.v1 import (
+    InvoiceColumns,
+    TelePayAsyncClient,
+    TelePaySyncClient,
+    usd_prices,
+)
+from telepay.v1.testing import MockTelePayAPI
+
+from .utils import INVOICE
+
+INVOICES = [
+    {"asset": "TON", "amount": "10", "status": "completed"},
+    {"asset": "TON", "amount": "2.5", "status": "completed"},
+    {"asset": "TON", "amount": "4", "status": "pending"},
+    {"asset": "USDT", "blockchain": "TRON", "amount": "3", "status": "completed"},
+    {"asset": "BTC", "blockchain": "BTC", "amount": "1", "status": "completed"},
+]
+
+
+def invoices():
+    return [
+        {
+            "number": str(number),
+            "blockchain": "TON",
+            "network": "mainnet",
+            "created_at": f"2022-06-0{number % 2 + 1}T10:00:00.000000Z",
+            **invoice,
+        }
+        for number, invoice in enumerate(INVOICES)
+    ]
+
+
+PRICES = {("TON", "TON"): 2.0, ("USDT", "TRON"): 1.0}
+
+
+@pytest.fixture(params=[False, True], ids=["lists", "numpy"])
+def use_numpy(request):
+    if request.param:
+        pytest.importorskip("numpy")
+    return request.param
+
+
+def test_totals_by_asset_and_status(use_numpy):
+    columns = InvoiceColumns.from_json(invoices(), use_numpy)
+    assert len(columns) == 5
+    assert columns.totals(prices=PRICES) == [
+        {"asset": "BTC", "status": "completed", "count": 1, "amount": 1.0, "usd": None},
+        {
+            "asset": "TON",
+            "status": "completed",
+            "count": 2,
+            "amount": 12.5,
+            "usd": 25.0,
+        },
+        {"asset": "TON", "status": "pending", "count": 1, "amount": 4.0, "usd": 8.0},
+        {"asset": "USDT", "status": "completed", "count": 1, "amount": 3.0, "usd": 3.0},
+    ]
+
+
+def test_revenue_by_day(use_numpy):
+    columns = InvoiceColumns.from_json(invoices(), use_numpy)
+    revenue = columns.totals(["day"], statuses=["completed"])
+    assert revenue == [
+        {"day": "2022-06-01", "count": 2, "amount": 11.0},
+        {"day": "2022-06-02", "count": 2, "amount": 5.5},
+    ]
+    assert columns.totals([], statuses=["expired"]) == []
+    with pytest.raises(ValueError):
+        columns.totals(["amount"])
+
+
+def test_numpy_and_lists_give_the_same_totals():
+    pytest.importorskip("numpy")
+    draw = random.Random(1)
+    generated = [
+        {
+            "number": str(number),
+            "asset": draw.choice(["TON", "USDT", "BTC"]),
+            "blockchain": draw.choice(["TON", "TRON"]),
+            "network": "mainnet",
+            "status": draw.choice(["pending", "completed", "expired"]),
+            "amount": str(draw.randint(1, 10_000) / 100),
+            "created_at": f"2022-06-{draw.randint(1, 28):02}T10:00:00.000000Z",
+        }
+        for number in range(2000)
+    ]
+    lists = InvoiceColumns.from_json(generated, use_numpy=False)
+    arrays = InvoiceColumns.from_json(generated, use_numpy=True)
+    for by in (["asset", "status"], ["day"], ["blockchain", "network", "day"], []):
+        expected = lists.totals(by, PRICES, ["completed", "pending"])
+        totals = arrays.totals(by, PRICES, ["completed", "pending"])
+        assert [row["count"] for row in totals] == [row["count"] for row in expected]
+        for row, expected_row in zip(totals, expected):
+            assert row["amount"] == pytest.approx(expected_row["amount"])
+            assert row["usd"] == pytest.approx(expected_row["usd"])
+            assert {k: row[k] for k in by} == {k: expected_row[k] for k in by}
+
+
+def test_columns_from_the_api():
+    api = MockTelePayAPI()
+    for amount in (1, 2, 3):
+        api.create_invoice(**{**INVOICE, "amount": amount})
+    with TelePaySyncClient(api.secret_api_key, transport=api.transport()) as client:
+        columns = client.get_invoice_columns()
+        prices = usd_prices(client.get_assets())
+        from_invoices = InvoiceColumns.from_invoices(client.get_invoices().invoices)
+    totals = columns.totals(["asset", "day"], prices)
+    assert totals[0]["count"] == 3
+    assert totals[0]["amount"] == 6.0
+    assert totals[0]["usd"] == 12.0
+    assert from_invoices.totals(["asset", "day"], prices) == totals
+
+
+@pytest_mark.anyio
+async def test_async_columns_from_the_api():
+    api = MockTelePayAPI()
+    api.create_invoice(**INVOICE)
+    async with TelePayAsyncClient(
+        api.secret_api_key, transport=api.async_transport()
+    ) as client:
+        columns = await client.get_invoice_columns()
+    assert list(columns["status"]) == ["pending"]
@@ -0,0 +1,123 @@
+import threading
+
+from pytest import mark as pytest_mark
+from pytest import raises
+
+from telepay.v1 import (
+    CallableCredentials,
+    CredentialChain,
+    EnvCredentials,
+    ExplicitCredentials,
+    FileCredentials,
+    TelePayAsyncClient,
+    TelePayError,
+    TelePaySyncClient,
+)
+from telepay.v1.testing import MockTelePayAPI
+
+from .utils import requests
+
+
+def test_chain_uses_first_provider_with_a_key(tmp_path, monkeypatch):
+    monkeypatch.delenv("TELEPAY_SECRET_API_KEY", raising=False)
+    key_file = tmp_path / "key"
+    key_file.write_text("from-file\n")
+    chain = CredentialChain(
+        [
+            ExplicitCredentials(None),
+            EnvCredentials(dotenv=False),
+            FileCredentials(key_file),
+        ]
+    )
+    assert chain.get_secret_api_key() == "from-file"
+
+
+def test_chain_caches_the_key():
+    calls = []
+    chain = CredentialChain([CallableCredentials(lambda: calls.append(1) or "key")])
+    assert chain.get_secret_api_key() == "key"
+    assert chain.get_secret_api_key() == "key"
+    assert len(calls) == 1
+    chain.refresh()
+    assert len(calls) == 2
+
+
+def test_chain_without_key():
+    with raises(TelePayError) as error:
+        CredentialChain([ExplicitCredentials("")]).get_secret_api_key()
+    assert error.value.error == "credentials.not-found"
+
+
+def test_rotated_key_is_kept_until_the_providers_change():
+    keys = ["provided"]
+    chain = CredentialChain([CallableCredentials(lambda: keys[-1])], ttl=0)
+    chain.rotate("rotated")
+    assert chain.get_secret_api_key() == "rotated"
+    assert not chain.refresh()
+    assert chain.get_secret_api_key() == "rotated"
+    keys.append("changed")
+    assert chain.refresh()
+    assert chain.get_secret_api_key() == "changed"
+
+
+def test_refresh_of_a_stale_key_resolves_nothing():
+    calls = []
+    chain = CredentialChain([CallableCredentials(lambda: calls.append(1) or "key")])
+    chain.get_secret_api_key()
+    assert chain.refresh(rejected="previous")
+    assert len(calls) == 1
+
+
+def test_rotate_key_on_live_client():
+    api = MockTelePayAPI(secret_api_key="old")
+    with TelePaySyncClient("old", transport=api.transport()) as client:
+        http_client = client.http_client
+        client.get_me()
+        api.secret_api_key = "new"
+        client.rotate_secret_api_key("new")
+        client.get_me()
+        assert client.http_client is http_client
+
+
+def test_forbidden_keeps_the_rotated_key():
+    api = MockTelePayAPI(secret_api_key="old")
+    with TelePaySyncClient("old", transport=api.transport()) as client:
+        client.get_me()
+        api.secret_api_key = "new"
+        client.rotate_secret_api_key("new")
+        api.fail_next("getBalance", "forbidden")
+        with raises(TelePayError) as error:
+            client.get_balance()
+        assert error.value.error == "forbidden"
+        assert client.credentials.get_secret_api_key() == "new"
+        client.get_me()
+    assert requests(api, "getBalance") == 1
+
+
+def test_refresh_key_on_forbidden():
+    api = MockTelePayAPI(secret_api_key="old")
+    keys = ["old"]
+    credentials = CallableCredentials(lambda: keys[-1])
+    with TelePaySyncClient(credentials=credentials, transport=api.transport()) as c:
+        c.get_me()
+        api.secret_api_key = "new"
+        keys.append("new")
+        c.get_me()
+
+
+@pytest_mark.anyio
+async def test_async_client_resolves_the_key_in_a_thread():
+    api = MockTelePayAPI()
+    threads = []
+
+    def get_secret_api_key():
+        threads.append(threading.current_thread())
+        return api.secret_api_key
+
+    async with TelePayAsyncClient(
+        credentials=CallableCredentials(get_secret_api_key), transport=api.transport()
+    ) as client:
+        await client.get_me()
+        await client.get_me()
+    assert len(threads) == 1
+    assert threads[0] is not threading.current_thread()
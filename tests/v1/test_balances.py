@@ -0,0 +1,145 @@
+import time
+
+import anyio
+from httpx import MockTransport
+from pytest import mark as pytest_mark
+
+from telepay.v1 import TelePayAsyncClient, TelePaySyncClient
+from telepay.v1.testing import MockTelePayAPI
+
+from .utils import requests
+
+TON = ("TON", "TON", "mainnet")
+USDT = ("USDT", "TRON", "mainnet")
+
+
+def balances(wallets):
+    return {
+        (w["asset"], w["blockchain"], w["network"]): w["balance"]
+        for w in wallets.wallets
+    }
+
+
+def test_balances_are_cached_until_debited():
+    api = MockTelePayAPI()
+    api.set_balance(*TON, 10)
+    api.set_balance(*USDT, 5)
+    with TelePaySyncClient(
+        api.secret_api_key, transport=api.transport(), balance_max_age=60
+    ) as client:
+        assert balances(client.get_balance()) == {TON: 10, USDT: 5}
+        assert balances(client.get_balance()) == {TON: 10, USDT: 5}
+        assert balances(client.get_balance(*USDT)) == {USDT: 5}
+        assert requests(api, "getBalance") == 1
+
+        client.transfer(*TON, 4, "alice")
+        # the other wallets are still cached
+        assert balances(client.get_balance(*USDT)) == {USDT: 5}
+        assert requests(api, "getBalance") == 1
+        # only the debited wallet is fetched again
+        assert balances(client.get_balance(*TON)) == {TON: 6}
+        assert balances(client.get_balance()) == {TON: 6, USDT: 5}
+        assert requests(api, "getBalance") == 2
+        # parsed once
+        assert client.get_balance() is client.get_balance()
+
+        # a completed invoice, from a webhook
+        client.waiters.publish(
+            {
+                "number": "X",
+                "status": "completed",
+                "asset": "TON",
+                "blockchain": "TON",
+                "network": "mainnet",
+            }
+        )
+        client.get_balance()
+        assert requests(api, "getBalance") == 3
+    assert client.balance_cache.stats() == {"wallets": 2, "hits": 6, "misses": 3}
+
+
+def test_balances_fetched_before_an_invalidation_arent_cached():
+    api = MockTelePayAPI()
+    api.set_balance(*TON, 10)
+    raced = []
+
+    def handler(request):
+        response = api.handle(request)
+        if MockTelePayAPI.endpoint(request) == "getBalance" and not raced:
+            # a withdrawal completing while the balance is on its way
+            raced.append(request)
+            api.set_balance(*TON, 4)
+            client.balance_cache.invalidate(TON)
+        return response
+
+    with TelePaySyncClient(
+        api.secret_api_key, transport=MockTransport(handler), balance_max_age=60
+    ) as client:
+        assert balances(client.get_balance()) == {TON: 10}
+        assert balances(client.get_balance()) == {TON: 4}
+        assert balances(client.get_balance()) == {TON: 4}
+    assert requests(api, "getBalance") == 2
+
+
+def test_balances_expire():
+    api = MockTelePayAPI()
+    with TelePaySyncClient(
+        api.secret_api_key, transport=api.transport(), balance_max_age=0.05
+    ) as client:
+        client.get_balance()
+        client.get_balance()
+        time.sleep(0.06)
+        client.get_balance()
+    assert requests(api, "getBalance") == 2
+
+
+@pytest_mark.anyio
+async def test_concurrent_refreshes_are_coalesced():
+    api = MockTelePayAPI(latency=0.02)
+    api.set_balance(*TON, 10)
+    async with TelePayAsyncClient(
+        api.secret_api_key, transport=api.async_transport(), balance_max_age=60
+    ) as client:
+        results = []
+
+        async def get_balance():
+            results.append(balances(await client.get_balance()))
+
+        async with anyio.create_task_group() as group:
+            for _ in range(10):
+                group.start_soon(get_balance)
+    assert results == [{TON: 10}] * 10
+    assert requests(api, "getBalance") == 1
+
+
+@pytest_mark.anyio
+async def test_refreshes_of_different_wallets_run_concurrently():
+    api = MockTelePayAPI()
+    api.set_balance(*TON, 10)
+    api.set_balance(*USDT, 5)
+    in_flight = []
+    peak = []
+
+    async def handler(request):
+        in_flight.append(request)
+        peak.append(len(in_flight))
+        await anyio.sleep(0.02)
+        in_flight.remove(request)
+        return api.handle(request)
+
+    async with TelePayAsyncClient(
+        api.secret_api_key,
+        transport=MockTransport(handler),
+        balance_max_age=60,
+    ) as client:
+        results = []
+
+        async def get_balance(wallet):
+            results.append(balances(await client.get_balance(*wallet)))
+
+        async with anyio.create_task_group() as group:
+            for wallet in (TON, USDT, TON, USDT):
+                group.start_soon(get_balance, wallet)
+    assert sorted(results, key=str) == [{TON: 10}] * 2 + [{USDT: 5}] * 2
+    assert requests(api, "getBalance") == 2
+    assert max(peak) == 2
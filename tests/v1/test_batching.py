@@ -0,0 +1,136 @@
+import time
+
+import anyio
+from httpx import MockTransport, ReadTimeout
+from pytest import mark as pytest_mark
+from pytest import raises
+
+from telepay.v1 import TelePayAsyncClient, TelePaySyncClient
+from telepay.v1.testing import MockTelePayAPI
+
+from .utils import requests
+
+
+def test_payouts_to_the_same_destination_are_aggregated():
+    api = MockTelePayAPI()
+    api.withdraw_fee = 0.0
+    api.set_balance("TON", "TON", "mainnet", 100)
+    with TelePaySyncClient(api.secret_api_key, transport=api.transport()) as client:
+        scheduler = client.payout_scheduler()
+        first = [
+            scheduler.withdraw("EQ-a", "TON", "TON", "mainnet", 0.1, "weekly")
+            for _ in range(3)
+        ]
+        other = scheduler.withdraw("EQ-b", "TON", "TON", "mainnet", 5, "refund")
+        memos = [
+            scheduler.withdraw("EQ-c", "TON", "TON", "mainnet", 1, f"memo-{i}")
+            for i in range(2)
+        ]
+        assert scheduler.pending() == 6
+        batches = scheduler.flush()
+    assert len(batches) == 4
+    assert [request.status for request in first + [other]] == ["sent"] * 4
+    assert first[0].batch.amount == 0.3
+    assert first[0].batch.message == "weekly"
+    assert other.batch.message == "refund"
+    # payouts with different messages are never merged
+    assert [request.batch.message for request in memos] == ["memo-0", "memo-1"]
+    assert [request.batch.amount for request in memos] == [1, 1]
+    assert requests(api, "withdraw") == 4
+    assert api.wallets[("TON", "TON", "mainnet")] == 92.7
+    assert scheduler.stats() == {
+        "pending": 0,
+        "queued": 6,
+        "sent": 6,
+        "calls": 4,
+    }
+
+
+def test_queued_payouts_can_be_cancelled():
+    api = MockTelePayAPI()
+    api.set_balance("TON", "TON", "mainnet", 100)
+    with TelePaySyncClient(api.secret_api_key, transport=api.transport()) as client:
+        scheduler = client.payout_scheduler()
+        for amount in (0, -6):
+            with raises(ValueError):
+                scheduler.transfer("TON", "TON", "mainnet", amount, "alice")
+        paid = scheduler.transfer("TON", "TON", "mainnet", 5, "alice")
+        cancelled = scheduler.transfer("TON", "TON", "mainnet", 6, "alice")
+        assert scheduler.cancel(cancelled)
+        assert not scheduler.cancel(cancelled)
+        scheduler.flush()
+        assert not scheduler.cancel(paid)
+    assert (paid.status, paid.batch.amount) == ("sent", 5)
+    assert cancelled.status == "cancelled"
+    assert requests(api, "transfer") == 1
+    assert scheduler.stats() == {
+        "pending": 0,
+        "queued": 2,
+        "cancelled": 1,
+        "sent": 1,
+        "calls": 1,
+    }
+
+
+def test_failed_batches_are_reported_per_request():
+    api = MockTelePayAPI()
+    api.set_balance("TON", "TON", "mainnet", 1)
+    with TelePaySyncClient(api.secret_api_key, transport=api.transport()) as client:
+        scheduler = client.payout_scheduler(window=0.05)
+        requests_ = [
+            scheduler.withdraw("EQ-a", "TON", "TON", "mainnet", 1) for _ in range(2)
+        ]
+        assert scheduler.flush(force=False) == []
+        time.sleep(0.06)
+        scheduler.flush(force=False)
+    assert [request.status for request in requests_] == ["failed"] * 2
+    assert requests_[0].error.error == "withdrawal.insufficient-funds"
+
+
+def test_batches_with_a_lost_response_are_unknown():
+    api = MockTelePayAPI()
+    api.set_balance("TON", "TON", "mainnet", 100)
+
+    def handler(request):
+        response = api.handle(request)
+        if MockTelePayAPI.endpoint(request) == "withdraw":
+            raise ReadTimeout("lost", request=request)
+        return response
+
+    with TelePaySyncClient(
+        api.secret_api_key, transport=MockTransport(handler)
+    ) as client:
+        scheduler = client.payout_scheduler()
+        requests_ = [
+            scheduler.withdraw("EQ-a", "TON", "TON", "mainnet", 1) for _ in range(2)
+        ]
+        scheduler.flush()
+    # it was paid, but only once
+    assert [request.status for request in requests_] == ["unknown"] * 2
+    assert requests_[0].error.error == "payout.outcome-unknown"
+    assert requests(api, "withdraw") == 1
+    assert scheduler.stats()["unknown"] == 2
+
+
+@pytest_mark.anyio
+async def test_async_scheduler_sends_full_batches():
+    api = MockTelePayAPI()
+    api.set_balance("TON", "TON", "mainnet", 100)
+    async with TelePayAsyncClient(
+        api.secret_api_key, transport=api.async_transport()
+    ) as client:
+        scheduler = client.payout_scheduler(window=60, max_size=3)
+        scheduler.tick = 0.01
+        async with anyio.create_task_group() as group:
+            group.start_soon(scheduler.run)
+            full = [
+                scheduler.transfer("TON", "TON", "mainnet", 1, "alice")
+                for _ in range(3)
+            ]
+            waiting = scheduler.transfer("TON", "TON", "mainnet", 1, "bob")
+            while not full[0].done:
+                await anyio.sleep(0.01)
+            assert not waiting.done
+            await scheduler.close()
+    assert waiting.status == "sent"
+    assert requests(api, "transfer") == 2
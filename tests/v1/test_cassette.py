@@ -0,0 +1,68 @@
+import gzip
+import json
+
+from pytest import mark as pytest_mark
+
+from telepay.v1 import TelePayAsyncClient, TelePaySyncClient
+from telepay.v1.testing import (
+    Cassette,
+    MockTelePayAPI,
+    RecordingTransport,
+    ReplayTransport,
+)
+
+
+def record(path) -> Cassette:
+    api = MockTelePayAPI(seed=1)
+    transport = RecordingTransport(api.transport())
+    with TelePaySyncClient(api.secret_api_key, transport=transport) as client:
+        client.create_webhook(
+            url="https://example.com", secret="hello", events=["all"], active=True
+        )
+        client.get_webhooks()
+        client.get_me()
+    transport.cassette.save(path)
+    return Cassette.load(path)
+
+
+def test_cassette_redacts_secrets(tmp_path):
+    cassette = record(tmp_path / "cassette.jsonl.gz")
+    assert [i.path for i in cassette.interactions] == [
+        "/rest/createWebhook",
+        "/rest/getWebhooks",
+        "/rest/getMe",
+    ]
+    assert b"hello" not in gzip.decompress(
+        (tmp_path / "cassette.jsonl.gz").read_bytes()
+    )
+    create_webhook = cassette.interactions[0]
+    assert json.loads(create_webhook.request)["secret"] == "REDACTED"
+    assert json.loads(create_webhook.response)["secret"] == "REDACTED"
+
+
+def test_replay_transport_serves_recorded_responses(tmp_path):
+    cassette = record(tmp_path / "cassette.jsonl")
+    with TelePaySyncClient(
+        "another key", transport=ReplayTransport(cassette, speed=0)
+    ) as client:
+        assert client.get_me().merchant["username"] == "mock"
+        assert client.get_webhooks().webhooks[0].secret == "REDACTED"
+
+
+@pytest_mark.anyio
+async def test_replay_requests_against_a_client(tmp_path):
+    cassette = record(tmp_path / "cassette.jsonl")
+    api = MockTelePayAPI()
+    async with TelePayAsyncClient(
+        api.secret_api_key, transport=api.async_transport()
+    ) as client:
+        responses = await cassette.areplay(client.http_client, speed=100)
+    assert [response.status_code for response in responses] == [200, 200, 200]
+    assert len(api.webhooks) == 1
+
+
+def test_cassette_load_skips_blank_lines(tmp_path):
+    path = tmp_path / "cassette.jsonl"
+    record(path)
+    path.write_text(path.read_text().replace("\n", "\n\n"))
+    assert len(Cassette.load(path).interactions) == 3
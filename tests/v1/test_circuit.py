@@ -0,0 +1,99 @@
+from pytest import mark as pytest_mark
+from pytest import raises
+
+from telepay.v1 import (
+    AsyncCircuitBreakerMiddleware,
+    CircuitBreaker,
+    CircuitPolicy,
+    SyncCircuitBreakerMiddleware,
+    TelePayAsyncClient,
+    TelePayError,
+    TelePaySyncClient,
+)
+from telepay.v1.testing import MockTelePayAPI
+
+from .utils import requests
+
+POLICY = CircuitPolicy(window=4, min_calls=4, open_seconds=30, half_open_calls=2)
+
+
+class Clock:
+    now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_circuit_opens_and_probes():
+    clock = Clock()
+    breaker = CircuitBreaker(POLICY, clock=clock)
+    for failed in (False, True, False, True):
+        breaker.acquire("getMe")
+        breaker.record("getMe", failed, 0.1)
+    assert breaker.state("getMe") == "open"
+    with raises(TelePayError) as error:
+        breaker.acquire("getMe")
+    assert error.value.error == "circuit.open"
+    assert error.value.retry_after == 30
+    breaker.acquire("getInvoice")
+
+    clock.now = 30
+    breaker.acquire("getMe")
+    breaker.acquire("getMe")
+    assert breaker.state("getMe") == "half_open"
+    with raises(TelePayError):
+        breaker.acquire("getMe")
+    breaker.record("getMe", True, 0.1)
+    assert breaker.state("getMe") == "open"
+
+    clock.now = 60
+    for _ in range(2):
+        breaker.acquire("getMe")
+        breaker.record("getMe", False, 0.1)
+    assert breaker.state("getMe") == "closed"
+
+
+def test_slow_calls_open_the_circuit():
+    breaker = CircuitBreaker(
+        CircuitPolicy(window=2, min_calls=2, slow_call_duration=1, slow_call_rate=1)
+    )
+    for seconds in (0.5, 2, 2):
+        breaker.acquire("getInvoices")
+        breaker.record("getInvoices", False, seconds)
+    assert breaker.snapshot()["getInvoices"]["state"] == "open"
+
+
+def test_client_fails_fast():
+    api = MockTelePayAPI()
+    api.fail_next("getMe", "unavailable", times=4)
+    circuit = SyncCircuitBreakerMiddleware(POLICY)
+    with TelePaySyncClient(
+        api.secret_api_key, transport=api.transport(), middlewares=[circuit]
+    ) as client:
+        for _ in range(4):
+            with raises(TelePayError):
+                client.get_me()
+        with raises(TelePayError) as error:
+            client.get_me()
+        assert error.value.error == "circuit.open"
+        with raises(TelePayError) as error:
+            client.get_invoice("missing")
+        assert error.value.error == "invoice.not-found"
+    assert requests(api, "getMe") == 4
+    assert circuit.stats()["getMe"]["state"] == "open"
+    assert circuit.stats()["getInvoice"]["state"] == "closed"
+
+
+@pytest_mark.anyio
+async def test_async_client_fails_fast():
+    api = MockTelePayAPI()
+    api.fail_next("getAssets", "unavailable", times=4)
+    circuit = AsyncCircuitBreakerMiddleware(POLICY)
+    async with TelePayAsyncClient(
+        api.secret_api_key, transport=api.async_transport(), middlewares=[circuit]
+    ) as client:
+        for _ in range(5):
+            with raises(TelePayError):
+                await client.get_assets()
+    assert circuit.stats()["getAssets"]["failure_rate"] == 0
+    assert circuit.stats()["getAssets"]["state"] == "open"
@@ -0,0 +1,148 @@
+import io
+import json
+import threading
+from functools import partial
+
+import pytest
+from httpx import ConnectError, MockTransport
+
+from telepay.v1 import cli
+from telepay.v1.testing import MockTelePayAPI
+
+from .utils import INVOICE, requests
+
+
+@pytest.fixture
+def api(monkeypatch):
+    api = MockTelePayAPI()
+    monkeypatch.setattr(
+        cli,
+        "TelePaySyncClient",
+        partial(cli.TelePaySyncClient, transport=api.transport()),
+    )
+    monkeypatch.setenv("TELEPAY_SECRET_API_KEY", api.secret_api_key)
+    return api
+
+
+def run(*argv):
+    output = io.StringIO()
+    code = cli.main(list(argv), output)
+    return code, output.getvalue()
+
+
+def test_create_invoices_from_csv(api, tmp_path, capsys):
+    path = tmp_path / "invoices.csv"
+    path.write_text(
+        "asset,blockchain,network,amount,success_url,cancel_url,expires_at,metadata\n"
+        'TON,TON,mainnet,1.5,https://a.b,https://a.b,60,"{""order"": 1}"\n'
+        "TON,TON,mainnet,2,https://a.b,https://a.b,60,\n"
+        "TON,TON,mainnet,3,https://a.b,https://a.b,,\n"
+    )
+    code, output = run("--concurrency", "2", "create-invoices", str(path))
+    results = sorted(
+        (json.loads(line) for line in output.splitlines()), key=lambda r: r["line"]
+    )
+    assert code == 1
+    assert [result["line"] for result in results] == [1, 2, 3]
+    assert "error" in results[2]
+    invoice = api.invoices[results[0]["number"]]
+    assert invoice["amount"] == "1.5"
+    assert invoice["metadata"]["order"] == 1
+    assert "Created invoices: 2, 1 failed (" in capsys.readouterr().err
+
+
+def test_create_invoices_reports_every_failed_row(api, tmp_path, monkeypatch):
+    path = tmp_path / "invoices.jsonl"
+    rows = [{**INVOICE, "description": "unreachable"}, {**INVOICE, "amount": "abc"}]
+    path.write_text(
+        "\n".join(json.dumps(row) for row in rows)
+        + "\nnot json\n"
+        + json.dumps(INVOICE)
+    )
+
+    def handler(request):
+        if b"unreachable" in request.content:
+            raise ConnectError("unreachable", request=request)
+        return api.handle(request)
+
+    monkeypatch.setattr(
+        cli,
+        "TelePaySyncClient",
+        partial(cli.TelePaySyncClient.func, transport=MockTransport(handler)),
+    )
+    code, output = run("create-invoices", str(path))
+    results = sorted(
+        (json.loads(line) for line in output.splitlines()), key=lambda r: r["line"]
+    )
+    assert code == 1
+    assert [result["line"] for result in results] == [1, 2, 3, 4]
+    assert results[0]["error"] == "unreachable"
+    assert "abc" in results[1]["error"]
+    assert "Invalid row" in results[2]["error"]
+    assert "number" in results[3]
+
+
+def test_create_invoices_retries_and_reports_errors_to_the_limiter(
+    api, tmp_path, monkeypatch
+):
+    released = []
+
+    class Limiter(cli.SyncConcurrencyLimiter):
+        def release(self, seconds, error=None):
+            released.append(error)
+            super().release(seconds, error)
+
+    monkeypatch.setattr(cli, "SyncConcurrencyLimiter", Limiter)
+    monkeypatch.setattr(
+        cli, "SyncRetryMiddleware", partial(cli.SyncRetryMiddleware, backoff=0)
+    )
+    path = tmp_path / "invoices.jsonl"
+    path.write_text(json.dumps(INVOICE))
+    api.fail_next("createInvoice", "unavailable", times=3)
+    code, output = run("create-invoices", str(path))
+    assert code == 1
+    assert json.loads(output)["error"].startswith("unavailable")
+    assert requests(api, "createInvoice") == 3
+    # the limit backs off
+    assert [error.status_code for error in released] == [503]
+
+
+def test_progress_counts_concurrent_rows():
+    progress = cli.Progress("Rows", stream=io.StringIO(), interval=0)
+
+    def advance(failed):
+        for _ in range(100):
+            progress.advance(failed)
+
+    threads = [threading.Thread(target=advance, args=(i % 2,)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert (progress.done, progress.failed) == (200, 200)
+    assert progress.line().startswith("Rows: 200, 200 failed (")
+
+
+def test_export_sweep_and_balances(api, tmp_path):
+    for _ in range(3):
+        api.create_invoice(**INVOICE)
+    api.set_balance("TON", "TON", "mainnet", 12.5)
+    path = tmp_path / "invoices.jsonl"
+
+    assert run("export", str(path), "--format", "jsonl", "--columns", "number")[0] == 0
+    assert len(path.read_text().splitlines()) == 3
+
+    code, output = run("sweep", "--action", "delete", "--rate", "100")
+    assert code == 0
+    assert json.loads(output) == {"selected": 3, "swept": 3}
+    assert api.invoices == {}
+
+    code, output = run("balances")
+    assert "TON TON mainnet" in output
+    assert "12.5" in output
+
+
+def test_errors_are_reported(api, capsys):
+    api.fail_next("getBalance", "forbidden")
+    assert run("balances")[0] == 1
+    assert "forbidden" in capsys.readouterr().err
@@ -0,0 +1,132 @@
+import threading
+import time
+
+import anyio
+from httpx import MockTransport, Response
+from pytest import mark as pytest_mark
+
+from telepay.v1 import (
+    AdaptiveLimit,
+    AsyncConcurrencyLimiter,
+    TelePayAsyncClient,
+    TelePayError,
+    TelePaySyncClient,
+)
+from telepay.v1._backends import AsyncBackend, SyncBackend
+from telepay.v1.testing import MockTelePayAPI
+
+from .utils import INVOICE
+
+
+def test_adaptive_limit():
+    limit = AdaptiveLimit(initial=4, max_limit=8)
+    for _ in range(100):
+        limit.update(0.1)
+    assert limit.current == 8
+    limit.update(0.1, TelePayError(429, "too-many-requests"))
+    assert limit.current == 4
+    limit.update(0.1, TelePayError(404, "invoice.not-found"))
+    assert limit.current == 4
+    for _ in range(10):
+        limit.update(1.0)
+    assert limit.current == 1
+
+
+def test_bulk_helpers():
+    api = MockTelePayAPI()
+    with TelePaySyncClient(api.secret_api_key, transport=api.transport()) as client:
+        invoices = client.create_invoices(
+            [{**INVOICE, "amount": amount} for amount in range(1, 21)]
+        )
+        assert [invoice.amount for invoice in invoices] == [
+            str(amount) for amount in range(1, 21)
+        ]
+        numbers = [invoice.number for invoice in invoices[:3]] + ["missing"]
+        found = client.get_invoices_by_number(numbers)
+    assert [invoice.number for invoice in found[:3]] == numbers[:3]
+    assert isinstance(found[3], TelePayError)
+
+
+@pytest_mark.anyio
+async def test_limiter_converges_below_the_api_capacity():
+    api = MockTelePayAPI()
+    number = api.create_invoice(**INVOICE)["number"]
+    capacity = 8
+    in_flight = 0
+
+    async def handler(request):
+        nonlocal in_flight
+        if in_flight >= capacity:
+            return Response(429, json={"error": "too-many-requests"})
+        in_flight += 1
+        try:
+            await anyio.sleep(0.005)
+            return api.handle(request)
+        finally:
+            in_flight -= 1
+
+    limiter = AsyncConcurrencyLimiter(AdaptiveLimit(initial=2, max_limit=32))
+    async with TelePayAsyncClient(
+        api.secret_api_key, transport=MockTransport(handler), limiter=limiter
+    ) as client:
+        results = await client.get_invoices_by_number([number] * 300)
+    errors = [result for result in results if isinstance(result, Exception)]
+    assert len(errors) < 30
+    assert 2 <= limiter.limit.current <= 16
+    assert limiter.in_flight == 0
+
+
+@pytest_mark.anyio
+async def test_cancelled_bulk_releases_the_limiter():
+    api = MockTelePayAPI()
+
+    async def handler(request):
+        await anyio.sleep(1)
+        return api.handle(request)
+
+    limiter = AsyncConcurrencyLimiter(AdaptiveLimit(initial=4, max_limit=4))
+    async with TelePayAsyncClient(
+        api.secret_api_key, transport=MockTransport(handler), limiter=limiter
+    ) as client:
+        with anyio.move_on_after(0.1):
+            await client.get_invoices_by_number(["x"] * 10)
+    assert limiter.in_flight == 0
+
+
+@pytest_mark.anyio
+async def test_task_group_size():
+    running = peak = 0
+
+    async def task():
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await anyio.sleep(0.01)
+        running -= 1
+
+    async with AsyncBackend.task_group(3) as group:
+        for _ in range(10):
+            group.start_soon(task)
+    assert peak == 3
+
+
+def test_thread_task_group():
+    lock = threading.Lock()
+    running = peak = 0
+    done = []
+
+    def task(number):
+        nonlocal running, peak
+        with lock:
+            running += 1
+            peak = max(peak, running)
+        time.sleep(0.01)
+        with lock:
+            running -= 1
+        done.append(number)
+
+    with SyncBackend.task_group(3) as group:
+        for number in range(10):
+            group.start_soon(task, number)
+    assert sorted(done) == list(range(10))
+    assert peak <= 3
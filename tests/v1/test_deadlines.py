@@ -0,0 +1,93 @@
+from time import monotonic
+
+from httpx import MockTransport, Response, Timeout
+from pytest import mark as pytest_mark
+from pytest import raises
+
+from telepay.v1 import (
+    SyncRetryMiddleware,
+    TelePayAsyncClient,
+    TelePayError,
+    TelePaySyncClient,
+    deadline,
+)
+from telepay.v1.testing import FaultInjectionTransport, FaultPolicy, MockTelePayAPI
+
+
+def test_endpoint_timeouts():
+    client = TelePaySyncClient("secret")
+    assert client.timeouts["createInvoice"] == 15
+    assert client.timeouts["getInvoices"] is None
+    client = TelePaySyncClient("secret", timeout=5, timeouts={"getInvoices": 300})
+    assert client.timeouts["createInvoice"] is None
+    assert client.timeouts["getInvoices"] == 300
+    # a longer client timeout isn't shortened by the endpoint defaults
+    client = TelePaySyncClient("secret", timeout=Timeout(120))
+    assert client.timeouts["getMe"] is None
+    # nor is a timeout equal to the default one
+    client = TelePaySyncClient("secret", timeout=Timeout(60))
+    assert client.timeouts["createInvoice"] is None
+    assert client.http_client.timeout == Timeout(60)
+
+
+def test_request_timeouts():
+    api = MockTelePayAPI()
+    timeouts = {}
+
+    def handler(request):
+        timeouts[MockTelePayAPI.endpoint(request)] = request.extensions["timeout"]
+        return api.handle(request)
+
+    with TelePaySyncClient(api.secret_api_key, transport=MockTransport(handler)) as c:
+        c.get_me()
+        c.get_invoices()
+        with deadline(2):
+            c.get_assets()
+    assert timeouts["getMe"]["read"] == 15
+    assert timeouts["getInvoices"]["read"] == 60
+    assert 1 < timeouts["getAssets"]["read"] <= 2
+
+
+def test_deadline_exceeded():
+    api = MockTelePayAPI()
+    transport = FaultInjectionTransport(api.transport(), FaultPolicy(timeout_rate=1))
+    with TelePaySyncClient(api.secret_api_key, transport=transport) as client:
+        with deadline(0.05):
+            with raises(TelePayError) as error:
+                client.get_me()
+            assert error.value.error == "deadline.exceeded"
+            with raises(TelePayError) as error:
+                client.get_me()
+            assert error.value.error == "deadline.exceeded"
+    assert transport.injected["timeout"] == 1
+
+
+def test_no_retry_past_deadline():
+    api = MockTelePayAPI()
+    responses = [Response(429, headers={"Retry-After": "2"}, json={"error": "x"})]
+
+    def handler(request):
+        return responses.pop() if responses else api.handle(request)
+
+    with TelePaySyncClient(
+        api.secret_api_key,
+        transport=MockTransport(handler),
+        middlewares=[SyncRetryMiddleware()],
+    ) as client:
+        with deadline(1):
+            with raises(TelePayError) as error:
+                client.get_me()
+    assert error.value.status_code == 429
+
+
+@pytest_mark.anyio
+async def test_async_deadline_cancels_the_call():
+    api = MockTelePayAPI()
+    transport = FaultInjectionTransport(api.async_transport(), FaultPolicy(latency=5))
+    async with TelePayAsyncClient(api.secret_api_key, transport=transport) as client:
+        started = monotonic()
+        with deadline(0.05):
+            with raises(TelePayError) as error:
+                await client.get_me()
+        assert error.value.error == "deadline.exceeded"
+        assert monotonic() - started < 1
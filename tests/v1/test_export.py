@@ -0,0 +1,116 @@
+import csv
+import io
+import json
+
+import pytest
+from pytest import mark as pytest_mark
+
+from telepay.v1 import TelePayAsyncClient, TelePaySyncClient
+from telepay.v1.errors import TelePayError
+from telepay.v1.export import ExportWriter, InvoiceStreamDecoder, invoice_row
+from telepay.v1.testing import MockTelePayAPI
+
+from .utils import INVOICE
+
+
+def create_invoices(api, count):
+    return [
+        api.create_invoice(**INVOICE, metadata={"order": {"id": i}, "tags": ["a"]})
+        for i in range(count)
+    ]
+
+
+def test_decoder_handles_invoices_split_across_chunks():
+    invoices = [{"number": str(i), "description": "a, ] {b}"} for i in range(5)]
+    text = json.dumps({"invoices": invoices})
+    decoder = InvoiceStreamDecoder()
+    decoded = []
+    for start in range(0, len(text), 7):
+        decoded.extend(decoder.feed(text[start : start + 7]))
+    decoder.close()
+    assert decoded == invoices
+
+    decoder = InvoiceStreamDecoder()
+    decoder.feed(text[:-10])
+    with pytest.raises(TelePayError) as e:
+        decoder.close()
+    assert e.value.error == "export.incomplete-response"
+
+
+def test_invoice_row_flattens_the_metadata():
+    invoice = {"number": "A", "metadata": json.dumps({"order": {"id": 7}})}
+    assert invoice_row(invoice) == {"number": "A", "metadata.order.id": 7}
+    assert invoice_row(invoice, ["number", "metadata", "missing"]) == {
+        "number": "A",
+        "metadata": '{"order": {"id": 7}}',
+        "missing": None,
+    }
+
+
+def test_export_to_csv():
+    api = MockTelePayAPI()
+    invoices = create_invoices(api, 5)
+    file = io.StringIO()
+    with TelePaySyncClient(api.secret_api_key, transport=api.transport()) as client:
+        exported = client.export_invoices(
+            file, columns=["number", "amount", "metadata.order.id"], chunk_size=2
+        )
+        stats = client.stats()["endpoints"]["getInvoices"]
+    assert exported == 5
+    rows = list(csv.DictReader(io.StringIO(file.getvalue())))
+    assert rows[0] == {
+        "number": invoices[0]["number"],
+        "amount": "1",
+        "metadata.order.id": "0",
+    }
+    assert [row["number"] for row in rows] == [i["number"] for i in invoices]
+    assert stats["requests"] == 1
+    assert stats["bytes_in"] > 0
+
+
+@pytest_mark.anyio
+async def test_async_export_to_json_lines(tmp_path):
+    path = tmp_path / "invoices.jsonl"
+    api = MockTelePayAPI()
+    invoices = create_invoices(api, 3)
+    async with TelePayAsyncClient(
+        api.secret_api_key, transport=api.async_transport()
+    ) as client:
+        assert await client.export_invoices(path, "jsonl") == 3
+    rows = [json.loads(line) for line in path.read_text().splitlines()]
+    assert rows[2]["number"] == invoices[2]["number"]
+    assert rows[2]["metadata.order.id"] == 2
+    assert rows[2]["metadata.tags"] == '["a"]'
+
+
+def test_export_to_parquet(tmp_path):
+    parquet = pytest.importorskip("pyarrow.parquet")
+    path = tmp_path / "invoices.parquet"
+    api = MockTelePayAPI()
+    create_invoices(api, 3)
+    with TelePaySyncClient(api.secret_api_key, transport=api.transport()) as client:
+        client.export_invoices(path, "parquet", chunk_size=2)
+    table = parquet.read_table(path)
+    assert table.num_rows == 3
+    assert table.column("amount").to_pylist() == ["1"] * 3
+
+
+def test_writers_implement_write():
+    class Incomplete(ExportWriter):
+        pass
+
+    with pytest.raises(TypeError):
+        Incomplete(io.StringIO())
+
+
+def test_export_errors_are_raised():
+    api = MockTelePayAPI()
+    api.fail_next("getInvoices")
+    file = io.StringIO()
+    with TelePaySyncClient(api.secret_api_key, transport=api.transport()) as client:
+        with pytest.raises(TelePayError) as e:
+            client.export_invoices(file)
+        assert client.stats()["endpoints"]["getInvoices"]["errors"] == {
+            "unavailable": 1
+        }
+    assert e.value.error == "unavailable"
@@ -0,0 +1,70 @@
+from httpx import ReadError, ReadTimeout
+from pytest import mark as pytest_mark
+from pytest import raises
+
+from telepay.v1 import TelePayAsyncClient, TelePayError, TelePaySyncClient
+from telepay.v1.testing import FaultInjectionTransport, FaultPolicy, MockTelePayAPI
+
+
+def sync_client(faults, seed=1) -> TelePaySyncClient:
+    api = MockTelePayAPI()
+    transport = FaultInjectionTransport(api.transport(), faults, seed=seed)
+    return TelePaySyncClient(api.secret_api_key, transport=transport)
+
+
+def test_rate_limit_with_retry_after():
+    with sync_client({"getMe": FaultPolicy(rate_limit_rate=1, retry_after=2)}) as c:
+        with raises(TelePayError) as error:
+            c.get_me()
+        assert error.value.status_code == 429
+        assert error.value.retry_after == 2
+        c.get_assets()
+
+
+def test_server_error_bursts():
+    policy = FaultPolicy(server_error_rate=1, burst_length=3)
+    with sync_client(policy) as client:
+        transport = client.http_client._transport
+        for _ in range(3):
+            with raises(TelePayError) as error:
+                client.get_me()
+            assert error.value.status_code == 503
+        policy.server_error_rate = 0
+        client.get_me()
+        assert transport.injected["server_error"] == 3
+
+
+def test_connection_resets_and_timeouts():
+    with sync_client(FaultPolicy(reset_rate=1)) as client:
+        with raises(ReadError):
+            client.get_me()
+    with sync_client(FaultPolicy(timeout_rate=1, timeout_delay=0)) as client:
+        with raises(ReadTimeout):
+            client.get_me()
+
+
+def test_faults_are_reproducible():
+    def failures(seed):
+        outcomes = []
+        with sync_client(FaultPolicy(server_error_rate=0.5), seed=seed) as client:
+            for _ in range(20):
+                try:
+                    client.get_me()
+                    outcomes.append(True)
+                except TelePayError:
+                    outcomes.append(False)
+        return outcomes
+
+    assert failures(7) == failures(7)
+    assert not all(failures(7))
+
+
+@pytest_mark.anyio
+async def test_async_latency():
+    api = MockTelePayAPI()
+    transport = FaultInjectionTransport(
+        api.async_transport(), FaultPolicy(latency=0.001)
+    )
+    async with TelePayAsyncClient(api.secret_api_key, transport=transport) as client:
+        await client.get_me()
+    assert transport.injected["latency"] == 1
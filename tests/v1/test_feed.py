@@ -0,0 +1,91 @@
+from httpx import MockTransport
+from pytest import mark as pytest_mark
+
+from telepay.v1 import TelePayAsyncClient, TelePaySyncClient
+from telepay.v1.feed import InvoiceFeed
+from telepay.v1.testing import MockTelePayAPI
+
+from .utils import INVOICE
+
+
+def invoice(number, status="pending", updated_at=None):
+    return {
+        "number": number,
+        "status": status,
+        "created_at": "2022-01-01T00:00:00.000000Z",
+        "updated_at": updated_at,
+    }
+
+
+def test_feed_diffs_snapshots():
+    feed = InvoiceFeed()
+    old = invoice("A", "completed", "2022-01-01T00:00:01.000000Z")
+    assert feed.update([invoice("B"), invoice("C"), old]) == []
+    assert set(feed.active) == {"B", "C"}
+
+    events = feed.update(
+        [
+            invoice("B", "completed", "2022-01-02T00:00:00.000000Z"),
+            invoice("D", "cancelled", "2022-01-02T00:00:00.000000Z"),
+            old,
+        ]
+    )
+    assert [(e["event"], e["data"]["number"]) for e in events] == [
+        ("invoice.completed", "B"),
+        ("invoice.cancelled", "D"),
+        ("invoice.deleted", "C"),
+    ]
+    assert feed.active == {}
+    assert feed.update([old]) == []
+
+
+def test_feed_reports_invoices_changed_at_the_watermark():
+    feed = InvoiceFeed()
+    at = "2022-01-02T00:00:00.000000Z"
+    first = invoice("A", "completed", at)
+    feed.update([invoice("B")])
+    assert [e["data"]["number"] for e in feed.update([first])] == ["A", "B"]
+    # completed in the same second, after the previous snapshot
+    second = invoice("C", "completed", at)
+    events = feed.update([first, second])
+    assert [(e["event"], e["data"]["number"]) for e in events] == [
+        ("invoice.completed", "C")
+    ]
+    assert feed.update([first, second]) == []
+
+
+def paying_after_first_poll(api, number):
+    """
+    Transport completing the invoice once the first snapshot is taken
+    """
+
+    def handler(request):
+        response = api.handle(request)
+        if MockTelePayAPI.endpoint(request) == "getInvoices":
+            api.complete_invoice(number)
+        return response
+
+    return handler
+
+
+def test_sync_watch_invoices():
+    api = MockTelePayAPI()
+    number = api.create_invoice(**INVOICE)["number"]
+    transport = MockTransport(paying_after_first_poll(api, number))
+    with TelePaySyncClient(api.secret_api_key, transport=transport) as client:
+        event = next(client.watch_invoices(interval=0))
+    assert event["event"] == "invoice.completed"
+    assert event["data"]["number"] == number
+
+
+@pytest_mark.anyio
+async def test_async_watch_invoices():
+    api = MockTelePayAPI()
+    number = api.create_invoice(**INVOICE)["number"]
+    transport = MockTransport(paying_after_first_poll(api, number))
+    async with TelePayAsyncClient(api.secret_api_key, transport=transport) as client:
+        events = client.watch_invoices(interval=0)
+        event = await events.__anext__()
+        await events.aclose()
+    assert event["event"] == "invoice.completed"
+    assert event["data"]["status"] == "completed"
@@ -0,0 +1,95 @@
+import time
+from time import monotonic
+
+import anyio
+from httpx import MockTransport
+from pytest import mark as pytest_mark
+
+from telepay.v1 import (
+    AsyncHedgingMiddleware,
+    SyncHedgingMiddleware,
+    TelePayAsyncClient,
+    TelePaySyncClient,
+)
+from telepay.v1.testing import MockTelePayAPI
+
+
+def created_invoice(api):
+    with TelePaySyncClient(api.secret_api_key, transport=api.transport()) as client:
+        invoice = client.create_invoice(
+            "TON", "TON", "mainnet", 1, "https://a.b", "https://a.b", 60
+        )
+    return invoice.number
+
+
+def test_hedging_delay_and_cap():
+    hedging = SyncHedgingMiddleware(percentile=50, min_samples=3, max_extra_load=0.1)
+    assert hedging.delay("getInvoice") == hedging.initial_delay
+    for seconds in (0.1, 0.2, 0.3, 0.4):
+        hedging.observe("getInvoice", seconds)
+    assert hedging.delay("getInvoice") == 0.3
+    hedging.calls = 10
+    assert hedging.allow()
+    assert not hedging.allow()
+
+
+def test_sync_hedged_request():
+    api = MockTelePayAPI()
+    number = created_invoice(api)
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        if len(requests) == 1:
+            time.sleep(1)
+        return api.handle(request)
+
+    hedging = SyncHedgingMiddleware(initial_delay=0.01, max_extra_load=1)
+    with TelePaySyncClient(
+        api.secret_api_key, transport=MockTransport(handler), middlewares=[hedging]
+    ) as client:
+        started = monotonic()
+        assert client.get_invoice(number).number == number
+        assert monotonic() - started < 0.5
+        client.get_me()
+    assert hedging.stats() == {"calls": 1, "hedges": 1, "hedge_wins": 1}
+
+
+@pytest_mark.anyio
+async def test_async_hedged_request():
+    api = MockTelePayAPI()
+    number = created_invoice(api)
+    requests = []
+
+    async def handler(request):
+        requests.append(request)
+        if len(requests) == 1:
+            await anyio.sleep(5)
+        return api.handle(request)
+
+    hedging = AsyncHedgingMiddleware(initial_delay=0.01, max_extra_load=1)
+    async with TelePayAsyncClient(
+        api.secret_api_key, transport=MockTransport(handler), middlewares=[hedging]
+    ) as client:
+        started = monotonic()
+        assert (await client.get_invoice(number)).number == number
+        assert monotonic() - started < 1
+    assert len(requests) == 2
+    assert hedging.stats()["hedge_wins"] == 1
+    # the cancelled request is recorded too, as at least the hedge delay
+    latencies = hedging._latencies["getInvoice"]
+    assert len(latencies) == 2
+    assert max(latencies) >= hedging.initial_delay
+
+
+@pytest_mark.anyio
+async def test_no_hedge_over_the_cap():
+    api = MockTelePayAPI()
+    number = created_invoice(api)
+    hedging = AsyncHedgingMiddleware(initial_delay=0, max_extra_load=0)
+    async with TelePayAsyncClient(
+        api.secret_api_key, transport=api.async_transport(), middlewares=[hedging]
+    ) as client:
+        for _ in range(3):
+            await client.get_invoice(number)
+    assert hedging.stats() == {"calls": 3, "hedges": 0, "hedge_wins": 0}
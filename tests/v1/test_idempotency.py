@@ -0,0 +1,191 @@
+from httpx import MockTransport, ReadTimeout, Response
+from pytest import mark as pytest_mark
+from pytest import raises
+
+from telepay.v1 import (
+    FileIdempotencyStore,
+    IdempotencyRecord,
+    SyncRetryMiddleware,
+    TelePayAsyncClient,
+    TelePayError,
+    TelePaySyncClient,
+)
+from telepay.v1.idempotency import SUCCEEDED
+from telepay.v1.testing import MockTelePayAPI
+
+from .utils import INVOICE, requests
+
+
+def losing_responses(api, endpoint, times=1):
+    """
+    Transport performing the requests, but losing the first responses
+    """
+    lost = []
+
+    def handler(request):
+        response = api.handle(request)
+        if MockTelePayAPI.endpoint(request) == endpoint and len(lost) < times:
+            lost.append(request)
+            raise ReadTimeout("lost", request=request)
+        return response
+
+    return MockTransport(handler)
+
+
+def test_same_key_returns_the_recorded_invoice():
+    api = MockTelePayAPI()
+    with TelePaySyncClient(api.secret_api_key, transport=api.transport()) as client:
+        first = client.create_invoice(**INVOICE, idempotency_key="order-1")
+        second = client.create_invoice(**INVOICE, idempotency_key="order-1")
+    assert first.number == second.number
+    assert requests(api, "createInvoice") == 1
+    assert "order-1" in first.metadata
+
+
+def test_unknown_outcome_finds_the_invoice():
+    api = MockTelePayAPI()
+    transport = losing_responses(api, "createInvoice")
+    with TelePaySyncClient(api.secret_api_key, transport=transport) as client:
+        with raises(ReadTimeout):
+            client.create_invoice(**INVOICE, idempotency_key="order-1")
+        invoice = client.create_invoice(**INVOICE, idempotency_key="order-1")
+    assert list(api.invoices) == [invoice.number]
+
+
+def test_retries_create_a_single_invoice():
+    api = MockTelePayAPI()
+    transport = losing_responses(api, "createInvoice", times=2)
+    retry = SyncRetryMiddleware(attempts=3, backoff=0)
+    with TelePaySyncClient(
+        api.secret_api_key, transport=transport, middlewares=[retry]
+    ) as client:
+        invoice = client.create_invoice(**INVOICE, idempotency_key="order-1")
+    assert list(api.invoices) == [invoice.number]
+    assert requests(api, "createInvoice") == 1
+
+
+def test_no_key_without_idempotency_key():
+    api = MockTelePayAPI()
+    with TelePaySyncClient(api.secret_api_key, transport=api.transport()) as client:
+        invoice = client.create_invoice(**INVOICE)
+    assert "idempotency_key" not in (invoice.metadata or {})
+
+
+def test_payouts_with_unknown_outcome_are_never_sent_again():
+    api = MockTelePayAPI()
+    api.set_balance("TON", "TON", "mainnet", 100)
+    transport = losing_responses(api, "withdraw")
+    retry = SyncRetryMiddleware(attempts=3, backoff=0)
+    with TelePaySyncClient(
+        api.secret_api_key, transport=transport, middlewares=[retry]
+    ) as client:
+        for _ in range(2):
+            with raises(TelePayError) as error:
+                client.withdraw(
+                    "addr", "TON", "TON", "mainnet", 10, "", idempotency_key="p1"
+                )
+            assert error.value.error == "payout.outcome-unknown"
+        assert requests(api, "withdraw") == 1
+
+        # once checked that it wasn't paid, the key can be used again
+        client.idempotency.forget("p1")
+        client.withdraw("addr", "TON", "TON", "mainnet", 10, "", idempotency_key="p1")
+    assert requests(api, "withdraw") == 2
+
+
+def test_payouts_without_key_report_unknown_outcomes():
+    api = MockTelePayAPI()
+    api.set_balance("TON", "TON", "mainnet", 100)
+    transport = losing_responses(api, "transfer")
+    retry = SyncRetryMiddleware(attempts=3, backoff=0)
+    with TelePaySyncClient(
+        api.secret_api_key, transport=transport, middlewares=[retry]
+    ) as client:
+        with raises(TelePayError) as error:
+            client.transfer("TON", "TON", "mainnet", 4, "someone")
+    assert error.value.error == "payout.outcome-unknown"
+    assert isinstance(error.value.__cause__, ReadTimeout)
+    assert requests(api, "transfer") == 1
+
+
+def test_rejected_payouts_raise_the_api_error():
+    api = MockTelePayAPI()
+    api.set_balance("TON", "TON", "mainnet", 100)
+    responses = [
+        Response(429, headers={"Retry-After": "2"}, json={"error": "rate-limited"}),
+        Response(502, text="Bad Gateway"),
+    ]
+
+    def handler(request):
+        if MockTelePayAPI.endpoint(request) == "withdraw" and responses:
+            return responses.pop(0)
+        return api.handle(request)
+
+    with TelePaySyncClient(
+        api.secret_api_key, transport=MockTransport(handler)
+    ) as client:
+        with raises(TelePayError) as error:
+            client.withdraw("addr", "TON", "TON", "mainnet", 1, "", idempotency_key="p")
+        assert (error.value.status_code, error.value.retry_after) == (429, 2)
+        # a 5xx without an error body may come from a proxy, after the payout
+        with raises(TelePayError) as error:
+            client.withdraw("addr", "TON", "TON", "mainnet", 1, "", idempotency_key="p")
+        assert error.value.error == "payout.outcome-unknown"
+    assert requests(api, "withdraw") == 0
+
+
+def test_records_survive_restarts(tmp_path):
+    api = MockTelePayAPI()
+    api.set_balance("TON", "TON", "mainnet", 10)
+    path = tmp_path / "idempotency.jsonl"
+    for _ in range(2):
+        with TelePaySyncClient(
+            api.secret_api_key,
+            transport=api.transport(),
+            idempotency_store=FileIdempotencyStore(path),
+        ) as client:
+            client.transfer("TON", "TON", "mainnet", 4, "someone", idempotency_key="p1")
+    assert api.wallets[("TON", "TON", "mainnet")] == 6
+
+
+def test_file_store_compaction(tmp_path):
+    path = tmp_path / "idempotency.jsonl"
+    store = FileIdempotencyStore(path, max_age=60)
+    store.min_compaction_lines = 10
+    for number in range(20):
+        store.put(IdempotencyRecord(f"k{number}", "transfer"))
+        store.put(IdempotencyRecord(f"k{number}", "transfer", SUCCEEDED))
+        store.delete(f"k{number}")
+    store.put(IdempotencyRecord("old", "transfer", SUCCEEDED, updated_at=0))
+    store.put(IdempotencyRecord("pending", "transfer", updated_at=0))
+    store.compact()
+    assert len(path.read_text().splitlines()) == 1
+    assert FileIdempotencyStore(path).get("pending") is not None
+
+
+def test_api_errors_forget_the_key():
+    api = MockTelePayAPI()
+    with TelePaySyncClient(api.secret_api_key, transport=api.transport()) as client:
+        with raises(TelePayError) as error:
+            client.transfer("TON", "TON", "mainnet", 4, "someone", idempotency_key="p1")
+        assert error.value.error == "transfer.insufficient-funds"
+        api.set_balance("TON", "TON", "mainnet", 10)
+        client.transfer("TON", "TON", "mainnet", 4, "someone", idempotency_key="p1")
+        with raises(TelePayError) as error:
+            client.withdraw(
+                "addr", "TON", "TON", "mainnet", 1, "", idempotency_key="p1"
+            )
+        assert error.value.error == "idempotency.key-reused"
+    assert api.wallets[("TON", "TON", "mainnet")] == 6
+
+
+@pytest_mark.anyio
+async def test_async_idempotency():
+    api = MockTelePayAPI()
+    async with TelePayAsyncClient(
+        api.secret_api_key, transport=api.async_transport()
+    ) as client:
+        first = await client.create_invoice(**INVOICE, idempotency_key="order-1")
+        second = await client.create_invoice(**INVOICE, idempotency_key="order-1")
+    assert first.number == second.number
+    assert requests(api, "createInvoice") == 1
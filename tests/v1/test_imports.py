@@ -0,0 +1,15 @@
+import subprocess
+import sys
+
+OPTIONAL_MODULES = ("fastapi", "uvicorn", "colorama", "dotenv", "opentelemetry")
+
+
+def test_import_does_not_load_optional_dependencies():
+    code = (
+        "import sys, telepay.v1; "
+        f"print([m for m in {OPTIONAL_MODULES!r} if m in sys.modules])"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    ).stdout.strip()
+    assert output == "[]"
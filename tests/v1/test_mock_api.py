@@ -0,0 +1,74 @@
+from httpx import AsyncClient
+from pytest import mark as pytest_mark
+from pytest import raises
+
+from telepay.v1 import TelePayAsyncClient, TelePayError, TelePaySyncClient
+from telepay.v1.testing import MockTelePayAPI
+
+from .utils import INVOICE
+
+
+def test_sync_client_against_mock_api():
+    api = MockTelePayAPI(seed=1)
+    with TelePaySyncClient(api.secret_api_key, transport=api.transport()) as client:
+        invoice = client.create_invoice(**INVOICE)
+        assert client.get_invoice(invoice.number).status == "pending"
+        assert client.cancel_invoice(invoice.number).status == "cancelled"
+        assert len(client.get_invoices().invoices) == 1
+        client.delete_invoice(invoice.number)
+        with raises(TelePayError) as error:
+            client.get_invoice(invoice.number)
+        assert error.value.error == "invoice.not-found"
+
+
+def test_mock_api_forbids_invalid_keys():
+    api = MockTelePayAPI()
+    with TelePaySyncClient("invalid", transport=api.transport()) as client:
+        with raises(TelePayError) as error:
+            client.get_me()
+        assert error.value.status_code == 403
+
+
+def test_mock_api_injects_errors():
+    api = MockTelePayAPI(error_rate={"getAssets": 1.0})
+    api.fail_next("getMe", "unavailable")
+    with TelePaySyncClient(api.secret_api_key, transport=api.transport()) as client:
+        with raises(TelePayError):
+            client.get_me()
+        assert client.get_me().merchant["username"] == "mock"
+        with raises(TelePayError):
+            client.get_assets()
+
+
+def test_mock_api_moves_funds():
+    api = MockTelePayAPI()
+    with TelePaySyncClient(api.secret_api_key, transport=api.transport()) as client:
+        invoice = client.create_invoice(**INVOICE)
+        api.complete_invoice(invoice.number)
+        assert client.get_balance().wallets[0]["balance"] == 1
+        with raises(TelePayError) as error:
+            client.transfer("TON", "TON", "mainnet", 2, username="test")
+        assert error.value.error == "transfer.insufficient-funds"
+        client.transfer("TON", "TON", "mainnet", 1, username="test")
+
+
+@pytest_mark.anyio
+async def test_async_client_against_mock_api():
+    api = MockTelePayAPI(latency=0.001)
+    async with TelePayAsyncClient(
+        api.secret_api_key, transport=api.async_transport()
+    ) as client:
+        webhook = await client.create_webhook(
+            url="https://example.com", secret="hello", events=["all"], active=False
+        )
+        assert (await client.activate_webhook(webhook.id)).active
+        assert len((await client.get_webhooks()).webhooks) == 1
+        assert (await client.get_asset("TON", "TON")).usd_price == 2.0
+
+
+@pytest_mark.anyio
+async def test_mock_api_as_asgi_app():
+    api = MockTelePayAPI()
+    async with AsyncClient(app=api, base_url="http://mock/rest/") as http:
+        response = await http.get("getMe", headers={"Authorization": "secret"})
+    assert response.json()["merchant"]["username"] == "mock"
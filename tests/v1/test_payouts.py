@@ -0,0 +1,74 @@
+from pytest import mark as pytest_mark
+
+from telepay.v1 import Payout, TelePayAsyncClient, TelePaySyncClient
+from telepay.v1.testing import MockTelePayAPI
+
+from .utils import requests
+
+ADDRESS = "EQ-destination"
+
+
+def payout(amount, address=ADDRESS, asset="TON"):
+    return Payout(address, asset, asset, "mainnet", amount)
+
+
+def test_plan_checks_minimums_and_balances():
+    api = MockTelePayAPI()
+    api.withdraw_minimum = 1.0
+    api.withdraw_fee = 0.5
+    api.set_balance("TON", "TON", "mainnet", 10)
+    payouts = [payout(4), payout(0.5), payout(4), payout(4), payout(1, asset="BTC")]
+    with TelePaySyncClient(api.secret_api_key, transport=api.transport()) as client:
+        plan = client.plan_payouts(payouts)
+    problems = [quote.problems for quote in plan.quotes]
+    assert problems == [
+        [],
+        ["below-minimum"],
+        [],
+        ["insufficient-funds"],
+        ["quote-failed"],
+    ]
+    assert plan.quotes[0].fee == 0.5
+    assert plan.quotes[4].errors == ["minimum: not-found", "fee: not-found"]
+    assert not plan.feasible
+    assert plan.feasible_payouts == [payouts[0], payouts[2]]
+    report = plan.report()
+    assert report["feasible"] == 2
+    assert report["problems"] == {
+        "below-minimum": 1,
+        "insufficient-funds": 1,
+        "quote-failed": 1,
+    }
+    assert report["wallets"]["TON TON mainnet"]["shortfall"] == 4.5
+    # the same quotes are only requested once
+    assert requests(api, "getWithdrawFee") == 3
+    assert requests(api, "getWithdrawMinimum") == 2
+    assert requests(api, "withdraw") == 0
+
+
+@pytest_mark.anyio
+async def test_quotes_are_cached_across_plans():
+    api = MockTelePayAPI()
+    api.set_balance("TON", "TON", "mainnet", 100)
+    async with TelePayAsyncClient(
+        api.secret_api_key, transport=api.async_transport()
+    ) as client:
+        first = await client.plan_payouts([payout(1), payout(2)])
+        second = await client.plan_payouts(
+            [
+                dict(
+                    to_address=ADDRESS,
+                    asset="TON",
+                    blockchain="TON",
+                    network="mainnet",
+                    amount=2,
+                )
+            ]
+        )
+        assert first.feasible and second.feasible
+        assert requests(api, "getWithdrawFee") == 2
+        assert requests(api, "getWithdrawMinimum") == 1
+        assert requests(api, "getBalance") == 2
+        client.payout_planner.fees.clear()
+        await client.plan_payouts([payout(2)])
+    assert requests(api, "getWithdrawFee") == 3
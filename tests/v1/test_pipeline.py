@@ -0,0 +1,177 @@
+import threading
+
+from httpx import MockTransport, Response
+from pytest import mark as pytest_mark
+from pytest import raises
+
+from telepay.v1 import (
+    ENDPOINTS,
+    AsyncCacheMiddleware,
+    AsyncMiddleware,
+    AsyncRetryMiddleware,
+    SyncCacheMiddleware,
+    SyncMiddleware,
+    SyncRateLimitMiddleware,
+    SyncRetryMiddleware,
+    TelePayAsyncClient,
+    TelePayError,
+    TelePaySyncClient,
+)
+from telepay.v1.testing import MockTelePayAPI
+
+
+class Recorder(SyncMiddleware):
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, context, call_next):
+        self.calls.append((context.endpoint.name, context.url))
+        return call_next(context)
+
+
+def test_endpoint_table():
+    names = {endpoint.name for endpoint in ENDPOINTS}
+    assert len(names) == 20
+    assert all(hasattr(TelePaySyncClient, e.operation) for e in ENDPOINTS)
+    assert all(hasattr(TelePayAsyncClient, e.operation) for e in ENDPOINTS)
+
+
+def test_middlewares_see_every_call():
+    api = MockTelePayAPI()
+    recorder = Recorder()
+    with TelePaySyncClient(
+        api.secret_api_key, transport=api.transport(), middlewares=[recorder]
+    ) as client:
+        client.get_me()
+        with raises(TelePayError):
+            client.get_invoice("missing")
+    assert recorder.calls == [("getMe", "getMe"), ("getInvoice", "getInvoice/missing")]
+
+
+def test_retry_idempotent_endpoints():
+    api = MockTelePayAPI()
+    api.fail_next("getMe", "unavailable", times=2)
+    retry = SyncRetryMiddleware(attempts=3, backoff=0)
+    with TelePaySyncClient(
+        api.secret_api_key, transport=api.transport(), middlewares=[retry]
+    ) as client:
+        client.get_me()
+        api.fail_next("getMe", "unavailable", times=3)
+        with raises(TelePayError):
+            client.get_me()
+
+
+def test_retry_skips_non_idempotent_endpoints():
+    api = MockTelePayAPI()
+    api.fail_next("transfer", "unavailable")
+    retry = SyncRetryMiddleware(attempts=3, backoff=0)
+    with TelePaySyncClient(
+        api.secret_api_key, transport=api.transport(), middlewares=[retry]
+    ) as client:
+        with raises(TelePayError) as error:
+            client.transfer("TON", "TON", "mainnet", 1, "someone")
+    assert error.value.status_code == 503
+
+
+def test_retry_honours_retry_after(monkeypatch):
+    delays = []
+    monkeypatch.setattr("telepay.v1._sync.middlewares.SyncBackend.sleep", delays.append)
+    api = MockTelePayAPI()
+    responses = [Response(429, headers={"Retry-After": "2"}, json={"error": "x"})]
+
+    def handler(request):
+        return responses.pop() if responses else api.handle(request)
+
+    transport = MockTransport(handler)
+    with TelePaySyncClient(
+        api.secret_api_key, transport=transport, middlewares=[SyncRetryMiddleware()]
+    ) as client:
+        client.get_me()
+    assert delays == [2.0]
+
+
+def test_cache():
+    api = MockTelePayAPI()
+    recorder = Recorder()
+    cache = SyncCacheMiddleware(ttl=60)
+    with TelePaySyncClient(
+        api.secret_api_key, transport=api.transport(), middlewares=[cache, recorder]
+    ) as client:
+        assets = client.get_assets()
+        assets.assets.clear()
+        # every call gets its own copy
+        assert client.get_assets().assets
+        client.get_me()
+        client.get_me()
+        cache.invalidate()
+        client.get_assets()
+    assert [name for name, _ in recorder.calls].count("getAssets") == 2
+    assert [name for name, _ in recorder.calls].count("getMe") == 2
+
+
+def test_cache_size_is_bounded():
+    api = MockTelePayAPI()
+    recorder = Recorder()
+    cache = SyncCacheMiddleware(ttl=60, max_size=1)
+    with TelePaySyncClient(
+        api.secret_api_key, transport=api.transport(), middlewares=[cache, recorder]
+    ) as client:
+        client.get_asset("TON", "TON")
+        client.get_assets()
+        client.get_asset("TON", "TON")
+    assert len(cache._cache) == 1
+    assert [name for name, _ in recorder.calls].count("getAsset") == 2
+
+
+def test_cache_is_thread_safe():
+    cache = SyncCacheMiddleware(ttl=0.001, max_size=64)
+    errors = []
+
+    def fill(thread):
+        try:
+            for i in range(2000):
+                key = ("GET", f"/{thread}/{i % 100}", "{}")
+                cache._get(key)
+                cache._store(key, {"i": i})
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=fill, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert len(cache._cache) <= 64
+
+
+def test_rate_limit():
+    limiter = SyncRateLimitMiddleware(rate=10, burst=2)
+    assert limiter.reserve() == 0
+    assert limiter.reserve() == 0
+    assert 0.05 < limiter.reserve() <= 0.1
+
+
+@pytest_mark.anyio
+async def test_async_pipeline():
+    class Counter(AsyncMiddleware):
+        calls = 0
+
+        async def __call__(self, context, call_next):
+            Counter.calls += 1
+            return await call_next(context)
+
+    api = MockTelePayAPI()
+    api.fail_next("getAssets", "unavailable")
+    transport = api.async_transport()
+    middlewares = [
+        AsyncCacheMiddleware(),
+        AsyncRetryMiddleware(backoff=0),
+        Counter(),
+    ]
+    async with TelePayAsyncClient(
+        api.secret_api_key, transport=transport, middlewares=middlewares
+    ) as client:
+        await client.get_assets()
+        await client.get_assets()
+    assert Counter.calls == 2
@@ -0,0 +1,63 @@
+import time
+
+import anyio
+from pytest import mark as pytest_mark
+
+from telepay.v1 import InvoiceTier, TelePayAsyncClient, TelePaySyncClient
+from telepay.v1.testing import MockTelePayAPI
+
+from .utils import statuses
+
+TON = InvoiceTier("TON", "TON", "mainnet", 10)
+
+
+def test_pool_hands_out_ready_invoices():
+    api = MockTelePayAPI()
+    with TelePaySyncClient(api.secret_api_key, transport=api.transport()) as client:
+        pool = client.invoice_pool({TON: 3}, "https://a.b", "https://a.b")
+        pool.refill()
+        assert pool.ready(TON) == 3
+        invoice = pool.take("TON", "TON", "mainnet", 10)
+        assert invoice.amount == "10"
+        assert pool.ready(TON) == 2
+        other = pool.take("TON", "TON", "mainnet", 20)
+        assert other.amount == "20"
+        pool.refill()
+        assert pool.ready(TON) == 3
+        pool.close()
+    assert pool.stats()["hits"] == 1
+    assert pool.stats()["misses"] == 1
+    assert statuses(api) == ["cancelled"] * 3 + ["pending"] * 2
+
+
+def test_pool_cancels_stale_invoices():
+    api = MockTelePayAPI()
+    with TelePaySyncClient(api.secret_api_key, transport=api.transport()) as client:
+        pool = client.invoice_pool({TON: 2}, "https://a.b", "https://a.b", max_age=0.05)
+        pool.refill()
+        time.sleep(0.06)
+        pool.take(*TON)
+        pool.refill()
+    assert pool.stats()["cancelled"] == 2
+    assert pool.ready(TON) == 2
+    assert statuses(api).count("cancelled") == 2
+
+
+@pytest_mark.anyio
+async def test_async_pool_refills_in_the_background():
+    api = MockTelePayAPI()
+    async with TelePayAsyncClient(
+        api.secret_api_key, transport=api.async_transport()
+    ) as client:
+        pool = client.invoice_pool({TON: 2}, "https://a.b", "https://a.b")
+        async with anyio.create_task_group() as group:
+            group.start_soon(pool.run)
+            while pool.ready(TON) < 2:
+                await anyio.sleep(0.01)
+            await pool.take(*TON)
+            await pool.take(*TON)
+            while pool.ready(TON) < 2:
+                await anyio.sleep(0.01)
+            pool.stop()
+    assert pool.stats()["hits"] == 2
+    assert len(api.invoices) == 4
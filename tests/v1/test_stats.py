@@ -0,0 +1,43 @@
+from httpx import MockTransport, ReadTimeout, Request, Response
+from pytest import raises
+
+from telepay.v1 import TelePaySyncClient
+from telepay.v1.stats import ClientStats, endpoint_name
+
+BASE_URL = "https://api.telepay.cash/rest/"
+
+
+def test_endpoint_name_strips_path_parameters():
+    assert endpoint_name(Request("GET", f"{BASE_URL}getInvoice/ABC")) == "getInvoice"
+    assert endpoint_name(Request("GET", f"{BASE_URL}getMe")) == "getMe"
+
+
+def test_stats_record_responses():
+    stats = ClientStats()
+    request = Request("POST", f"{BASE_URL}cancelInvoice/ABC", json={"a": 1})
+    stats.request_started(request)
+    stats.response_received(
+        Response(404, json={"error": "invoice.not-found"}, request=request)
+    )
+    stats.request_started(request)
+    stats.response_received(Response(200, json={}, request=request))
+
+    snapshot = stats.snapshot()["endpoints"]["cancelInvoice"]
+    assert snapshot["requests"] == 2
+    assert snapshot["errors"] == {"invoice.not-found": 1}
+    assert snapshot["latency"]["count"] == 2
+    assert snapshot["bytes_out"] == 2 * len(request.content)
+    assert snapshot["bytes_in"] > 0
+
+
+def test_client_stats_count_transport_errors():
+    def handler(request):
+        raise ReadTimeout("timed out", request=request)
+
+    client = TelePaySyncClient("secret", transport=MockTransport(handler))
+    with raises(ReadTimeout):
+        client.get_me()
+
+    snapshot = client.stats()["endpoints"]["getMe"]
+    assert snapshot["requests"] == 1
+    assert snapshot["errors"] == {"ReadTimeout": 1}
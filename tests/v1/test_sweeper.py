@@ -0,0 +1,69 @@
+import json
+
+from pytest import mark as pytest_mark
+
+from telepay.v1 import TelePayAsyncClient, TelePaySyncClient
+from telepay.v1.sweeper import SweepCheckpoint, select_invoices
+from telepay.v1.testing import MockTelePayAPI
+
+from .utils import INVOICE, statuses
+
+
+def create_invoices(api, count):
+    return [api.create_invoice(**INVOICE)["number"] for _ in range(count)]
+
+
+def test_select_invoices_by_status_and_age():
+    invoices = [
+        {"number": "A", "status": "pending", "created_at": "2022-01-01T00:00:00.0Z"},
+        {"number": "B", "status": "completed", "created_at": "2022-01-01T00:00:00.0Z"},
+        {"number": "C", "status": "pending", "created_at": "2999-01-01T00:00:00.0Z"},
+    ]
+    assert select_invoices(invoices, ("pending",), older_than=60) == ["A"]
+    assert select_invoices(invoices, ("pending", "completed")) == ["A", "B"]
+
+
+def test_sweep_cancels_pending_invoices():
+    api = MockTelePayAPI()
+    numbers = create_invoices(api, 5)
+    with TelePaySyncClient(api.secret_api_key, transport=api.transport()) as client:
+        api.complete_invoice(numbers[0])
+        counts = client.sweep_invoices(concurrency=2, rate=1000)
+    assert counts == {"selected": 4, "swept": 4}
+    assert statuses(api) == ["cancelled"] * 4 + ["completed"]
+
+
+def test_sweep_resumes_from_the_checkpoint(tmp_path):
+    path = tmp_path / "sweep.jsonl"
+    api = MockTelePayAPI()
+    numbers = create_invoices(api, 3)
+    with TelePaySyncClient(api.secret_api_key, transport=api.transport()) as client:
+        # an interrupted sweep, which cancelled the first invoice
+        checkpoint = SweepCheckpoint(path)
+        checkpoint.start("delete", numbers)
+        checkpoint.done(numbers[0])
+        # deleted meanwhile, counted as skipped
+        client.delete_invoice(numbers[1])
+        counts = client.sweep_invoices("delete", checkpoint=path)
+    assert counts == {"resumed": 1, "selected": 2, "swept": 1, "skipped": 1}
+    assert list(api.invoices) == [numbers[0]]
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    assert lines[-1] == {"finished": True}
+    assert SweepCheckpoint(path).load("delete") is None
+
+
+@pytest_mark.anyio
+async def test_async_sweep_keeps_failed_invoices_for_the_next_run(tmp_path):
+    path = tmp_path / "sweep.jsonl"
+    api = MockTelePayAPI()
+    create_invoices(api, 3)
+    async with TelePayAsyncClient(
+        api.secret_api_key, transport=api.async_transport()
+    ) as client:
+        api.fail_next("deleteInvoice", "unavailable")
+        counts = await client.sweep_invoices("delete", checkpoint=path)
+        assert counts["swept"] == 2
+        assert counts["failed"] == 1
+        counts = await client.sweep_invoices("delete", checkpoint=path)
+    assert counts == {"resumed": 2, "selected": 1, "swept": 1}
+    assert api.invoices == {}
@@ -0,0 +1,78 @@
+import pytest
+from pytest import importorskip
+
+from telepay.v1 import SyncRetryMiddleware, TelePaySyncClient
+from telepay.v1.testing import MockTelePayAPI
+from telepay.v1.tracing import inject_metadata, links_from_metadata, start_span
+
+from .utils import INVOICE
+
+_exporter = None
+
+
+@pytest.fixture
+def spans():
+    """
+    The spans finished during the test, recorded by the OpenTelemetry SDK
+    """
+    global _exporter
+    importorskip("opentelemetry.sdk")
+    if _exporter is None:
+        from opentelemetry import trace
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+        from opentelemetry.sdk.trace.export.in_memory_span_exporter import (
+            InMemorySpanExporter,
+        )
+
+        # the tracer provider can only be set once per process
+        provider = TracerProvider()
+        _exporter = InMemorySpanExporter()
+        provider.add_span_processor(SimpleSpanProcessor(_exporter))
+        trace.set_tracer_provider(provider)
+    _exporter.clear()
+    yield _exporter.get_finished_spans
+
+
+def test_client_calls_open_spans(spans):
+    api = MockTelePayAPI()
+    api.fail_next("getMe", "unavailable")
+    with TelePaySyncClient(
+        api.secret_api_key,
+        transport=api.transport(),
+        middlewares=[SyncRetryMiddleware(backoff=0)],
+    ) as client:
+        client.get_me()
+    (span,) = spans()
+    assert span.name == "telepay.get_me"
+    assert span.attributes["telepay.endpoint"] == "getMe"
+    assert span.attributes["http.status_code"] == 200
+    assert span.attributes["telepay.attempts"] == 2
+    assert span.attributes["telepay.retries"] == 1
+
+
+def test_trace_metadata_links_webhooks_to_the_invoice_creation(spans):
+    api = MockTelePayAPI()
+    with TelePaySyncClient(
+        api.secret_api_key, transport=api.transport(), trace_metadata=True
+    ) as client:
+        invoice = client.create_invoice(**INVOICE, metadata={"order": 1})
+    (span,) = spans()
+    metadata = api.invoices[invoice.number]["metadata"]
+    assert metadata["order"] == 1
+    (link,) = links_from_metadata(metadata)
+    assert link.context.span_id == span.get_span_context().span_id
+
+
+def test_webhook_links_to_invoice_creation(spans):
+    with start_span("telepay.create_invoice") as span:
+        metadata = inject_metadata({"color": "red"})
+
+    assert metadata["color"] == "red"
+    (link,) = links_from_metadata(metadata)
+    assert link.context.span_id == span.get_span_context().span_id
+
+
+def test_metadata_without_trace_context():
+    assert links_from_metadata({"color": "red"}) is None
+    assert links_from_metadata("color") is None
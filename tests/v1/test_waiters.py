@@ -0,0 +1,103 @@
+import anyio
+from pytest import mark as pytest_mark
+from pytest import raises
+
+from telepay.v1 import TelePayAsyncClient, TelePayError, TelePaySyncClient
+from telepay.v1.testing import MockTelePayAPI
+from telepay.v1.waiters import InvoiceWaiters
+
+from .utils import INVOICE, create_listener, deliver, requests
+
+
+def async_client(api, waiters):
+    client = TelePayAsyncClient(api.secret_api_key, transport=api.async_transport())
+    client.invoice_waiter.waiters = waiters
+    client.invoice_waiter.min_interval = 0.01
+    client.invoice_waiter.tick = 0.01
+    return client
+
+
+@pytest_mark.anyio
+async def test_waits_share_the_polls():
+    api = MockTelePayAPI()
+    numbers = [api.create_invoice(**INVOICE)["number"] for _ in range(5)]
+    results = {}
+
+    async with async_client(api, InvoiceWaiters()) as client:
+
+        async def wait(number):
+            results[number] = await client.wait_for_invoice(number, timeout=5)
+
+        async with anyio.create_task_group() as group:
+            for number in numbers:
+                group.start_soon(wait, number)
+            await anyio.sleep(0.05)
+            for number in numbers:
+                api.complete_invoice(number)
+
+    assert {invoice.status for invoice in results.values()} == {"completed"}
+    # the five waits share each poll
+    assert requests(api, "getInvoices") == client.invoice_waiter.polls <= 10
+    assert requests(api, "getInvoice") == 0
+
+
+@pytest_mark.anyio
+async def test_webhooks_resolve_the_waits():
+    api = MockTelePayAPI()
+    number = api.create_invoice(**INVOICE)["number"]
+    waiters = InvoiceWaiters()
+    listener = create_listener()
+    listener.waiters = waiters
+    waiters.attach()
+    results = []
+
+    async with async_client(api, waiters) as client:
+
+        async def wait():
+            results.append(await client.wait_for_invoice(number, timeout=5))
+
+        async with anyio.create_task_group() as group:
+            group.start_soon(wait)
+            await anyio.sleep(0.05)
+            invoice = api.complete_invoice(number)
+            await deliver(listener, {"event": "invoice.completed", "data": invoice})
+
+    assert results[0].status == "completed"
+    assert requests(api, "getInvoices") == 1
+    assert waiters.waiting() == []
+
+
+def test_wait_timeout():
+    api = MockTelePayAPI()
+    number = api.create_invoice(**INVOICE)["number"]
+    with TelePaySyncClient(api.secret_api_key, transport=api.transport()) as client:
+        client.invoice_waiter.waiters = InvoiceWaiters()
+        client.invoice_waiter.min_interval = 0.01
+        with raises(TelePayError) as error:
+            client.wait_for_invoice(number, timeout=0.1)
+        assert error.value.error == "deadline.exceeded"
+        api.complete_invoice(number)
+        invoice = client.wait_for_invoice(number, statuses=["completed"], timeout=1)
+    assert invoice.status == "completed"
+
+
+def test_failing_subscribers_dont_stop_the_event(caplog):
+    class Subscriber:
+        def __init__(self, fail):
+            self.fail = fail
+            self.invoices = []
+
+        def on_invoice(self, invoice):
+            if self.fail:
+                raise RuntimeError("broken")
+            self.invoices.append(invoice)
+
+    waiters = InvoiceWaiters()
+    subscribers = [Subscriber(fail=True), Subscriber(fail=False)]
+    for subscriber in subscribers:
+        waiters.subscribe(subscriber)
+    waiters.register("X")
+    assert waiters.publish({"number": "X", "status": "completed"})
+    assert subscribers[1].invoices == [{"number": "X", "status": "completed"}]
+    assert waiters.get("X")["status"] == "completed"
+    assert "subscriber" in caplog.text
@@ -0,0 +1,81 @@
+from httpx import AsyncClient
+from pytest import mark as pytest_mark
+
+from telepay.v1.metrics import Histogram, WebhookMetrics
+from telepay.v1.waiters import InvoiceWaiters
+from telepay.v1.webhooks import INVOICE_COMPLETED
+
+from .utils import create_listener, deliver
+
+
+def test_histogram_quantiles():
+    histogram = Histogram(buckets=(1, 2, 3, 4))
+    for value in (0.5, 1.5, 2.5, 3.5):
+        histogram.observe(value)
+    assert histogram.count == 4
+    assert histogram.quantile(0.5) == 2
+    assert histogram.quantile(1) == 4
+
+
+@pytest_mark.anyio
+async def test_listener_counts_verified_requests():
+    received = []
+    listener = create_listener(lambda headers, data: received.append(data))
+    observed = []
+    listener.metrics.add_observer(lambda name, value, labels: observed.append(name))
+
+    response = await deliver(listener, {"event": INVOICE_COMPLETED, "data": {}})
+
+    assert response.status_code == 200
+    assert len(received) == 1
+    assert listener.metrics.requests == {(INVOICE_COMPLETED, "verified"): 1}
+    assert listener.metrics.signature_seconds.count == 1
+    assert listener.metrics.callback_seconds.count == 1
+    assert listener.metrics.in_flight == 0
+    assert "webhook_callback_seconds" in observed
+
+
+@pytest_mark.anyio
+async def test_listener_counts_invalid_signatures():
+    listener = create_listener()
+    response = await deliver(
+        listener, {"event": INVOICE_COMPLETED}, signature="invalid"
+    )
+    assert response.status_code == 400
+    assert response.json()["error"] == "invalid_signature"
+    # the event of an unverified payload isn't trusted
+    assert listener.metrics.requests == {("unknown", "invalid_signature"): 1}
+    assert listener.metrics.callback_seconds.count == 0
+
+
+def test_metrics_escape_label_values():
+    metrics = WebhookMetrics()
+    metrics.request_started()
+    metrics.request_finished('a"b\\c\nd', "verified")
+    assert (
+        'telepay_webhook_requests_total{event="a\\"b\\\\c\\nd",outcome="verified"} 1'
+        in metrics.render()
+    )
+
+
+@pytest_mark.anyio
+async def test_listener_exposes_prometheus_metrics():
+    listener = create_listener()
+    await deliver(listener, {"event": INVOICE_COMPLETED})
+    async with AsyncClient(app=listener.app, base_url="http://test") as http:
+        response = await http.get("/metrics")
+    assert response.status_code == 200
+    assert (
+        'telepay_webhook_requests_total{event="invoice.completed",outcome="verified"} 1'
+        in response.text
+    )
+    assert "telepay_webhook_callback_seconds_count 1" in response.text
+
+
+@pytest_mark.anyio
+async def test_listener_handles_payloads_that_are_not_objects():
+    listener = create_listener()
+    listener.waiters = InvoiceWaiters()
+    response = await deliver(listener, ["not", "an", "object"])
+    assert response.status_code == 200
+    assert listener.metrics.requests == {("unknown", "verified"): 1}
@@ -1,6 +1,11 @@
+import json
 import random
 import string
 
+from httpx import AsyncClient
+
+from telepay.v1.webhooks import TelePayWebhookListener, get_signature
+
 ERRORS = {
     "forbidden": "You are not authorized to perform this action.",
     "unavailable": "This action is temporarly unavailable.",
@@ -12,7 +17,45 @@ ERRORS = {
     "webhook.not-found": "Webhook not found.",
 }
 
+# create_invoice arguments accepted by the mock API
+INVOICE = dict(
+    asset="TON",
+    blockchain="TON",
+    network="mainnet",
+    amount=1,
+    success_url="https://a.b",
+    cancel_url="https://a.b",
+    expires_at=60,
+)
+
+WEBHOOK_SECRET = "hello"
+
 
 def random_text(length):
     chars = string.ascii_uppercase + string.digits
     return "".join(random.choice(chars) for _ in range(length))
+
+
+def requests(api, endpoint):
+    """
+    Number of calls of the mock API to `endpoint`
+    """
+    return [e for _, e in api.requests].count(endpoint)
+
+
+def statuses(api):
+    return sorted(invoice["status"] for invoice in api.invoices.values())
+
+
+def create_listener(callback=lambda headers, data: None) -> TelePayWebhookListener:
+    return TelePayWebhookListener(secret=WEBHOOK_SECRET, callback=callback)
+
+
+async def deliver(listener: TelePayWebhookListener, payload: dict, signature=None):
+    signature = signature or get_signature(str(payload), WEBHOOK_SECRET)
+    async with AsyncClient(app=listener.app, base_url="http://test") as http:
+        return await http.post(
+            listener.url,
+            content=json.dumps(json.dumps(payload)),
+            headers={"Webhook-Signature": signature},
+        )